@@ -15,6 +15,7 @@ from __future__ import unicode_literals, division
 
 import sys
 import codecs
+import heapq
 import argparse
 from collections import defaultdict
 
@@ -87,42 +88,61 @@ def get_pairs(word):
 
 def encode(orig, bpe_codes, cache={}):
     """Encode word based on list of BPE merge operations, which are applied consecutively
+
+    The word is kept as a linked list of symbols and the candidate merges in a
+    priority queue ordered by (rank, position), so each merge costs a log factor
+    instead of a rescan of the whole word. All occurrences of the best pair are
+    merged left-to-right before the pairs they create become candidates, which
+    gives the same segmentation as applying the merges one by one.
     """
 
     if orig in cache:
         return cache[orig]
 
-    word = tuple(orig) + ('</w>',)
-    pairs = get_pairs(word)
-
-    while True:
-        bigram = min(pairs, key = lambda pair: bpe_codes.get(pair, float('inf')))
-        if bigram not in bpe_codes:
-            break
-        first, second = bigram
-        new_word = []
-        i = 0
-        while i < len(word):
-            try:
-                j = word.index(first, i)
-                new_word.extend(word[i:j])
-                i = j
-            except:
-                new_word.extend(word[i:])
-                break
-
-            if word[i] == first and i < len(word)-1 and word[i+1] == second:
-                new_word.append(first+second)
-                i += 2
-            else:
-                new_word.append(word[i])
-                i += 1
-        new_word = tuple(new_word)
-        word = new_word
-        if len(word) == 1:
-            break
-        else:
-            pairs = get_pairs(word)
+    symbols = list(orig) + ['</w>']
+    length = len(symbols)
+    prev_pos = list(range(-1, length - 1))
+    next_pos = list(range(1, length)) + [-1]
+
+    queue = []
+    for i in range(length - 1):
+        rank = bpe_codes.get((symbols[i], symbols[i+1]))
+        if rank is not None:
+            queue.append((rank, i, symbols[i], symbols[i+1]))
+    heapq.heapify(queue)
+
+    while queue:
+        rank = queue[0][0]
+        touched = []
+
+        # merge all occurrences of the best pair, left to right
+        while queue and queue[0][0] == rank:
+            _, i, first, second = heapq.heappop(queue)
+            j = next_pos[i]
+            # skip entries made stale by previous merges
+            if symbols[i] != first or j == -1 or symbols[j] != second:
+                continue
+
+            symbols[i] = first + second
+            symbols[j] = None
+            after = next_pos[j]
+            next_pos[i] = after
+            if after != -1:
+                prev_pos[after] = i
+                touched.append(i)
+            if prev_pos[i] != -1:
+                touched.append(prev_pos[i])
+
+        # the newly created pairs compete only after the whole pass
+        for i in touched:
+            j = next_pos[i]
+            if symbols[i] is None or j == -1:
+                continue
+            pair = (symbols[i], symbols[j])
+            if pair in bpe_codes:
+                heapq.heappush(queue, (bpe_codes[pair], i) + pair)
+
+    word = tuple(symbol for symbol in symbols if symbol is not None)
 
     # don't print end-of-word symbols
     if word[-1] == '</w>':
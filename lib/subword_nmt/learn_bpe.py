@@ -13,12 +13,15 @@ Proceedings of the 54th Annual Meeting of the Association for Computational Ling
 
 from __future__ import unicode_literals
 
+import os
 import sys
 import codecs
 import re
 import copy
+import time
 import argparse
 from collections import defaultdict, Counter
+from multiprocessing import Pool
 
 # hack for python2/3 compatibility
 from io import open
@@ -46,21 +49,76 @@ def create_parser():
     parser.add_argument(
         '--symbols', '-s', type=int, default=10000,
         help="Create this many new symbols (each representing a character n-gram) (default: %(default)s))")
+    parser.add_argument(
+        '--resume', '-r', type=argparse.FileType('r'), metavar='PATH',
+        help="Continue from the BPE codes in this file; they are replayed on the input and copied to the output, "
+             "and --symbols counts them too.")
+    parser.add_argument(
+        '--num-workers', '-j', type=int, default=1,
+        help="Number of processes counting the vocabulary; needs --input to be a regular file (default: %(default)s)")
     parser.add_argument(
         '--verbose', '-v', action="store_true",
         help="verbose mode.")
 
     return parser
 
-def get_vocabulary(fobj):
+def get_vocabulary(fobj, num_workers=1):
     """Read text and return dictionary that encodes vocabulary
+
+    With more than one worker, the file is split into byte ranges which are
+    counted in separate processes.
     """
+    if num_workers > 1:
+        path = getattr(fobj, 'name', None)
+        if path is not None and os.path.isfile(path):
+            return get_vocabulary_parallel(path, num_workers)
+        sys.stderr.write('parallel counting needs a regular input file; using one process\n')
+
     vocab = Counter()
     for line in fobj:
         for word in line.split():
             vocab[word] += 1
     return vocab
 
+def get_vocabulary_parallel(path, num_workers):
+    """Count the vocabulary of a file in num_workers processes"""
+    size = os.path.getsize(path)
+    bounds = [size * i // num_workers for i in range(num_workers + 1)]
+    shards = [(path, bounds[i], bounds[i+1]) for i in range(num_workers)]
+
+    pool = Pool(num_workers)
+    try:
+        counters = pool.map(_count_shard, shards)
+    finally:
+        pool.close()
+        pool.join()
+
+    vocab = Counter()
+    for counter in counters:
+        vocab.update(counter)
+    return vocab
+
+def _count_shard(shard):
+    """Count words on lines starting within the byte range [start, end)"""
+    path, start, end = shard
+    vocab = Counter()
+    with open(path, 'rb') as fobj:
+        if start:
+            # skip the rest of the line that belongs to the previous shard
+            fobj.seek(start - 1)
+            fobj.readline()
+        while fobj.tell() < end:
+            line = fobj.readline()
+            if not line:
+                break
+            for word in line.decode('utf-8').split():
+                vocab[word] += 1
+    return vocab
+
+def read_codes(fobj):
+    """Read BPE codes (one pair of symbols per line) created by this script"""
+    return [tuple(line.split()) for line in fobj if line.strip()]
+
 def update_pair_statistics(pair, changed, stats, indices):
     """Minimally update the indices and frequency of symbol pairs
 
@@ -171,20 +229,33 @@ def prune_stats(stats, big_stats, threshold):
             else:
                 big_stats[item] = freq
 
-if __name__ == '__main__':
+def learn_bpe(infile, outfile, num_symbols, verbose=False, num_workers=1, resume=None):
+    """Learn num_symbols BPE operations from infile and write them to outfile.
 
-    parser = create_parser()
-    args = parser.parse_args()
+    If resume is given, the codes it contains are applied to the vocabulary
+    first (in the same way as if they were learned from it), copied to the
+    output, and learning continues from there.
+    """
 
-    vocab = get_vocabulary(args.input)
+    vocab = get_vocabulary(infile, num_workers)
     vocab = dict([(tuple(x)+('</w>',) ,y) for (x,y) in vocab.items()])
     sorted_vocab = sorted(vocab.items(), key=lambda x: x[1], reverse=True)
 
     stats, indices = get_pair_statistics(sorted_vocab)
+
+    previous_codes = read_codes(resume) if resume is not None else []
+    for pair in previous_codes:
+        outfile.write('{0} {1}\n'.format(*pair))
+        changes = replace_pair(pair, sorted_vocab, indices)
+        update_pair_statistics(pair, changes, stats, indices)
+        stats[pair] = 0
+
     big_stats = copy.deepcopy(stats)
     # threshold is inspired by Zipfian assumption, but should only affect speed
     threshold = max(stats.values()) / 10
-    for i in range(args.symbols):
+    learned = 0
+    start_time = time.time()
+    for i in range(len(previous_codes), num_symbols):
         if stats:
             most_frequent = max(stats, key=stats.get)
 
@@ -201,11 +272,26 @@ if __name__ == '__main__':
             sys.stderr.write('no pair has frequency > 1. Stopping\n')
             break
 
-        if args.verbose:
+        if verbose:
             sys.stderr.write('pair {0}: {1} {2} -> {1}{2} (frequency {3})\n'.format(i, most_frequent[0], most_frequent[1], stats[most_frequent]))
-        args.output.write('{0} {1}\n'.format(*most_frequent))
+        outfile.write('{0} {1}\n'.format(*most_frequent))
         changes = replace_pair(most_frequent, sorted_vocab, indices)
         update_pair_statistics(most_frequent, changes, stats, indices)
         stats[most_frequent] = 0
         if not i % 100:
             prune_stats(stats, big_stats, threshold)
+
+        learned += 1
+        if verbose and not learned % 1000:
+            sys.stderr.write('{0} merges learned, {1:.1f} merges/s\n'.format(learned, learned / (time.time() - start_time)))
+
+    elapsed = time.time() - start_time
+    sys.stderr.write('learned {0} new merges in {1:.1f}s ({2:.1f} merges/s)\n'.format(
+        learned, elapsed, learned / elapsed if elapsed else 0.))
+
+if __name__ == '__main__':
+
+    parser = create_parser()
+    args = parser.parse_args()
+
+    learn_bpe(args.input, args.output, args.symbols, args.verbose, args.num_workers, args.resume)
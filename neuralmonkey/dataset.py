@@ -4,6 +4,7 @@ import os
 import random
 import re
 import collections
+import itertools
 
 from typing import cast, Any, List, Callable, Iterable, Dict, Tuple, Union
 
@@ -12,11 +13,18 @@ from typeguard import check_argument_types
 
 from neuralmonkey.logging import log
 from neuralmonkey.readers.plain_text_reader import UtfPlainTextReader
+from neuralmonkey.writers.output_writer import Writer
 
 # pylint: disable=invalid-name
 Reader = Callable[[List[str]], Any]
+# output path optionally with the writer of the series
+OutputDef = Union[str, Tuple[str, Writer]]
 # pylint: enable=invalid-name
 
+# Number of sentences passed at once to the series preprocessors which
+# process whole batches (e.g. BPE)
+PREPROCESSING_BATCH = 10000
+
 
 class Dataset(collections.Sized):
     """ This class serves as collection for data series for particular
@@ -27,14 +35,15 @@ class Dataset(collections.Sized):
     """
 
     def __init__(self, name: str, series: Dict[str, List],
-                 series_outputs: Dict[str, str]) -> None:
+                 series_outputs: Dict[str, OutputDef]) -> None:
         """Creates a dataset from the provided already preprocessed
         series of data.
 
         Arguments:
             name: The name for the dataset
             series: Dictionary from the series name to the actual data.
-            series_outputs: Output files for target series.
+            series_outputs: Output files (optionally with their writers)
+                for target series.
         """
         self.name = name
         self._series = series
@@ -162,7 +171,7 @@ class Dataset(collections.Sized):
         subset_name = "{}.{}.{}".format(self.name, start, length)
 
         # new outputs
-        subset_outputs = {k: "{}.{:010}".format(v, start)
+        subset_outputs = {k: _subset_output(v, start)
                           for k, v in self.series_outputs.items()}
 
         # new series
@@ -183,7 +192,7 @@ class LazyDataset(Dataset):
 
     def __init__(self, name: str,
                  series_paths_and_readers: Dict[str, Tuple[List[str], Reader]],
-                 series_outputs: Dict[str, str],
+                 series_outputs: Dict[str, OutputDef],
                  preprocessors: List[Tuple[str, str, Callable]] = None
                 ) -> None:
         """Create a new instance of the lazy dataset.
@@ -262,7 +271,7 @@ class LazyDataset(Dataset):
             src_id, func = self.preprocess_series[name]
             paths, reader = self.series_paths_and_readers[src_id]
             src_series = reader(paths)
-            return map(func, src_series)
+            return _preprocess_series(func, src_series)
         else:
             raise Exception("Series '{}' is not in the dataset.".format(name))
 
@@ -287,7 +296,7 @@ class LazyDataset(Dataset):
         subset_name = "{}.{}.{}".format(self.name, start, length)
 
         # new outputs
-        subset_outputs = {k: "{}.{:010}".format(v, start)
+        subset_outputs = {k: _subset_output(v, start)
                           for k, v in self.series_outputs.items()}
 
         # new series
@@ -383,7 +392,8 @@ def load_dataset_from_files(
                         ("The source series ({}) of the '{}' preprocessor "
                          "is not defined in the dataset.").format(
                              src_id, str(function)))
-                series[tgt_id] = list(map(function, series[src_id]))
+                series[tgt_id] = list(
+                    _preprocess_series(function, series[src_id]))
 
         dataset = Dataset(name, series, series_outputs)
         log("Dataset length: {}".format(len(dataset)))
@@ -449,9 +459,12 @@ def _get_series_paths_and_readers(
     return series_sources
 
 
-def _get_series_outputs(series_config: SeriesConfig) -> Dict[str, str]:
+def _get_series_outputs(
+        series_config: SeriesConfig) -> Dict[str, OutputDef]:
     """Get paths to series outputs from the dataset keyword argument specs.
     Output file for a series named 'xxx' is specified by parameter 's_xxx_out'
+    either by a path, or by a tuple of a path and a writer (see
+    `neuralmonkey.writers`).
 
     Arguments:
         series_config: A dictionary containing the dataset keyword argument
@@ -459,21 +472,54 @@ def _get_series_outputs(series_config: SeriesConfig) -> Dict[str, str]:
 
     Returns:
         A dictionary which maps serie names to the paths for their output
-        files.
+        files, optionally with their writers.
     """
-    outputs = {}
+    outputs = {}  # type: Dict[str, OutputDef]
     for key, value in series_config.items():
         matcher = SERIES_OUTPUT.match(key)
         if matcher:
             name = matcher.group(1)
-            if not isinstance(value, str):
+            if isinstance(value, tuple):
+                if (len(value) != 2 or not isinstance(value[0], str)
+                        or not callable(value[1])):
+                    raise ValueError(
+                        "Output of '{}' series must be a path or a tuple of "
+                        "a path and a writer, was {}.".format(name, value))
+                outputs[name] = cast(Tuple[str, Writer], value)
+            elif isinstance(value, str):
+                outputs[name] = value
+            else:
                 raise ValueError(
                     "Output path for '{}' series must be a string, was {}.".
                     format(name, type(value)))
-            outputs[name] = cast(str, value)
     return outputs
 
 
+def _subset_output(output: OutputDef, start: int) -> OutputDef:
+    """Get the output of a dataset subset starting at a given index."""
+    if isinstance(output, tuple):
+        path, writer = output
+        return "{}.{:010}".format(path, start), writer
+    return "{}.{:010}".format(output, start)
+
+
+def _preprocess_series(function: Callable,
+                       series: Iterable[Any]) -> Iterable[Any]:
+    """Apply a series preprocessor on all items of a series.
+
+    Preprocessors with a ``segment_batch`` method get the series in batches
+    of `PREPROCESSING_BATCH` items, the others get the items one by one.
+    """
+    segment_batch = getattr(function, "segment_batch", None)
+    if segment_batch is None:
+        return map(function, series)
+
+    iterator = iter(series)
+    batches = iter(lambda: list(itertools.islice(
+        iterator, PREPROCESSING_BATCH)), [])
+    return itertools.chain.from_iterable(map(segment_batch, batches))
+
+
 def _preprocessed_datasets(
         dataset: Dataset,
         series_config: SeriesConfig) -> None:
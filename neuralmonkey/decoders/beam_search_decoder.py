@@ -24,8 +24,12 @@ previously mentioned information, plus the decoder ``LoopState``, which is used
 in the decoder when its own ``tf.while_loop`` function is used - this is not
 the case when using beam search because we want to run the decoder's steps
 manually.
+
+The parent decoder can also be an ``EnsembleDecoder``. Then the loop state
+holds a ``LoopState`` for each of the member decoders and the hypotheses are
+scored by the averaged log-probabilities of the members.
 """
-from typing import NamedTuple, List, Callable
+from typing import NamedTuple, List, Callable, Union
 
 import tensorflow as tf
 from typeguard import check_argument_types
@@ -34,6 +38,8 @@ from neuralmonkey.decoding_function import BaseAttention
 from neuralmonkey.model.model_part import ModelPart, FeedDict
 from neuralmonkey.dataset import Dataset
 from neuralmonkey.decoders.decoder import Decoder, LoopState
+from neuralmonkey.decoders.ensemble_decoder import (EnsembleDecoder,
+                                                    average_logprobs)
 from neuralmonkey.vocabulary import (START_TOKEN_INDEX, END_TOKEN_INDEX,
                                      PAD_TOKEN_INDEX)
 
@@ -59,7 +65,7 @@ SearchStepOutputTA = NamedTuple("SearchStepOutputTA",
 BeamSearchLoopState = NamedTuple("BeamSearchLoopState",
                                  [("bs_state", SearchState),
                                   ("bs_output", SearchStepOutputTA),
-                                  ("decoder_loop_state", LoopState)])
+                                  ("decoder_loop_states", List[LoopState])])
 # pylint: enable=invalid-name
 
 
@@ -72,7 +78,7 @@ class BeamSearchDecoder(ModelPart):
     """
     def __init__(self,
                  name: str,
-                 parent_decoder: Decoder,
+                 parent_decoder: Union[Decoder, EnsembleDecoder],
                  beam_size: int,
                  length_normalization: float,
                  max_steps: int = None,
@@ -82,6 +88,10 @@ class BeamSearchDecoder(ModelPart):
         check_argument_types()
 
         self.parent_decoder = parent_decoder
+        if isinstance(parent_decoder, EnsembleDecoder):
+            self._decoders = parent_decoder.decoders
+        else:
+            self._decoders = [parent_decoder]
         self._beam_size = beam_size
         self._length_normalization = length_normalization
 
@@ -100,16 +110,23 @@ class BeamSearchDecoder(ModelPart):
         return self.parent_decoder.vocabulary
 
     def _get_initial_search_state(self, att_objects: List) -> SearchState:
+        # the decoder and attention states are those of the first decoder
         return SearchState(
             logprob_sum=tf.constant([0.0]),
             lengths=tf.constant([1], dtype=tf.int32),
             finished=tf.constant([False]),
             last_word_ids=tf.constant([START_TOKEN_INDEX]),
-            last_state=self.parent_decoder.initial_state,
+            last_state=self._decoders[0].initial_state,
             last_attns=[tf.zeros([1, a.attn_size]) for a in att_objects])
 
-    def get_initial_loop_state(self, att_objects: List) -> BeamSearchLoopState:
-        state = self._get_initial_search_state(att_objects)
+    def get_initial_loop_state(
+            self, att_objects: List[List]) -> BeamSearchLoopState:
+        """Get the initial loop state.
+
+        Arguments:
+            att_objects: Attention objects of each of the decoders.
+        """
+        state = self._get_initial_search_state(att_objects[0])
         output_ta = SearchStepOutputTA(
             scores=tf.TensorArray(dtype=tf.float32, dynamic_size=True,
                                   size=0, name="beam_scores"),
@@ -118,19 +135,20 @@ class BeamSearchDecoder(ModelPart):
             token_ids=tf.TensorArray(dtype=tf.int32, dynamic_size=True,
                                      size=0, name="beam_tokens"))
 
-        dec_loop_state = self.parent_decoder.get_initial_loop_state(
-            att_objects)
+        dec_loop_states = [dec.get_initial_loop_state(att) for dec, att
+                           in zip(self._decoders, att_objects)]
 
         return BeamSearchLoopState(
             bs_state=state,
             bs_output=output_ta,
-            decoder_loop_state=dec_loop_state)
+            decoder_loop_states=dec_loop_states)
 
     def _decoding_loop(self) -> SearchStepOutput:
-        # collect attention objects
-        att_objects = [self.parent_decoder.get_attention_object(e, False)
-                       for e in self.parent_decoder.encoders]
-        att_objects = [a for a in att_objects if a is not None]
+        # collect attention objects of each decoder
+        att_objects = [
+            [a for a in (dec.get_attention_object(e, False)
+                         for e in dec.encoders) if a is not None]
+            for dec in self._decoders]
 
         beam_body = self.get_body(att_objects)
 
@@ -142,7 +160,7 @@ class BeamSearchDecoder(ModelPart):
 
         def cond(*args) -> tf.Tensor:
             bsls = BeamSearchLoopState(*args)
-            return tf.less(bsls.decoder_loop_state.step, self._max_steps)
+            return tf.less(bsls.decoder_loop_states[0].step, self._max_steps)
 
         final_state = tf.while_loop(cond, beam_body, next_bs_loop_state)
 
@@ -154,11 +172,15 @@ class BeamSearchDecoder(ModelPart):
                                 parent_ids=parent_ids,
                                 token_ids=token_ids)
 
-    def get_body(self, att_objects: List[BaseAttention]) -> Callable:
+    def get_body(self, att_objects: List[List[BaseAttention]]) -> Callable:
         """Return a function that will act as the body for the
         ``tf.while_loop`` call.
+
+        Arguments:
+            att_objects: Attention objects of each of the decoders.
         """
-        decoder_body = self.parent_decoder.get_body(att_objects, False)
+        decoder_bodies = [dec.get_body(att, False)
+                          for dec, att in zip(self._decoders, att_objects)]
 
         # pylint: disable=too-many-locals
         def body(*args) -> BeamSearchLoopState:
@@ -171,23 +193,25 @@ class BeamSearchDecoder(ModelPart):
             """
             loop_state = BeamSearchLoopState(*args)
             bs_state = loop_state.bs_state
-            dec_loop_state = loop_state.decoder_loop_state
+            dec_loop_states = loop_state.decoder_loop_states
 
             # don't want to use this decoder with uninitialized parent
-            assert self.parent_decoder.step_scope.reuse
+            assert all(dec.step_scope.reuse for dec in self._decoders)
 
-            # CALL THE DECODER BODY FUNCTION
+            # CALL THE DECODER BODY FUNCTIONS
             # TODO figure out why mypy throws too-many-arguments on this
-            next_loop_state = decoder_body(*dec_loop_state)  # type: ignore
+            next_loop_states = [
+                decoder_body(*dec_loop_state)  # type: ignore
+                for decoder_body, dec_loop_state in zip(decoder_bodies,
+                                                        dec_loop_states)]
 
-            logits = next_loop_state.prev_logits
-            rnn_state = next_loop_state.prev_rnn_state
-            rnn_output = next_loop_state.prev_rnn_output
-            attns = next_loop_state.prev_contexts
+            rnn_state = next_loop_states[0].prev_rnn_state
+            attns = next_loop_states[0].prev_contexts
 
             # mask the probabilities
             # shape(logprobs) = beam x vocabulary
-            logprobs = tf.nn.log_softmax(logits)
+            logprobs = average_logprobs(
+                [state.prev_logits for state in next_loop_states])
 
             finished_mask = tf.expand_dims(tf.to_float(bs_state.finished), 1)
             unfinished_logprobs = (1. - finished_mask) * logprobs
@@ -239,7 +263,6 @@ class BeamSearchDecoder(ModelPart):
                                    len(self.parent_decoder.vocabulary))
 
             next_beam_prev_rnn_state = tf.gather(rnn_state, next_beam_ids)
-            next_beam_prev_rnn_output = tf.gather(rnn_output, next_beam_ids)
             next_beam_prev_attns = [tf.gather(a, next_beam_ids) for a in attns]
             next_lengths = tf.gather(hyp_lengths, next_beam_ids)
 
@@ -251,7 +274,7 @@ class BeamSearchDecoder(ModelPart):
 
             prev_output = loop_state.bs_output
 
-            step = dec_loop_state.step
+            step = dec_loop_states[0].step
             output = SearchStepOutputTA(
                 scores=prev_output.scores.write(step, topk_scores),
                 parent_ids=prev_output.parent_ids.write(step, next_beam_ids),
@@ -290,29 +313,35 @@ class BeamSearchDecoder(ModelPart):
             # of the computation as done by the decoder. The record is stored
             # in search states and step outputs of this decoder.
 
-            next_prev_logits = tf.gather(next_loop_state.prev_logits,
-                                         next_beam_ids)
-
-            next_prev_contexts = [tf.gather(ctx, next_beam_ids) for ctx in
-                                  next_loop_state.prev_contexts]
-
-            # Update the decoder next_loop_state
-            next_loop_state = next_loop_state._replace(
-                input_symbol=next_word_ids,
-                prev_rnn_state=next_beam_prev_rnn_state,
-                prev_rnn_output=next_beam_prev_rnn_output,
-                prev_logits=next_prev_logits,
-                prev_contexts=next_prev_contexts,
-                finished=next_finished)
+            # Update the decoder next_loop_states
+            next_loop_states = [
+                self._reorder_loop_state(next_loop_state, next_beam_ids,
+                                         next_word_ids, next_finished)
+                for next_loop_state in next_loop_states]
 
             return BeamSearchLoopState(
                 bs_state=search_state,
                 bs_output=output,
-                decoder_loop_state=next_loop_state)
+                decoder_loop_states=next_loop_states)
         # pylint: enable=too-many-locals
 
         return body
 
+    @staticmethod
+    def _reorder_loop_state(loop_state: LoopState,
+                            beam_ids: tf.Tensor,
+                            word_ids: tf.Tensor,
+                            finished: tf.Tensor) -> LoopState:
+        """Make the decoder loop state follow the selected hypotheses."""
+        return loop_state._replace(
+            input_symbol=word_ids,
+            prev_rnn_state=tf.gather(loop_state.prev_rnn_state, beam_ids),
+            prev_rnn_output=tf.gather(loop_state.prev_rnn_output, beam_ids),
+            prev_logits=tf.gather(loop_state.prev_logits, beam_ids),
+            prev_contexts=[tf.gather(ctx, beam_ids)
+                           for ctx in loop_state.prev_contexts],
+            finished=finished)
+
     def feed_dict(self, dataset: Dataset, train: bool = False) -> FeedDict:
         """Populate the feed dictionary for the decoder object
 
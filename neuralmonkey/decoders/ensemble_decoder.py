@@ -0,0 +1,369 @@
+"""In-graph ensemble of decoders.
+
+The ensemble runs the decoding loops of its member decoders in a single
+``tf.while_loop``. In each step, the log-probabilities of the members are
+averaged and the next symbol, which is fed back to all the members, is chosen
+from the average. Unlike ensembling more TensorFlow sessions, the whole
+ensemble is evaluated in a single ``session.run`` call and it can also be
+used as the parent decoder of the ``BeamSearchDecoder``.
+
+The members are separate models in the same graph, so their model parts must
+have different names. The members can be loaded from variable files of
+independently trained models: the variables of a member are recognized by a
+prefix of their names, which is removed when looking them up in the variable
+file. For example, a member whose model parts are named ``m1_encoder`` and
+``m1_decoder`` with the name prefix ``m1_`` can be loaded from a variable
+file of a model with parts ``encoder`` and ``decoder``.
+
+The members usually read the same data: model parts of the members which
+have the same type and read the same series with the same vocabularies and
+maximum lengths get the same values in their placeholders. The ensemble
+prepares the feed dict of such a group of parts only once, for the part of
+the first member, and feeds the same values to the placeholders of the
+other members. The runners do not feed these parts themselves.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import tensorflow as tf
+from typeguard import check_argument_types
+
+from neuralmonkey.dataset import Dataset
+from neuralmonkey.decoders.decoder import Decoder, LoopState
+from neuralmonkey.decorators import tensor
+from neuralmonkey.logging import log
+from neuralmonkey.model.model_part import ModelPart, FeedDict
+from neuralmonkey.vocabulary import END_TOKEN_INDEX, PAD_TOKEN_INDEX
+
+# pylint: disable=invalid-name
+EnsembleLoopState = NamedTuple(
+    "EnsembleLoopState",
+    [("step", tf.Tensor),
+     ("member_states", List[LoopState]),
+     ("logprobs", tf.TensorArray),  # averaged logprobs of the members
+     ("mask", tf.TensorArray),
+     ("finished", tf.Tensor)])
+# pylint: enable=invalid-name
+
+# attributes which determine the values a model part feeds to its placeholders
+_FEED_ATTRIBUTES = ["data_id", "data_ids", "vocabulary", "vocabularies",
+                    "max_input_len", "max_output_len", "max_length"]
+
+
+def _input_parts(part: ModelPart) -> List[ModelPart]:
+    """List a decoder and its encoders recursively in a fixed order."""
+    parts = [part]
+    for encoder in getattr(part, "encoders", []):
+        parts.extend(_input_parts(encoder))
+    if hasattr(part, "encoder"):
+        parts.extend(_input_parts(part.encoder))
+    return parts
+
+
+def _feed_config(part: ModelPart) -> List[Any]:
+    """Everything the feed dict of a model part depends on."""
+    config = [type(part)] + [getattr(part, attr, None)
+                             for attr in _FEED_ATTRIBUTES]
+    sequence = getattr(part, "input_sequence", None)
+    if sequence is not None:
+        config.append(_feed_config(sequence))
+    return config
+
+
+def _placeholders(part: ModelPart) -> Dict[str, tf.Tensor]:
+    """Get the placeholders of a model part and of its input sequence.
+
+    The placeholders are the ones created by the ``@tensor`` properties,
+    they are identified by the property names, so the placeholders of two
+    model parts of the same type correspond by their keys.
+    """
+    placeholders = {}
+    for attribute, value in vars(part).items():
+        if not attribute.endswith("_cached_placeholder"):
+            continue
+        tensors = value if isinstance(value, (list, tuple)) else [value]
+        for i, tensor_value in enumerate(tensors):
+            if (isinstance(tensor_value, tf.Tensor)
+                    and tensor_value.op.type == "Placeholder"):
+                placeholders["{}.{}".format(attribute, i)] = tensor_value
+
+    sequence = getattr(part, "input_sequence", None)
+    if isinstance(sequence, ModelPart):
+        for key, placeholder in _placeholders(sequence).items():
+            placeholders["input_sequence." + key] = placeholder
+    return placeholders
+
+
+def average_logprobs(logits: List[tf.Tensor]) -> tf.Tensor:
+    """Average the log-probabilities given by the logits of more models."""
+    if len(logits) == 1:
+        return tf.nn.log_softmax(logits[0])
+
+    return tf.reduce_mean(
+        tf.stack([tf.nn.log_softmax(logit) for logit in logits]), axis=0)
+
+
+class EnsembleDecoder(ModelPart):
+    """Greedy decoding with an ensemble of decoders in a single graph."""
+
+    def __init__(self,
+                 name: str,
+                 decoders: List[Decoder],
+                 max_output_len: Optional[int] = None,
+                 variable_files: Optional[List[str]] = None,
+                 name_prefixes: Optional[List[str]] = None) -> None:
+        """Create an ensemble of decoders.
+
+        Arguments:
+            name: Name of the ensemble.
+            decoders: The member decoders. They must share the vocabulary.
+            max_output_len: Maximum length of an output sequence, the minimum
+                of the members' maximum lengths by default.
+            variable_files: Variable files of the members, which are loaded
+                when the model parts are initialized.
+            name_prefixes: Prefixes of the names of the variables of each
+                member, which are removed when loading the members from the
+                variable files.
+        """
+        ModelPart.__init__(self, name, None, None)
+        check_argument_types()
+
+        if not decoders:
+            raise ValueError("The ensemble must have at least one decoder.")
+
+        vocabulary_sizes = set(len(dec.vocabulary) for dec in decoders)
+        if len(vocabulary_sizes) > 1:
+            raise ValueError("The decoders in the ensemble must share the "
+                             "vocabulary, but the vocabulary sizes are {}."
+                             .format(sorted(vocabulary_sizes)))
+
+        if variable_files is not None and (
+                name_prefixes is None
+                or len(name_prefixes) != len(decoders)
+                or len(variable_files) != len(decoders)):
+            raise ValueError("Provide a variable file and a name prefix for "
+                             "each of the {} decoders.".format(len(decoders)))
+
+        self.decoders = decoders
+        self.vocabulary = decoders[0].vocabulary
+        self.data_id = decoders[0].data_id
+        self.max_output_len = max_output_len
+        if self.max_output_len is None:
+            self.max_output_len = min(dec.max_output_len for dec in decoders)
+
+        self._variable_files = variable_files
+        self._name_prefixes = name_prefixes
+
+        # groups of equivalent parts: the first member's part and the
+        # equivalent parts of the other members
+        self._shared_feeds = []  # type: List[Tuple[ModelPart, List]]
+        # mappings of the first member's placeholders to the placeholders of
+        # the other parts, None for parts which feed their placeholders
+        self._feed_mappings = {}  # type: Dict[ModelPart, Optional[Dict]]
+        self.fed_parts = set()  # type: Set[ModelPart]
+        self._share_feeds()
+
+        log("Initializing ensemble of {} decoders, name: '{}'"
+            .format(len(decoders), name))
+
+    def _share_feeds(self) -> None:
+        """Find the parts whose feed dict is shared by the members."""
+        other_parts = [_input_parts(dec) for dec in self.decoders[1:]]
+        for i, first in enumerate(_input_parts(self.decoders[0])):
+            copies = [parts[i] for parts in other_parts
+                      if i < len(parts) and parts[i] is not first
+                      and _feed_config(parts[i]) == _feed_config(first)]
+            if copies:
+                self._shared_feeds.append((first, copies))
+                self.fed_parts.add(first)
+                self.fed_parts.update(copies)
+
+    def _feed_mapping(self, first: ModelPart, part: ModelPart,
+                      first_fd: FeedDict) -> Optional[Dict]:
+        """Map the placeholders fed by the first part to the other part's.
+
+        The placeholders are created lazily, so the mapping is built when
+        the parts are fed for the first time and again if the first part
+        feeds a placeholder which is not mapped yet. If the parts do not
+        have the same placeholders, there is no mapping and the part feeds
+        its placeholders itself.
+        """
+        mapping = self._feed_mappings.get(part)
+        if (part not in self._feed_mappings
+                or (mapping is not None
+                    and not all(key in mapping for key in first_fd))):
+            first_placeholders = _placeholders(first)
+            placeholders = _placeholders(part)
+            mapping = None
+            if placeholders.keys() == first_placeholders.keys():
+                mapping = {first_placeholders[key]: placeholders[key]
+                           for key in placeholders}
+            self._feed_mappings[part] = mapping
+
+        if mapping is not None and all(key in mapping for key in first_fd):
+            return mapping
+        return None
+
+    @tensor
+    def runtime_loop_result(self) -> EnsembleLoopState:
+        return self._decoding_loop()
+
+    @tensor
+    def runtime_logits(self) -> tf.Tensor:
+        """The averaged log-probabilities of the members.
+
+        They are not normalized, i.e. they are the logits of the normalized
+        geometric mean of the members' distributions.
+        """
+        # pylint: disable=no-member
+        return self.runtime_loop_result.logprobs.stack()
+        # pylint: enable=no-member
+
+    @tensor
+    def runtime_mask(self) -> tf.Tensor:
+        # pylint: disable=no-member
+        return self.runtime_loop_result.mask.stack()
+        # pylint: enable=no-member
+
+    @tensor
+    def runtime_logprobs(self) -> tf.Tensor:
+        return tf.nn.log_softmax(self.runtime_logits)
+
+    @tensor
+    def decoded(self) -> tf.Tensor:
+        # pylint: disable=unsubscriptable-object
+        return tf.argmax(self.runtime_logits[:, :, 1:], -1) + 1
+        # pylint: enable=unsubscriptable-object
+
+    @tensor
+    def train_loss(self) -> tf.Tensor:
+        """The mean of the train losses of the members."""
+        return tf.add_n([dec.train_loss for dec in self.decoders]) / len(
+            self.decoders)
+
+    @property
+    def cost(self) -> tf.Tensor:
+        return self.train_loss
+
+    @tensor
+    def runtime_loss(self) -> tf.Tensor:
+        # all the members are fed the same targets
+        train_targets = tf.transpose(self.decoders[0].train_inputs)
+        batch_major_logits = tf.transpose(self.runtime_logits, [1, 0, 2])
+        min_time = tf.minimum(tf.shape(train_targets)[1],
+                              tf.shape(batch_major_logits)[1])
+
+        return tf.contrib.seq2seq.sequence_loss(
+            logits=batch_major_logits[:, :min_time],
+            targets=train_targets[:, :min_time],
+            weights=tf.transpose(
+                self.decoders[0].train_padding)[:, :min_time])
+
+    def _decoding_loop(self) -> EnsembleLoopState:
+        att_objects = [
+            [a for a in (dec.get_attention_object(e, False)
+                         for e in dec.encoders) if a is not None]
+            for dec in self.decoders]
+
+        member_bodies = [dec.get_body(att, False)
+                         for dec, att in zip(self.decoders, att_objects)]
+
+        def body(*args) -> EnsembleLoopState:
+            loop_state = EnsembleLoopState(*args)
+            member_states = [
+                member_body(*state) for member_body, state in zip(
+                    member_bodies, loop_state.member_states)]
+
+            logprobs = average_logprobs(
+                [state.prev_logits for state in member_states])
+
+            # Note this works only when PAD_TOKEN_INDEX is 0.
+            assert PAD_TOKEN_INDEX == 0
+            next_symbols = tf.to_int32(tf.argmax(logprobs, axis=1))
+            next_symbols *= tf.to_int32(tf.logical_not(loop_state.finished))
+
+            has_finished = tf.logical_or(
+                loop_state.finished, tf.equal(next_symbols, END_TOKEN_INDEX))
+
+            # all the members continue with the symbol chosen by the ensemble
+            member_states = [state._replace(input_symbol=next_symbols,
+                                            finished=has_finished)
+                             for state in member_states]
+
+            return EnsembleLoopState(
+                step=loop_state.step + 1,
+                member_states=member_states,
+                logprobs=loop_state.logprobs.write(loop_state.step,
+                                                   logprobs),
+                mask=loop_state.mask.write(loop_state.step,
+                                           tf.logical_not(has_finished)),
+                finished=has_finished)
+
+        def cond(*args) -> tf.Tensor:
+            loop_state = EnsembleLoopState(*args)
+            return tf.logical_and(
+                tf.logical_not(tf.reduce_all(loop_state.finished)),
+                tf.less(loop_state.step, self.max_output_len))
+
+        initial_state = EnsembleLoopState(
+            step=tf.constant(0),
+            member_states=[dec.get_initial_loop_state(att) for dec, att
+                           in zip(self.decoders, att_objects)],
+            logprobs=tf.TensorArray(dtype=tf.float32, dynamic_size=True,
+                                    size=0, name="logprobs"),
+            mask=tf.TensorArray(dtype=tf.bool, dynamic_size=True,
+                                size=0, name="mask"),
+            finished=tf.zeros([self.decoders[0].batch_size], dtype=tf.bool))
+
+        return EnsembleLoopState(*tf.while_loop(cond, body, initial_state))
+
+    def feed_dict(self, dataset: Dataset, train: bool = False) -> FeedDict:
+        """Feed the parts shared by the members.
+
+        The feed dict of each group of equivalent parts is prepared once and
+        its values are fed to the placeholders of all the parts in the group
+        (unless their placeholders differ). The other parts of the members
+        feed their placeholders themselves.
+        """
+        fd = {}  # type: FeedDict
+        for first, copies in self._shared_feeds:
+            first_fd = first.feed_dict(dataset, train)
+            fd.update(first_fd)
+            for part in copies:
+                mapping = self._feed_mapping(first, part, first_fd)
+                if mapping is None:
+                    fd.update(part.feed_dict(dataset, train))
+                else:
+                    fd.update({mapping[placeholder]: value
+                               for placeholder, value in first_fd.items()})
+        return fd
+
+    def load(self, session: tf.Session) -> None:
+        """Load the shared parts and the members from their variable files.
+
+        The shared parts are not initialized by the runners, so they are
+        loaded from their own checkpoints (if any) here.
+        """
+        for part in self.fed_parts:
+            part.load(session)
+
+        if self._variable_files is None:
+            return
+
+        assert self._name_prefixes is not None
+        all_variables = tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)
+
+        for prefix, variable_file in zip(self._name_prefixes,
+                                         self._variable_files):
+            member_variables = {
+                var.op.name[len(prefix):]: var for var in all_variables
+                if var.op.name.startswith(prefix)}
+
+            if not member_variables:
+                raise ValueError("No variables with the prefix '{}' found."
+                                 .format(prefix))
+
+            saver = tf.train.Saver(var_list=member_variables)
+            saver.restore(session, variable_file)
+
+            log("Variables with prefix '{}' of '{}' loaded from '{}'".format(
+                prefix, self.name, variable_file))
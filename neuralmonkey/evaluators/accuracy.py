@@ -1,25 +1,27 @@
 from typing import Any, List
 import numpy as np
 
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 
-class AccuracyEvaluator(object):
+
+class AccuracyEvaluator(StreamingEvaluator):
     # pylint: disable=too-few-public-methods
 
     def __init__(self,
                  name: str = "Accuracy") -> None:
         self.name = name
 
-    def __call__(self,
-                 decoded: List[List[Any]],
-                 references: List[List[Any]]) -> float:
+    def update(self,
+               decoded: List[List[Any]],
+               references: List[List[Any]]) -> np.ndarray:
         collected_info = [d == r
                           for dec, ref in zip(decoded, references)
                           for d, r in zip(dec, ref)]
-        if collected_info == []:
-            mean = 0
-        else:
-            mean = np.mean(collected_info)
-        return mean
+        return np.array([sum(collected_info), len(collected_info)],
+                        dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        return _mean_from_counts(stats)
 
     @staticmethod
     def compare_scores(score1: float, score2: float) -> int:
@@ -27,24 +29,23 @@ class AccuracyEvaluator(object):
         return (score1 > score2) - (score1 < score2)
 
 
-class AccuracySeqLevelEvaluator(object):
+class AccuracySeqLevelEvaluator(StreamingEvaluator):
     # pylint: disable=too-few-public-methods
 
     def __init__(self,
                  name: str = "AccuracySeqLevel") -> None:
         self.name = name
 
-    def __call__(self,
-                 decoded: List[Any],
-                 references: List[Any]) -> float:
+    def update(self,
+               decoded: List[Any],
+               references: List[Any]) -> np.ndarray:
         collected_info = [dec == ref
                           for dec, ref in zip(decoded, references)]
+        return np.array([sum(collected_info), len(collected_info)],
+                        dtype=np.float64)
 
-        if collected_info == []:
-            mean = 0
-        else:
-            mean = np.mean(collected_info)
-        return mean
+    def finalize(self, stats: np.ndarray) -> float:
+        return _mean_from_counts(stats)
 
     @staticmethod
     def compare_scores(score1: float, score2: float) -> int:
@@ -52,6 +53,13 @@ class AccuracySeqLevelEvaluator(object):
         return (score1 > score2) - (score1 < score2)
 
 
+def _mean_from_counts(stats: np.ndarray) -> float:
+    correct, total = stats
+    if total == 0:
+        return 0
+    return correct / total
+
+
 # pylint: disable=invalid-name
 Accuracy = AccuracyEvaluator()
 AccuracySeqLevel = AccuracySeqLevelEvaluator()
@@ -3,6 +3,7 @@ import subprocess
 from typing import List
 
 from neuralmonkey.logging import log
+from neuralmonkey.evaluators.scorer_process import ScoreCache, ScorerProcess
 
 
 # pylint: disable=too-few-public-methods
@@ -12,22 +13,45 @@ class BeerWrapper(object):
 
     Paper: http://aclweb.org/anthology/D14-1025
     Code: https://github.com/stanojevic/beer
+
+    By default, BEER is run on files in every evaluation and the score is
+    the corpus-level BEER. In the persistent mode, BEER runs in the
+    interactive mode in a persistent process, which scores the sentences one
+    by one, and the score is the average of the sentence scores, which is a
+    different metric. The sentence scores are cached, so unchanged
+    hypotheses are not scored again.
     """
 
     def __init__(self,
                  wrapper: str,
                  name: str = "BEER",
-                 encoding: str = "utf-8") -> None:
+                 encoding: str = "utf-8",
+                 persistent: bool = False,
+                 timeout: float = 60.) -> None:
         """Initialize the BEER wrapper.
 
         Args:
             name: Name of the evaluator.
             wrapper: Path to the BEER's executable.
             encoding: Data encoding.
+            persistent: Flag whether to keep BEER running in the interactive
+                mode and report the average sentence score instead of the
+                corpus-level score of BEER run on files.
+            timeout: Maximum time in seconds to wait for an answer of the
+                persistent BEER process. If it does not answer even after
+                restarting, the evaluation fails. BEER run on files has no
+                time limit.
         """
         self.wrapper = wrapper
         self.encoding = encoding
         self.name = name
+        self.persistent = persistent
+        self.timeout = timeout
+
+        self._process = ScorerProcess(
+            [wrapper, "--workingMode", "interactive"], encoding=encoding,
+            timeout=timeout)
+        self._sentence_scores = ScoreCache()
 
     def serialize_to_bytes(self, sentences: List[List[str]]) -> bytes:
         joined = [" ".join(r) for r in sentences]
@@ -36,7 +60,34 @@ class BeerWrapper(object):
 
     def __call__(self, decoded: List[List[str]],
                  references: List[List[str]]) -> float:
-
+        if not self.persistent:
+            return self._score_files(decoded, references)
+
+        scores = []
+        for hyp, ref in zip(decoded, references):
+            key = (" ".join(hyp), " ".join(ref))
+            score = self._sentence_scores.get(key)
+
+            if score is None:
+                # failures of the process (e.g. timeouts) are raised
+                response = self._process.query(
+                    "EVAL ||| {} ||| {}".format(*key))
+                try:
+                    score = float(response.split()[-1])
+                except (IndexError, ValueError):
+                    log("Error: Malformed output from BEER: '{}'"
+                        .format(response), color="red")
+                    return 0.0
+                self._sentence_scores.put(key, score)
+
+            scores.append(score)
+
+        if not scores:
+            return 0.0
+        return sum(scores) / len(scores)
+
+    def _score_files(self, decoded: List[List[str]],
+                     references: List[List[str]]) -> float:
         ref_bytes = self.serialize_to_bytes(references)
         dec_bytes = self.serialize_to_bytes(decoded)
 
@@ -1,9 +1,18 @@
 from collections import Counter
-from typing import List, Tuple, Optional
+from typing import Any, List, Tuple, Optional, Sequence
 import numpy as np
 
+from neuralmonkey.evaluators.reference_cache import ReferenceCache
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 
-class BLEUEvaluator(object):
+
+class BLEUEvaluator(StreamingEvaluator):
+    """Corpus-level BLEU.
+
+    The statistics are true positives and generated lengths for each n-gram
+    order followed by the effective reference length and the hypotheses
+    length.
+    """
 
     def __init__(self, n: int = 4, deduplicate: bool = False,
                  name: Optional[str] = None) -> None:
@@ -17,14 +26,44 @@ class BLEUEvaluator(object):
             if self.deduplicate:
                 self.name += "-dedup"
 
-    def __call__(self, decoded: List[List[str]],
-                 references: List[List[str]]) -> float:
+        self._reference_cache = ReferenceCache()
+
+    def reference_stats(self,
+                        references: Sequence[Any]) -> List[Counter]:
+        if not references:
+            # empty series (e.g. from init_stats) would evict the real ones
+            return []
+        return self._reference_cache.get(
+            references, lambda: BLEUEvaluator.reference_ngram_counts(
+                [[s] for s in references], self.n, case_sensitive=True))
+
+    def update(self, decoded: List[List[str]],
+               references: List[List[str]],
+               reference_stats: Optional[List[Counter]] = None
+              ) -> np.ndarray:
         listed_references = [[s] for s in references]
 
         if self.deduplicate:
             decoded = BLEUEvaluator.deduplicate_sentences(decoded)
 
-        return 100 * BLEUEvaluator.bleu(decoded, listed_references, self.n)
+        if reference_stats is None:
+            reference_stats = self.reference_stats(references)
+
+        true_positives, generated_lengths = BLEUEvaluator.matched_ngrams(
+            decoded, listed_references, self.n, True, reference_stats)
+
+        reference_length = BLEUEvaluator.effective_reference_length(
+            decoded, listed_references)
+        hypothesis_length = sum(len(hyp) for hyp in decoded)
+
+        return np.array(true_positives + generated_lengths
+                        + [reference_length, hypothesis_length],
+                        dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        return 100 * BLEUEvaluator.bleu_from_counts(
+            stats[:self.n], stats[self.n:2 * self.n],
+            stats[2 * self.n], stats[2 * self.n + 1])
 
     @staticmethod
     def ngram_counts(sentence: List[str], n: int,
@@ -50,6 +89,28 @@ class BLEUEvaluator(object):
 
         return counts
 
+    @staticmethod
+    def all_ngram_counts(sentence: List[str], max_n: int,
+                         lowercase: bool) -> Counter:
+        """Get n-grams of all orders up to max_n from a sentence
+
+        The n-grams are tuples of words, so the order of an n-gram is its
+        length.
+
+        Arguments:
+            sentence: Sentence as a list of words
+            max_n: Maximum n-gram order
+            lowercase: Convert ngrams to lowercase
+        """
+        if lowercase:
+            sentence = [word.lower() for word in sentence]
+
+        counts = Counter()  # type: Counter
+        for n in range(1, max_n + 1):
+            counts.update(zip(*[sentence[i:] for i in range(n)]))
+
+        return counts
+
     @staticmethod
     def merge_max_counters(counters: List[Counter]) -> Counter:
         """Merge counters using maximum values"""
@@ -62,10 +123,41 @@ class BLEUEvaluator(object):
         return merged
 
     @staticmethod
-    def modified_ngram_precision(hypotheses: List[List[str]],
-                                 references_list: List[List[List[str]]],
-                                 n: int,
-                                 case_sensitive: bool) -> Tuple[float, int]:
+    def reference_ngram_counts(references_list: List[List[List[str]]],
+                               max_n: int,
+                               case_sensitive: bool) -> List[Counter]:
+        """Get n-gram counts of the references of each sentence
+
+        Arguments:
+            references_list: List of lists of reference sentences (as lists of
+                words)
+            max_n: Maximum n-gram order
+            case_sensitive: Whether to perform case-sensitive computation
+
+        Returns:
+            List of counts of n-grams of all orders up to max_n of the
+            references of each sentence merged using maximum values.
+        """
+        counts_list = []
+        for references in references_list:
+            counters = [BLEUEvaluator.all_ngram_counts(
+                reference, max_n, not case_sensitive)
+                        for reference in references]
+            if len(counters) == 1:
+                counts_list.append(counters[0])
+            else:
+                counts_list.append(
+                    BLEUEvaluator.merge_max_counters(counters))
+        return counts_list
+
+    @staticmethod
+    def modified_ngram_precision(
+            hypotheses: List[List[str]],
+            references_list: List[List[List[str]]],
+            n: int,
+            case_sensitive: bool,
+            reference_counts: Optional[List[Counter]] = None
+    ) -> Tuple[float, int]:
         """Computes the modified n-gram precision on a list of sentences
 
         Arguments:
@@ -74,35 +166,72 @@ class BLEUEvaluator(object):
                 words)
             n: n-gram order
             case_sensitive: Whether to perform case-sensitive computation
+            reference_counts: Precomputed merged reference counts of orders
+                up to at least n for each sentence as returned by
+                `reference_ngram_counts`. They are computed from
+                references_list if not provided.
         """
-        corpus_true_positives = 0
-        corpus_generated_length = 0
+        true_positives, generated_lengths = BLEUEvaluator.matched_ngrams(
+            hypotheses, references_list, n, case_sensitive, reference_counts)
+        corpus_true_positives = true_positives[n - 1]
+        corpus_generated_length = generated_lengths[n - 1]
 
-        for hypothesis, references in zip(hypotheses, references_list):
-            reference_counters = []
+        if corpus_generated_length == 0:
+            return 1, 0
 
-            for reference in references:
-                counter = BLEUEvaluator.ngram_counts(reference, n,
-                                                     not case_sensitive)
-                reference_counters.append(counter)
+        return (corpus_true_positives / corpus_generated_length,
+                corpus_generated_length)
 
-            reference_counts = BLEUEvaluator.merge_max_counters(
-                reference_counters)
-            hypothesis_counts = BLEUEvaluator.ngram_counts(hypothesis, n,
-                                                           not case_sensitive)
+    @staticmethod
+    def matched_ngrams(
+            hypotheses: List[List[str]],
+            references_list: List[List[List[str]]],
+            max_n: int,
+            case_sensitive: bool,
+            reference_counts: Optional[List[Counter]] = None
+    ) -> Tuple[List[int], List[int]]:
+        """Counts the matched and generated n-grams on a list of sentences
 
-            true_positives = 0
-            for ngram in hypothesis_counts:
-                true_positives += reference_counts[ngram]
+        The n-grams of all orders are extracted in a single pass over each
+        hypothesis. The matches of an n-gram are clipped by its count in the
+        references.
 
-            corpus_true_positives += true_positives
-            corpus_generated_length += sum(hypothesis_counts.values())
+        Arguments:
+            hypotheses: List of output sentences as lists of words
+            references_list: List of lists of reference sentences (as lists of
+                words)
+            max_n: Maximum n-gram order
+            case_sensitive: Whether to perform case-sensitive computation
+            reference_counts: Precomputed merged reference counts of orders
+                up to at least max_n for each sentence as returned by
+                `reference_ngram_counts`. They are computed from
+                references_list if not provided.
 
-        if corpus_generated_length == 0:
-            return 1, 0
+        Returns:
+            Lists of numbers of matched and generated n-grams of each order.
+        """
+        true_positives = [0] * max_n
+        generated_lengths = [0] * max_n
 
-        return (corpus_true_positives / corpus_generated_length,
-                corpus_generated_length)
+        if reference_counts is None:
+            reference_counts = BLEUEvaluator.reference_ngram_counts(
+                references_list, max_n, case_sensitive)
+
+        for hypothesis, sentence_reference_counts in zip(hypotheses,
+                                                         reference_counts):
+            hypothesis_counts = BLEUEvaluator.all_ngram_counts(
+                hypothesis, max_n, not case_sensitive)
+
+            for ngram, count in hypothesis_counts.items():
+                reference_count = sentence_reference_counts.get(ngram)
+                if reference_count:
+                    true_positives[len(ngram) - 1] += min(count,
+                                                          reference_count)
+
+            for order in range(min(max_n, len(hypothesis))):
+                generated_lengths[order] += len(hypothesis) - order
+
+        return true_positives, generated_lengths
 
     @staticmethod
     def effective_reference_length(
@@ -163,7 +292,8 @@ class BLEUEvaluator(object):
 
     @staticmethod
     def bleu(hypotheses: List[List[str]], references: List[List[List[str]]],
-             ngrams: int = 4, case_sensitive: bool = True):
+             ngrams: int = 4, case_sensitive: bool = True,
+             reference_counts: Optional[List[Counter]] = None):
         """Computes BLEU on a corpus with multiple references using uniform
         weights. Default is to use smoothing as in reference implementation on:
         https://github.com/ufal/qtleap/blob/master/cuni_train/bin/mteval-v13a.pl#L831-L873
@@ -174,15 +304,39 @@ class BLEUEvaluator(object):
                 reference.
             ngrams: Maximum order of n-grams. Default 4.
             case_sensitive: Perform case-sensitive computation. Default True.
+            reference_counts: Precomputed reference n-gram counts as
+                returned by `reference_ngram_counts`.
+        """
+        true_positives, generated_lengths = BLEUEvaluator.matched_ngrams(
+            hypotheses, references, ngrams, case_sensitive, reference_counts)
+
+        return BLEUEvaluator.bleu_from_counts(
+            true_positives, generated_lengths,
+            BLEUEvaluator.effective_reference_length(hypotheses, references),
+            sum([len(hyp) for hyp in hypotheses]))
+
+    # pylint: disable=invalid-name
+    # the symbols 'r', 'c', and 'bp' are taken from the formula in
+    # Papineni et al., it makes sense to follow the notation
+    @staticmethod
+    def bleu_from_counts(true_positives: List[int],
+                         generated_lengths: List[int],
+                         r: int, c: int) -> float:
+        """Computes BLEU from the corpus-level n-gram counts
+
+        Arguments:
+            true_positives: Number of matched n-grams for each order
+            generated_lengths: Number of hypothesis n-grams for each order
+            r: Effective reference length
+            c: Total length of the hypotheses
         """
         log_bleu = 0
-        weight = 1 / ngrams
+        weight = 1 / len(true_positives)
 
         smooth = 1.0
 
-        for order in range(1, ngrams + 1):
-            prec, gen_len = BLEUEvaluator.modified_ngram_precision(
-                hypotheses, references, order, case_sensitive)
+        for matched, gen_len in zip(true_positives, generated_lengths):
+            prec = matched / gen_len if gen_len != 0 else 1
 
             if prec == 0:
                 smooth *= 2
@@ -190,16 +344,11 @@ class BLEUEvaluator(object):
 
             log_bleu += weight * np.log(prec)
 
-        # pylint: disable=invalid-name
-        # the symbols 'r', 'c', and 'bp' are taken from the formula in
-        # Papineni et al., it makes sense to follow the notation
-        r = BLEUEvaluator.effective_reference_length(hypotheses, references)
-        c = sum([len(hyp) for hyp in hypotheses])
-
         bp = min(1 - r / c, 0) if c != 0 else -np.inf
         log_bleu += bp
 
         return np.exp(log_bleu)
+    # pylint: enable=invalid-name
 
     @staticmethod
     def deduplicate_sentences(sentences: List[List[str]]) -> List[List[str]]:
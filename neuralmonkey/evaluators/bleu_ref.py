@@ -1,20 +1,31 @@
-import tempfile
-from typing import List
+from typing import List, Optional
 import subprocess
 from neuralmonkey.logging import log
+from neuralmonkey.evaluators.reference_cache import ReferenceCache
+from neuralmonkey.evaluators.scorer_process import (
+    ScoreCache, write_temporary_file)
 
 # pylint: disable=too-few-public-methods
 # to be further refactored
 
 
 class BLEUReferenceImplWrapper(object):
-    """Wrapper for TectoMT's wrapper for reference NIST and BLEU scorer"""
+    """Wrapper for TectoMT's wrapper for reference NIST and BLEU scorer
 
-    def __init__(self, wrapper, name="BLEU", encoding="utf-8"):
+    The reference file is written only once for every reference series and
+    the scores are cached, so outputs which did not change are not scored
+    again.
+    """
+
+    def __init__(self, wrapper, name="BLEU", encoding="utf-8", timeout=None):
         log("Reference BLEU wrapper is deprecated", color="red")
         self.wrapper = wrapper
         self.encoding = encoding
         self.name = name
+        self.timeout = timeout
+
+        self._reference_files = ReferenceCache()
+        self._scores = ScoreCache(size=16)
 
     def serialize_to_bytes(self, sentences: List[List[str]]) -> bytes:
         joined = [" ".join(r) for r in sentences]
@@ -27,14 +38,25 @@ class BLEUReferenceImplWrapper(object):
         ref_bytes = self.serialize_to_bytes(references)
         dec_bytes = self.serialize_to_bytes(decoded)
 
-        reffile = tempfile.NamedTemporaryFile()
-        reffile.write(ref_bytes)
-        reffile.flush()
+        key = ScoreCache.key(ref_bytes, dec_bytes)
+        bleu_score = self._scores.get(key)
+        if bleu_score is None:
+            reffile = self._reference_files.get(
+                references, lambda: write_temporary_file(ref_bytes))
+            bleu_score = self._run(reffile.name, dec_bytes)
+            if bleu_score is None:
+                return 0.0
+            self._scores.put(key, bleu_score)
+
+        return bleu_score
 
-        output_proc = subprocess.run(["perl", self.wrapper, reffile.name],
+    def _run(self, reffile_name: str, dec_bytes: bytes) -> Optional[float]:
+        # raises subprocess.TimeoutExpired after the timeout (if any)
+        output_proc = subprocess.run(["perl", self.wrapper, reffile_name],
                                      input=dec_bytes,
                                      stderr=subprocess.PIPE,
-                                     stdout=subprocess.PIPE)
+                                     stdout=subprocess.PIPE,
+                                     timeout=self.timeout)
 
         proc_stdout = output_proc.stdout.decode("utf-8")  # type: ignore
         lines = proc_stdout.splitlines()
@@ -46,8 +68,8 @@ class BLEUReferenceImplWrapper(object):
             log("Error: Malformed output from BLEU wrapper:", color="red")
             log(proc_stdout, color="red")
             log("=======", color="red")
-            return 0.0
+            return None
         except ValueError:
             log("Value error - bleu '{}' is not a number.".format(lines[0]),
                 color="red")
-            return 0.0
+            return None
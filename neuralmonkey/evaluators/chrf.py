@@ -1,57 +1,86 @@
+from collections import Counter
 from typing import List, Optional
+import numpy as np
+
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 
 
 # pylint: disable=too-few-public-methods
-class ChrFEvaluator(object):
+class ChrFEvaluator(StreamingEvaluator):
     """Compute ChrF introduced in
     http://www.statmt.org/wmt15/pdf/WMT49.pdf
+
+    The implementation follows `lib/subword_nmt/chrF.py`: the character
+    n-grams of all orders up to `n` are counted with their multiplicities,
+    precision and recall are averaged over the orders and combined into the
+    F-score.
+
+    The statistics are the numbers of matched, hypothesis and reference
+    n-grams for every order followed by the number of sentences which differ
+    from their references.
     """
 
     def __init__(self, n: int = 3, beta: float = 1,
+                 spaces: bool = False,
                  name: Optional[str] = None) -> None:
+        """Create the ChrF evaluator.
+
+        Args:
+            n: Maximum order of the character n-grams.
+            beta: Weight of the recall in the F-score.
+            spaces: Flag whether the spaces between the tokens are treated as
+                characters. Otherwise, the tokens are concatenated.
+            name: Name of the evaluator.
+        """
         self.n = n
         # We store the squared value of Beta
         self.beta_2 = beta**2
+        self.spaces = spaces
 
         if name is not None:
             self.name = name
         else:
             self.name = "ChrF-{}".format(n)
 
-    # pylint: disable=too-many-locals
-    def __call__(self, hypotheses: List[List[str]],
-                 references: List[List[str]]) -> float:
-        chr_p_all = 0
-        chr_p_matched = 0
-        chr_r_all = 0
-        chr_r_matched = 0
+    def update(self, hypotheses: List[List[str]],
+               references: List[List[str]]) -> np.ndarray:
+        matched = np.zeros(self.n)
+        hyp_total = np.zeros(self.n)
+        ref_total = np.zeros(self.n)
+        different = 0
 
         for hyp, ref in zip(hypotheses, references):
-            hyp_joined = " ".join(hyp)
-            hyp_chars = list(hyp_joined)
-            ref_joined = " ".join(ref)
-            ref_chars = list(ref_joined)
-
-            # ChrP
-            for i in range(len(hyp_chars) - self.n + 1):
-                chr_p_all = chr_p_all + 1
-                if "".join(hyp_chars[i:i + self.n]) in ref_joined:
-                    chr_p_matched = chr_p_matched + 1
-
-            # ChrR
-            for i in range(len(ref_chars) - self.n + 1):
-                chr_r_all = chr_r_all + 1
-                if "".join(ref_chars[i:i + self.n]) in hyp_joined:
-                    chr_r_matched = chr_r_matched + 1
+            hyp_joined = self._join(hyp)
+            ref_joined = self._join(ref)
+
+            if hyp_joined != ref_joined:
+                different += 1
+
+            for order in range(1, self.n + 1):
+                hyp_ngrams = self.char_ngrams(hyp_joined, order)
+                ref_ngrams = self.char_ngrams(ref_joined, order)
+
+                matched[order - 1] += sum((hyp_ngrams & ref_ngrams).values())
+                hyp_total[order - 1] += max(len(hyp_joined) - order + 1, 0)
+                ref_total[order - 1] += max(len(ref_joined) - order + 1, 0)
+
+        return np.concatenate([matched, hyp_total, ref_total, [different]])
+
+    def finalize(self, stats: np.ndarray) -> float:
+        matched = stats[:self.n]
+        hyp_total = stats[self.n:2 * self.n]
+        ref_total = stats[2 * self.n:3 * self.n]
+        different = stats[-1]
 
         # If hyp/ref is too short we need to avoid division by zero
-        if len(hyp_chars) < self.n or len(ref_chars) < self.n:
-            if hyp_joined == ref_joined:
+        defined = (hyp_total > 0) & (ref_total > 0)
+        if not defined.any():
+            if different == 0:
                 return 1
             return 0
 
-        chr_p = chr_p_matched / chr_p_all
-        chr_r = chr_r_matched / chr_r_all
+        chr_p = np.sum(matched[defined] / hyp_total[defined]) / self.n
+        chr_r = np.sum(matched[defined] / ref_total[defined]) / self.n
 
         if chr_p == 0 and chr_r == 0:
             return 0
@@ -59,6 +88,17 @@ class ChrFEvaluator(object):
         return ((1 + self.beta_2)
                 * ((chr_p * chr_r) / (self.beta_2 * chr_p + chr_r)))
 
+    def _join(self, sentence: List[str]) -> str:
+        if self.spaces:
+            return " ".join(sentence).strip()
+        return "".join("".join(sentence).split())
+
+    @staticmethod
+    def char_ngrams(text: str, order: int) -> Counter:
+        """Count the character n-grams of the given order in a string."""
+        return Counter(text[i:i + order]
+                       for i in range(len(text) - order + 1))
+
 
 # pylint: disable=invalid-name
 ChrF3 = ChrFEvaluator(n=3)
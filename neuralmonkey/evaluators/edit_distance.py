@@ -1,22 +1,31 @@
 from typing import List
-from difflib import SequenceMatcher
 import numpy as np
 
+from neuralmonkey.levenshtein import lcs_length, map_pairs
+
 
 class EditDistanceEvaluator(object):
 
-    def __init__(self, name: str = "Edit distance") -> None:
+    def __init__(self, name: str = "Edit distance",
+                 num_workers: int = 1) -> None:
         self.name = name
+        self.num_workers = num_workers
 
     def __call__(self, decoded: List[List[str]],
                  references: List[List[str]]) -> float:
-        return 1 - np.mean([EditDistance.ratio(u" ".join(ref), u" ".join(dec))
-                            for dec, ref in zip(decoded, references)])
+        return 1 - np.mean(map_pairs(_sentence_ratio, references, decoded,
+                                     self.num_workers))
 
     @staticmethod
     def ratio(str1: str, str2: str) -> float:
-        matcher = SequenceMatcher(None, str1, str2)
-        return matcher.ratio()
+        """Compute the similarity of two strings.
+
+        The similarity is twice the length of the longest common
+        subsequence of the characters divided by the total length.
+        """
+        if not str1 and not str2:
+            return 1.0
+        return 2.0 * lcs_length(str1, str2) / (len(str1) + len(str2))
 
     @staticmethod
     def compare_scores(score1: float, score2: float) -> int:
@@ -24,5 +33,9 @@ class EditDistanceEvaluator(object):
         return (score1 < score2) - (score1 > score2)
 
 
+def _sentence_ratio(ref: List[str], dec: List[str]) -> float:
+    return EditDistanceEvaluator.ratio(u" ".join(ref), u" ".join(dec))
+
+
 # pylint: disable=invalid-name
 EditDistance = EditDistanceEvaluator()
@@ -1,23 +1,34 @@
 from typing import List, Set
 
+import numpy as np
 
-class F1Evaluator(object):
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
+
+
+class F1Evaluator(StreamingEvaluator):
     """ F1 evaluator for BIO tagging, e.g. NP chunking.
 
     The entities are annotated as beginning of the entity (B), continuation of
     the entity (I), the rest is outside the entity (O).
+
+    The score is the average of sentence-level F1 scores, the statistics are
+    the sum of the scores and the number of sentences.
     """
 
     def __init__(self, name: str = "F1 measure") -> None:
         self.name = name
 
-    def __call__(self, decoded: List[List[str]],
-                 references: List[List[str]]) -> float:
+    def update(self, decoded: List[List[str]],
+               references: List[List[str]]) -> np.ndarray:
         assert len(decoded) == len(references)
         f1sum = 0.0
         for d, r in zip(decoded, references):
             f1sum += F1Evaluator.f1_score(d, r)
-        return f1sum / len(decoded)
+        return np.array([f1sum, len(decoded)], dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        f1sum, count = stats
+        return float(f1sum) / float(count)
 
     @staticmethod
     def chunk2set(seq: List[str]) -> Set[str]:
@@ -1,8 +1,12 @@
-from typing import List, Tuple, Optional
+from collections import Counter
+from typing import Any, List, Tuple, Optional, Sequence
+import numpy as np
 from neuralmonkey.evaluators.bleu import BLEUEvaluator
+from neuralmonkey.evaluators.reference_cache import ReferenceCache
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 
 
-class GLEUEvaluator(object):
+class GLEUEvaluator(StreamingEvaluator):
     """
     Sentence-level evaluation metric that correlates with BLEU on corpus-level.
     From "Google's Neural Machine Translation System: Bridging the Gap
@@ -12,7 +16,8 @@ class GLEUEvaluator(object):
     GLEU is the minimum of recall and precision of all n-grams up to n in
     references and hypotheses.
 
-    Ngram counts are based on the bleu methods."""
+    Ngram counts are based on the bleu methods. The statistics are the
+    numbers of matched, generated and reference n-grams of all orders."""
 
     def __init__(self, n: int = 4, deduplicate: bool = False,
                  name: Optional[str] = None) -> None:
@@ -27,23 +32,46 @@ class GLEUEvaluator(object):
             if self.deduplicate:
                 self.name += "-dedup"
 
-    def __call__(self,
-                 decoded: List[List[str]],
-                 references: List[List[str]]) -> float:
+        self._reference_cache = ReferenceCache()
+
+    def reference_stats(self,
+                        references: Sequence[Any]) -> List[Counter]:
+        if not references:
+            # empty series (e.g. from init_stats) would evict the real ones
+            return []
+        return self._reference_cache.get(
+            references, lambda: BLEUEvaluator.reference_ngram_counts(
+                [[s] for s in references], self.n, case_sensitive=True))
+
+    def update(self,
+               decoded: List[List[str]],
+               references: List[List[str]],
+               reference_stats: Optional[List[Counter]] = None
+              ) -> np.ndarray:
         listed_references = [[s] for s in references]
 
         if self.deduplicate:
             decoded = self.bleu.deduplicate_sentences(decoded)
 
-        return GLEUEvaluator.gleu(decoded, listed_references, self.n)
+        if reference_stats is None:
+            reference_stats = self.reference_stats(references)
+
+        return np.array(GLEUEvaluator.total_counts(
+            decoded, listed_references, self.n, True, reference_stats),
+                        dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        prec, recall = GLEUEvaluator.precision_recall_from_counts(*stats)
+        return min(recall, prec)
 
-    # pylint: disable=too-many-locals
     @staticmethod
     def total_precision_recall(
             hypotheses: List[List[str]],
             references_list: List[List[List[str]]],
             ngrams: int,
-            case_sensitive: bool) -> Tuple[float, float]:
+            case_sensitive: bool,
+            reference_counts: Optional[List[Counter]] = None
+    ) -> Tuple[float, float]:
         """Computes the modified n-gram precision and recall
            on a list of sentences
 
@@ -53,44 +81,72 @@ class GLEUEvaluator(object):
                 words)
             ngrams: n-gram order
             case_sensitive: Whether to perform case-sensitive computation
+            reference_counts: Precomputed reference n-gram counts as
+                returned by `BLEUEvaluator.reference_ngram_counts`.
         """
-        corpus_true_positives = 0
-        corpus_generated_length = 0
-        corpus_target_length = 0
-
-        for n in range(1, ngrams + 1):
-            for hypothesis, references in zip(hypotheses, references_list):
-                reference_counters = []
-
-                for reference in references:
-                    counter = BLEUEvaluator.ngram_counts(reference, n,
-                                                         not case_sensitive)
-                    reference_counters.append(counter)
+        return GLEUEvaluator.precision_recall_from_counts(
+            *GLEUEvaluator.total_counts(hypotheses, references_list, ngrams,
+                                        case_sensitive, reference_counts))
 
-                reference_counts = BLEUEvaluator.merge_max_counters(
-                    reference_counters)
-                corpus_target_length += sum(reference_counts.values())
-
-                hypothesis_counts = BLEUEvaluator.ngram_counts(
-                    hypothesis, n, not case_sensitive)
-                true_positives = 0
-                for ngram in hypothesis_counts:
-                    true_positives += reference_counts[ngram]
+    @staticmethod
+    def precision_recall_from_counts(
+            true_positives: float,
+            generated_length: float,
+            target_length: float) -> Tuple[float, float]:
+        """Computes the precision and recall from the n-gram counts"""
+        if generated_length == 0:
+            return 0, 0
 
-                corpus_true_positives += true_positives
-                corpus_generated_length += sum(hypothesis_counts.values())
+        return (float(true_positives) / float(generated_length),
+                float(true_positives) / float(target_length))
 
-            if corpus_generated_length == 0:
-                return 0, 0
+    @staticmethod
+    def total_counts(
+            hypotheses: List[List[str]],
+            references_list: List[List[List[str]]],
+            ngrams: int,
+            case_sensitive: bool,
+            reference_counts: Optional[List[Counter]] = None
+    ) -> Tuple[int, int, int]:
+        """Counts the matched, generated and reference n-grams of all orders
+           on a list of sentences
 
-        return (corpus_true_positives / corpus_generated_length,
-                corpus_true_positives / corpus_target_length)
+        Arguments:
+            hypotheses: List of output sentences as lists of words
+            references_list: List of lists of reference sentences (as lists of
+                words)
+            ngrams: n-gram order
+            case_sensitive: Whether to perform case-sensitive computation
+            reference_counts: Precomputed reference n-gram counts as
+                returned by `BLEUEvaluator.reference_ngram_counts`.
+        """
+        if reference_counts is None:
+            reference_counts = BLEUEvaluator.reference_ngram_counts(
+                references_list, ngrams, case_sensitive)
+
+        true_positives, generated_lengths = BLEUEvaluator.matched_ngrams(
+            hypotheses, references_list, ngrams, case_sensitive,
+            reference_counts)
+
+        corpus_true_positives = sum(true_positives)
+        corpus_generated_length = sum(generated_lengths)
+        corpus_target_length = sum(
+            count
+            for _, sentence_reference_counts in zip(hypotheses,
+                                                    reference_counts)
+            for ngram, count in sentence_reference_counts.items()
+            if len(ngram) <= ngrams)
+
+        return (corpus_true_positives, corpus_generated_length,
+                corpus_target_length)
 
     @staticmethod
     def gleu(hypotheses: List[List[str]],
              references: List[List[List[str]]],
              ngrams: int = 4,
-             case_sensitive: bool = True) -> float:
+             case_sensitive: bool = True,
+             reference_counts: Optional[List[Counter]] = None
+            ) -> float:
         """Computes GLEU on a corpus with multiple references. No smoothing.
 
         Arguments:
@@ -99,8 +155,10 @@ class GLEUEvaluator(object):
                 reference.
             ngrams: Maximum order of n-grams. Default 4.
             case_sensitive: Perform case-sensitive computation. Default True.
+            reference_counts: Precomputed reference n-gram counts as
+                returned by `BLEUEvaluator.reference_ngram_counts`.
         """
         prec, recall = GLEUEvaluator.total_precision_recall(
-            hypotheses, references, ngrams, case_sensitive)
+            hypotheses, references, ngrams, case_sensitive, reference_counts)
 
         return min(recall, prec)
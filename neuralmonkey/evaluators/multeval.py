@@ -1,37 +1,53 @@
 import tempfile
 import subprocess
-from typing import List
+from typing import List, Optional
 
 from neuralmonkey.logging import log
+from neuralmonkey.evaluators.reference_cache import ReferenceCache
+from neuralmonkey.evaluators.scorer_process import (
+    ScoreCache, write_temporary_file)
 
 
 # pylint: disable=too-few-public-methods
 
 
 class MultEvalWrapper(object):
-    """Wrapper for mult-eval's reference BLEU and METEOR scorer."""
+    """Wrapper for mult-eval's reference BLEU and METEOR scorer.
+
+    MultEval cannot run as a server, so it is started for every evaluation.
+    The reference file is written only once for every reference series and
+    the scores are cached, so outputs which did not change are not scored
+    again.
+    """
 
     def __init__(self, wrapper: str, name: str = "MultEval",
                  encoding: str = "utf-8",
-                 metric: str = "bleu", language: str = "en") -> None:
+                 metric: str = "bleu", language: str = "en",
+                 timeout: Optional[float] = None) -> None:
         """
         :param wrapper: path to multeval.sh script
         :param name: name of the evaluator
         :param encoding: encoding of input files
         :param language: language of hypotheses and references
         :param metric: evaluation metric "bleu", "ter", "meteor"
+        :param timeout: maximum time in seconds of a MultEval run, after
+            which the evaluation fails; unlimited by default
         """
         self.wrapper = wrapper
         self.encoding = encoding
         self.name = "{}_{}_{}".format(name, metric, language)
         self.language = language
         self.metric = metric
+        self.timeout = timeout
 
         if self.metric not in ["bleu", "ter", "meteor"]:
             log("{} metric is not valid. Using bleu instead.".
                 format(self.metric), color="red")
             self.metric = "bleu"
 
+        self._reference_files = ReferenceCache()
+        self._scores = ScoreCache(size=16)
+
     def serialize_to_bytes(self, sentences: List[List[str]]) -> bytes:
         joined = [" ".join(r) for r in sentences]
         string = "\n".join(joined) + "\n"
@@ -43,25 +59,35 @@ class MultEvalWrapper(object):
         ref_bytes = self.serialize_to_bytes(references)
         dec_bytes = self.serialize_to_bytes(decoded)
 
-        with tempfile.NamedTemporaryFile() as reffile, \
-                tempfile.NamedTemporaryFile() as decfile:
+        key = ScoreCache.key(ref_bytes, dec_bytes)
+        eval_score = self._scores.get(key)
+        if eval_score is None:
+            reffile = self._reference_files.get(
+                references, lambda: write_temporary_file(ref_bytes))
+            eval_score = self._run(reffile.name, dec_bytes)
+            if eval_score is None:
+                return 0.0
+            self._scores.put(key, eval_score)
 
-            reffile.write(ref_bytes)
-            reffile.flush()
+        return eval_score
 
+    def _run(self, reffile_name: str, dec_bytes: bytes) -> Optional[float]:
+        with tempfile.NamedTemporaryFile() as decfile:
             decfile.write(dec_bytes)
             decfile.flush()
 
-            args = [self.wrapper, "eval", "--refs", reffile.name,
+            args = [self.wrapper, "eval", "--refs", reffile_name,
                     "--hyps-baseline", decfile.name, "--metrics", self.metric]
             if self.metric == "meteor":
                 args.extend(["--meteor.language", self.language])
                 # problem: if meteor run for the first time,
                 # paraphrase tables are downloaded
 
+            # raises subprocess.TimeoutExpired after the timeout (if any)
             output_proc = subprocess.run(args,
                                          stderr=subprocess.PIPE,
-                                         stdout=subprocess.PIPE)
+                                         stdout=subprocess.PIPE,
+                                         timeout=self.timeout)
 
             proc_stdout = output_proc.stdout.decode("utf-8")  # type: ignore
             lines = proc_stdout.splitlines()
@@ -77,8 +103,8 @@ class MultEvalWrapper(object):
                     color="red")
                 log(proc_stdout, color="red")
                 log("=======", color="red")
-                return 0.0
+                return None
             except ValueError:
                 log("Value error - '{}' is not a number.".format(lines[0]),
                     color="red")
-                return 0.0
+                return None
@@ -0,0 +1,76 @@
+"""Cache of statistics computed from reference series.
+
+The references of validation datasets do not change during training, so the
+evaluators can compute their reference statistics (e.g. n-gram counts) only
+the first time they see a reference series and reuse them afterwards.
+"""
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+# pylint: disable=too-few-public-methods
+class ReferenceCache(object):
+    """Cache of values computed from reference series.
+
+    The series are identified by the object identity, i.e. an in-memory
+    dataset returns the same series object every time it is asked for it.
+    The cache keeps a reference to the series objects it stores, so their
+    identity cannot be reused by another object.
+
+    Series seen for the first time are kept in a small segment, which is
+    rotated e.g. by the batches evaluated during training. Series evaluated
+    repeatedly (such as validation data) are promoted to a separate segment
+    and are not evicted by the one-off series.
+    """
+
+    def __init__(self, size: int = 8, new_series_size: int = 2) -> None:
+        """Create a new cache.
+
+        Args:
+            size: Maximum number of repeatedly evaluated series to keep.
+            new_series_size: Maximum number of series seen only once to keep.
+        """
+        self.size = size
+        self.new_series_size = new_series_size
+
+        # both map ids of the series to tuples (series, value)
+        self._new_series = OrderedDict()  # type: OrderedDict
+        self._repeated_series = OrderedDict()  # type: OrderedDict
+
+    def __getstate__(self) -> Any:
+        # evaluators sent to worker processes do not carry the cached series
+        return self.size, self.new_series_size
+
+    def __setstate__(self, state: Any) -> None:
+        self.__init__(*state)  # type: ignore
+
+    def get(self, references: Any, compute: Callable[[], Any]) -> Any:
+        """Get the value for a reference series, computing it if needed.
+
+        Args:
+            references: The reference series.
+            compute: Function computing the value for the series.
+
+        Returns:
+            The cached or the newly computed value.
+        """
+        key = id(references)
+
+        entry = self._repeated_series.get(key)
+        if entry is not None and entry[0] is references:
+            self._repeated_series.move_to_end(key)
+            return entry[1]
+
+        entry = self._new_series.pop(key, None)
+        if entry is not None and entry[0] is references:
+            self._repeated_series[key] = entry
+            if len(self._repeated_series) > self.size:
+                self._repeated_series.popitem(last=False)
+            return entry[1]
+
+        value = compute()
+        self._new_series[key] = (references, value)
+        if len(self._new_series) > self.new_series_size:
+            self._new_series.popitem(last=False)
+
+        return value
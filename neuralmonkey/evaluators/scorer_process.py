@@ -0,0 +1,157 @@
+"""Helpers for evaluators wrapping external scoring tools.
+
+Starting an external scorer (often a JVM) can take longer than the scoring
+itself. Tools with an interactive mode are kept running in a
+`ScorerProcess` and queried line by line. For tools that can only score
+whole files, `ScoreCache` avoids running them again on outputs which did
+not change.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import select
+import subprocess
+import tempfile
+# pylint: disable=unused-import
+from typing import Any, List, Optional
+# pylint: enable=unused-import
+
+from neuralmonkey.logging import warn
+
+
+class ScorerProcess(object):
+    """A long-lived scorer process answering requests line by line.
+
+    Each request is a single line written to the standard input of the
+    process, the response is the next line on its standard output. If the
+    process crashes or does not answer in time, it is killed and started
+    again, and the request is repeated.
+    """
+
+    def __init__(self,
+                 args: List[str],
+                 encoding: str = "utf-8",
+                 timeout: float = 60.,
+                 max_restarts: int = 3) -> None:
+        """Create a scorer process. The process is started lazily.
+
+        Args:
+            args: Command line of the scorer.
+            encoding: Encoding of the requests and responses.
+            timeout: Maximum time in seconds to wait for a response.
+            max_restarts: How many times a request is repeated in a
+                restarted process before giving up.
+        """
+        self.args = args
+        self.encoding = encoding
+        self.timeout = timeout
+        self.max_restarts = max_restarts
+
+        self._process = None  # type: Optional[subprocess.Popen]
+        self._owner_pid = os.getpid()
+        self._buffer = b""
+
+    def query(self, line: str) -> str:
+        """Send a request line and return the response line."""
+        restarts = 0
+        while True:
+            try:
+                return self._query(line)
+            except (OSError, RuntimeError) as exc:
+                self.close()
+                if restarts >= self.max_restarts:
+                    raise
+                restarts += 1
+                warn("Scorer '{}' failed ({}), restarting it."
+                     .format(self.args[0], exc))
+
+    def _query(self, line: str) -> str:
+        if self._owner_pid != os.getpid():
+            # a forked process must not share the pipes with its parent
+            self._process = None
+            self._owner_pid = os.getpid()
+
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+        assert self._process is not None
+
+        self._process.stdin.write((line + "\n").encode(self.encoding))
+        self._process.stdin.flush()
+
+        return self._read_line().decode(self.encoding).rstrip("\n")
+
+    def _start(self) -> None:
+        self.close()
+        self._process = subprocess.Popen(
+            self.args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+        self._buffer = b""
+
+    def _read_line(self) -> bytes:
+        assert self._process is not None
+        stdout = self._process.stdout.fileno()
+
+        while b"\n" not in self._buffer:
+            ready, _, _ = select.select([stdout], [], [], self.timeout)
+            if not ready:
+                raise RuntimeError("no response in {} seconds"
+                                   .format(self.timeout))
+            chunk = os.read(stdout, 65536)
+            if not chunk:
+                raise RuntimeError("process exited with code {}"
+                                   .format(self._process.wait()))
+            self._buffer += chunk
+
+        response, self._buffer = self._buffer.split(b"\n", 1)
+        return response
+
+    def close(self) -> None:
+        """Terminate the scorer process if it is running."""
+        if self._process is None or self._owner_pid != os.getpid():
+            return
+
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process = None
+
+    def __del__(self) -> None:
+        self.close()
+
+
+class ScoreCache(object):
+    """Bounded cache of scores indexed by the scored data."""
+
+    def __init__(self, size: int = 100000) -> None:
+        self.size = size
+        self._scores = OrderedDict()  # type: OrderedDict
+
+    @staticmethod
+    def key(*data: bytes) -> bytes:
+        """Create a compact cache key from the scored data."""
+        digest = hashlib.sha1()
+        for item in data:
+            digest.update(len(item).to_bytes(8, "little"))
+            digest.update(item)
+        return digest.digest()
+
+    def get(self, key: Any) -> Optional[Any]:
+        score = self._scores.get(key)
+        if score is not None:
+            self._scores.move_to_end(key)
+        return score
+
+    def put(self, key: Any, score: Any) -> None:
+        self._scores[key] = score
+        if len(self._scores) > self.size:
+            self._scores.popitem(last=False)
+
+
+def write_temporary_file(data: bytes) -> Any:
+    """Write data to a named temporary file deleted when it is collected."""
+    tmpfile = tempfile.NamedTemporaryFile()
+    tmpfile.write(data)
+    tmpfile.flush()
+    return tmpfile
@@ -0,0 +1,130 @@
+"""Paired bootstrap resampling for comparing outputs of more systems.
+
+The test (Koehn, 2004) draws samples of the test set with replacement and
+compares the scores of the systems on each of them. The scores are computed
+from per-sentence sufficient statistics of streaming evaluators: the
+statistics of a sample are the sum of the statistics of its sentences, so
+all samples are evaluated by a single matrix product of the sentence counts
+in the samples with the sentence statistics.
+"""
+# pylint: disable=unused-import
+from typing import Any, List, NamedTuple, Optional
+# pylint: enable=unused-import
+
+import numpy as np
+
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
+
+
+# Scores of the systems on the whole test set and on the bootstrap samples
+# (a matrix of shape (systems, samples)), and the matrix whose item [i, j] is
+# the fraction of the samples on which the system i is better than system j.
+# pylint: disable=invalid-name
+BootstrapResult = NamedTuple('BootstrapResult',
+                             [('scores', np.ndarray),
+                              ('sample_scores', np.ndarray),
+                              ('wins', np.ndarray)])
+# pylint: enable=invalid-name
+
+
+def sentence_stats(evaluator: StreamingEvaluator,
+                   decoded: List[Any],
+                   references: List[Any]) -> np.ndarray:
+    """Compute the evaluator statistics of every sentence.
+
+    The statistics of the references (if the evaluator has any) are
+    computed once for the whole series, as in `run_on_dataset`.
+
+    Returns:
+        Matrix of shape `(sentences, statistics)`.
+    """
+    reference_stats = evaluator.reference_stats(references)
+    if reference_stats is None:
+        return np.stack([evaluator.update([hyp], [ref])
+                         for hyp, ref in zip(decoded, references)])
+
+    return np.stack([evaluator.update([hyp], [ref], reference_stats=[stats])
+                     for hyp, ref, stats in zip(decoded, references,
+                                                reference_stats)])
+
+
+def bootstrap_scores(evaluator: StreamingEvaluator,
+                     system_stats: List[np.ndarray],
+                     num_samples: int = 1000,
+                     seed: Optional[int] = None,
+                     chunk_size: int = 100) -> np.ndarray:
+    """Score the systems on the same random samples of the test set.
+
+    Args:
+        evaluator: The evaluator computing the scores from the statistics.
+        system_stats: Per-sentence statistics of each system.
+        num_samples: Number of bootstrap samples.
+        seed: Seed of the random number generator.
+        chunk_size: Number of samples drawn at once, which limits the
+            memory used by the sample matrices.
+
+    Returns:
+        Matrix of the scores of shape `(systems, samples)`.
+    """
+    num_sentences = system_stats[0].shape[0]
+    if any(stats.shape[0] != num_sentences for stats in system_stats):
+        raise ValueError("All systems must be evaluated on the same data.")
+
+    random = np.random.RandomState(seed)
+    scores = np.empty((len(system_stats), num_samples))
+
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+
+        # how many times each sentence occurs in each sample
+        indices = random.randint(num_sentences, size=(size, num_sentences))
+        indices += num_sentences * np.arange(size)[:, np.newaxis]
+        counts = np.bincount(indices.ravel(),
+                             minlength=size * num_sentences).reshape(
+                                 size, num_sentences)
+
+        for system, stats in enumerate(system_stats):
+            sample_stats = counts.dot(stats)
+            scores[system, start:start + size] = [
+                evaluator.finalize(row) for row in sample_stats]
+
+    return scores
+
+
+def paired_bootstrap(evaluator: StreamingEvaluator,
+                     system_stats: List[np.ndarray],
+                     num_samples: int = 1000,
+                     seed: Optional[int] = None) -> BootstrapResult:
+    """Run the paired bootstrap test between every pair of systems.
+
+    The scores are compared by the `compare_scores` method of the evaluator
+    if it has one, higher scores are considered better otherwise.
+
+    Args:
+        evaluator: The evaluator computing the scores from the statistics.
+        system_stats: Per-sentence statistics of each system.
+        num_samples: Number of bootstrap samples.
+        seed: Seed of the random number generator.
+    """
+    scores = np.array([evaluator.finalize(stats.sum(axis=0))
+                       for stats in system_stats])
+    sample_scores = bootstrap_scores(evaluator, system_stats, num_samples,
+                                     seed)
+
+    compare = getattr(evaluator, "compare_scores", None)
+    num_systems = len(system_stats)
+    wins = np.zeros((num_systems, num_systems))
+
+    for i in range(num_systems):
+        for j in range(num_systems):
+            if i == j:
+                continue
+            if compare is None:
+                better = sample_scores[i] > sample_scores[j]
+            else:
+                better = [compare(score_i, score_j) > 0 for score_i, score_j
+                          in zip(sample_scores[i].tolist(),
+                                 sample_scores[j].tolist())]
+            wins[i, j] = np.mean(better)
+
+    return BootstrapResult(scores, sample_scores, wins)
@@ -0,0 +1,70 @@
+"""Evaluators computing the score from sufficient statistics.
+
+Most of the metrics can be computed from a few numbers summed over the
+sentences (n-gram matches and lengths for BLEU, edit distances and lengths for
+WER, etc.). Evaluators implementing the `StreamingEvaluator` interface can be
+thus updated batch by batch during the model execution, so the outputs do not
+need to be kept in memory, and the statistics can be merged across processes
+or grid shards before computing the final score.
+"""
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+class StreamingEvaluator(object):
+    """Base class for evaluators computing the score from additive statistics.
+
+    The statistics are numpy vectors; the statistics of a batch of sentences
+    are computed by `update`, statistics of more batches are combined by
+    `merge` and the score is computed from the total statistics by
+    `finalize`. Calling the evaluator on a list of sentences is equivalent to
+    running these steps on a single batch.
+    """
+
+    def __call__(self, decoded: Iterable[Any],
+                 references: Iterable[Any]) -> float:
+        return self.finalize(self.update(decoded, references))
+
+    def init_stats(self) -> np.ndarray:
+        """Get the statistics of an empty set of sentences."""
+        return self.update([], [])
+
+    # pylint: disable=no-self-use,unused-argument
+    def reference_stats(self,
+                        references: Sequence[Any]) -> Optional[List[Any]]:
+        """Compute the statistics of each sentence of a reference series.
+
+        Evaluators which spend time on the references alone (e.g. counting
+        the reference n-grams) compute them once for the whole series here
+        and get the statistics of the sentences of a batch in `update`.
+        The others return None.
+        """
+        return None
+    # pylint: enable=no-self-use,unused-argument
+
+    def update(self, decoded: Iterable[Any],
+               references: Iterable[Any]) -> np.ndarray:
+        """Compute the statistics of a batch of sentences.
+
+        The evaluators which provide the `reference_stats` also accept them
+        for the sentences of the batch as the ``reference_stats`` argument.
+
+        Arguments:
+            decoded: Batch of the model outputs.
+            references: Batch of the corresponding references.
+
+        Returns:
+            The statistics of the batch.
+        """
+        raise NotImplementedError()
+
+    # pylint: disable=no-self-use
+    def merge(self, stats1: np.ndarray, stats2: np.ndarray) -> np.ndarray:
+        """Combine statistics of two disjoint sets of sentences."""
+        return stats1 + stats2
+    # pylint: enable=no-self-use
+
+    def finalize(self, stats: np.ndarray) -> float:
+        """Compute the score from the statistics of all sentences."""
+        raise NotImplementedError()
@@ -1,24 +1,41 @@
-import pyter
+import numpy as np
+
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
+from neuralmonkey.levenshtein import map_pairs, translation_edit_rate
 
 
 # pylint: disable=too-few-public-methods
-class TEREvaluator(object):
-    """Compute TER using the pyter library."""
-    def __init__(self, name: str = "TER") -> None:
+class TEREvaluator(StreamingEvaluator):
+    """Compute TER with the algorithm of the pyter library.
+
+    The statistics are the sum of sentence-level TER scores and the number of
+    sentences.
+    """
+    def __init__(self, name: str = "TER", num_workers: int = 1) -> None:
         self.name = name
+        self.num_workers = num_workers
+
+    def update(self, decoded, references) -> np.ndarray:
+        scores = map_pairs(_sentence_ter, decoded, references,
+                           self.num_workers)
+        return np.array([sum(scores), len(scores)], dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        ter_sum, count = stats
+        return float(ter_sum) / float(count)
+
+    @staticmethod
+    def compare_scores(score1: float, score2: float) -> int:
+        # the lower the better
+        return (score1 < score2) - (score1 > score2)
+
 
-    def __call__(self, decoded, references) -> float:
-        ter_sum = 0.
-        count = 0
-        for hyp, ref in zip(decoded, references):
-            count += 1
-            if ref and hyp:
-                ter_sum += pyter.ter(hyp, ref)
-            elif not ref and not hyp:
-                ter_sum += 0.
-            else:
-                ter_sum += 1.
-        return ter_sum / count
+def _sentence_ter(hyp, ref) -> float:
+    if ref and hyp:
+        return translation_edit_rate(hyp, ref)
+    elif not ref and not hyp:
+        return 0.
+    return 1.
 
 
 TER = TEREvaluator()
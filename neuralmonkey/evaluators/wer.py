@@ -1,27 +1,46 @@
 from typing import Iterable, List
 
-import pyter
+import numpy as np
+
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
+from neuralmonkey.levenshtein import levenshtein, map_pairs
 
 
 # pylint: disable=too-few-public-methods
-class WEREvaluator(object):
-    """Compute WER (word error rate, used in speech recognition)."""
-    def __init__(self, name: str = "WER") -> None:
+class WEREvaluator(StreamingEvaluator):
+    """Compute WER (word error rate, used in speech recognition).
+
+    The statistics are the sum of edit distances and the sum of reference
+    lengths.
+    """
+    def __init__(self, name: str = "WER", num_workers: int = 1) -> None:
         self.name = name
+        self.num_workers = num_workers
+
+    def update(self, decoded: Iterable[List],
+               references: Iterable[List]) -> np.ndarray:
+        references = list(references)
+        distances = map_pairs(_distance, decoded, references,
+                              self.num_workers)
+        return np.array([sum(distances), sum(len(ref) for ref in references)],
+                        dtype=np.float64)
+
+    def finalize(self, stats: np.ndarray) -> float:
+        dist_sum, length_sum = stats
+        return float(dist_sum) / float(length_sum)
+
+    @staticmethod
+    def compare_scores(score1: float, score2: float) -> int:
+        # the lower the better
+        return (score1 < score2) - (score1 > score2)
+
 
-    def __call__(self, decoded: Iterable[List],
-                 references: Iterable[List]) -> float:
-        dist_sum = 0
-        length_sum = 0
-        for hyp, ref in zip(decoded, references):
-            length_sum += len(ref)
-            if ref and hyp:
-                dist_sum += pyter.edit_distance(hyp, ref)
-            elif not ref and not hyp:
-                dist_sum += 0
-            else:
-                dist_sum += len(ref)
-        return dist_sum / length_sum
+def _distance(hyp: List, ref: List) -> int:
+    if ref and hyp:
+        return levenshtein(hyp, ref)
+    elif not ref and not hyp:
+        return 0
+    return len(ref)
 
 
 WER = WEREvaluator()
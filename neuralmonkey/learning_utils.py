@@ -2,6 +2,10 @@
 # TODO de-clutter this file!
 
 from typing import Any, Callable, Dict, List, Tuple, Optional, Union, Iterable
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import copy
+import pickle
 import time
 import re
 from datetime import timedelta
@@ -10,11 +14,19 @@ import tensorflow as tf
 from termcolor import colored
 
 from neuralmonkey.logging import log, log_print, warn, notice
-from neuralmonkey.dataset import Dataset, LazyDataset
+from neuralmonkey.dataset import Dataset, LazyDataset, OutputDef
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 from neuralmonkey.tf_manager import TensorFlowManager
 from neuralmonkey.runners.base_runner import BaseRunner, ExecutionResult
+from neuralmonkey.runners.beamsearch_runner import BeamSearchNBestRunner
+from neuralmonkey.runners.scoring_runner import ScoringRunner
 from neuralmonkey.trainers.generic_trainer import GenericTrainer
 from neuralmonkey.tf_utils import gpu_memusage
+from neuralmonkey.worker_pool import WorkerPool
+from neuralmonkey.writers.output_writer import OutputWriter
+from neuralmonkey.writers.numpy_writer import AdaptiveNumpyWriter
+from neuralmonkey.writers.plain_text_writer import (NBestWriter,
+                                                    PlainTextWriter)
 from typeguard import check_argument_types
 
 # pylint: disable=invalid-name
@@ -23,6 +35,9 @@ SeriesName = str
 EvalConfiguration = List[Union[Tuple[SeriesName, Any],
                                Tuple[SeriesName, SeriesName, Any]]]
 Postprocess = Optional[List[Tuple[SeriesName, Callable]]]
+# dataset, execution results, outputs, evaluation and evaluator durations
+ValidationResult = Tuple[Dataset, List[ExecutionResult], Dict[str, List[Any]],
+                         Evaluation, Dict[str, float]]
 # pylint: enable=invalid-name
 
 
@@ -46,7 +61,9 @@ def training_loop(tf_manager: TensorFlowManager,
                   train_start_offset: int = 0,
                   runners_batch_size: Optional[int] = None,
                   initial_variables: Optional[Union[str, List[str]]] = None,
-                  postprocess: Postprocess = None) -> None:
+                  postprocess: Postprocess = None,
+                  evaluation_workers: int = 1,
+                  async_validation: bool = False) -> None:
     """
     Performs the training loop for given graph and data.
     Args:
@@ -72,7 +89,8 @@ def training_loop(tf_manager: TensorFlowManager,
         test_datasets: List of datasets used for testing
         logging_period: after how many batches should the logging happen. It
             can also be defined as a time period in format like: 3s; 4m; 6h;
-            1d; 3m15s; 3seconds; 4minutes; 6hours; 1days
+            1d; 3m15s; 3seconds; 4minutes; 6hours; 1days. When the trainer
+            accumulates gradients, the batches are counted by the updates.
         validation_period: after how many batches should the validation happen.
             It can also be defined as a time period in same format as logging
         val_preview_input_series: which input series to preview in validation
@@ -87,6 +105,13 @@ def training_loop(tf_manager: TensorFlowManager,
             continuation of training
         postprocess: A function which takes the dataset with its output series
             and generates additional series from them.
+        evaluation_workers: Number of processes running the evaluators on
+            the validation and test data.
+        async_validation: Flag whether the validation runs in the
+            background while the training continues. The variables are
+            copied to separate sessions at the validation time, the results
+            are reported when the validation finishes. The model is then
+            kept twice in the memory.
     """
     check_argument_types()
 
@@ -124,6 +149,8 @@ def training_loop(tf_manager: TensorFlowManager,
                              "the main metric")
 
     step = 0
+    # batches including those whose gradients are only accumulated
+    micro_step = 0
     seen_instances = 0
     last_seen_instances = 0
 
@@ -141,6 +168,89 @@ def training_loop(tf_manager: TensorFlowManager,
             log_directory, tf_manager.sessions[0].graph)
         log("TensorBoard writer initialized.")
 
+    def report_validation(validation: List[ValidationResult],
+                          sessions: List[tf.Session], epoch_n: int,
+                          batch_n: int, seen_instances: int) -> None:
+        """Log the validation results, save the variables if they are good.
+
+        The sessions hold the validated variables.
+        """
+        for val_id, (valset, val_results, val_outputs, val_evaluation,
+                     _) in enumerate(validation):
+            valheader = ("Validation (epoch {}, batch number {}):"
+                         .format(epoch_n, batch_n))
+            log(valheader, color='blue')
+            _print_examples(
+                valset, val_outputs, val_preview_input_series,
+                val_preview_output_series,
+                val_preview_num_examples)
+            log_print("")
+            log(valheader, color='blue')
+
+            # The last validation set is selected to be the main
+            if val_id == len(validation) - 1:
+                this_score = val_evaluation[main_metric]
+                # store also graph parts
+                all_coders = set.union(
+                    *[rnr.all_coders
+                      for rnr in runners +
+                      [trainer]])  # type: ignore
+                tf_manager.validation_hook(this_score, epoch_n, batch_n,
+                                           sessions, model_parts=all_coders)
+
+                if this_score == tf_manager.best_score:
+                    best_score_str = colored(
+                        "{:.4g}".format(tf_manager.best_score),
+                        attrs=['bold'])
+                else:
+                    best_score_str = "{:.4g}".format(
+                        tf_manager.best_score)
+
+                log("best {} on validation: {} (in epoch {}, "
+                    "after batch number {})"
+                    .format(main_metric, best_score_str,
+                            tf_manager.best_score_epoch,
+                            tf_manager.best_score_batch),
+                    color='blue')
+
+            if len(validation) > 1:
+                valset_name = valset.name
+            else:
+                valset_name = None
+            _log_continuous_evaluation(
+                tb_writer, tf_manager, main_metric, val_evaluation,
+                seen_instances, epoch_n, epochs, val_results,
+                train=False, dataset_name=valset_name)
+
+    # the future of the background validation with the epoch, batch number,
+    # seen instances and time when it was started
+    pending_validation = \
+        None  # type: Optional[Tuple[Future, int, int, int, float]]
+    validation_pool = None  # type: Optional[ThreadPoolExecutor]
+    val_manager = None  # type: Optional[TensorFlowManager]
+    # the evaluators cache statistics (e.g. of the references), which must
+    # not be updated by the training logging and the validation at once;
+    # the runners only create new executables for each batch
+    val_evaluators = evaluators
+    if async_validation:
+        val_manager = tf_manager.fork()
+        val_evaluators = copy.deepcopy(evaluators)
+        validation_pool = ThreadPoolExecutor(1)
+
+    def finish_validation() -> None:
+        nonlocal pending_validation
+        assert pending_validation is not None
+        future, epoch_n, batch_n, instances, start_time = pending_validation
+        validation = future.result()
+        pending_validation = None
+
+        log_print("")
+        report_validation(validation, val_manager.sessions, epoch_n, batch_n,
+                          instances)
+        log("Validation finished after {:.2f}s in the background."
+            .format(time.perf_counter() - start_time), color="blue")
+        log_print("")
+
     log("Starting training")
     last_log_time = time.process_time()
     last_val_time = time.process_time()
@@ -160,23 +270,32 @@ def training_loop(tf_manager: TensorFlowManager,
                     _skip_lines(train_start_offset, train_batched_datasets)
 
             for batch_n, batch_dataset in enumerate(train_batched_datasets):
-                step += 1
+                micro_step += 1
                 seen_instances += len(batch_dataset)
+                if micro_step % trainer.accumulation_steps != 0:
+                    # the model is updated with the last accumulated batch
+                    tf_manager.execute(batch_dataset, [trainer.accumulation],
+                                       train=True, summaries=False)
+                    continue
+
+                step += 1
                 if _is_logging_time(step, log_period_batch,
                                     last_log_time, log_period_time):
                     trainer_result = tf_manager.execute(
                         batch_dataset, [trainer], train=True,
                         summaries=True)
-                    train_results, train_outputs = run_on_dataset(
-                        tf_manager, runners, batch_dataset,
-                        postprocess, write_out=False,
-                        batch_size=runners_batch_size)
+                    train_results, train_outputs, train_stats = \
+                        run_on_dataset(
+                            tf_manager, runners, batch_dataset,
+                            postprocess, write_out=False,
+                            batch_size=runners_batch_size,
+                            evaluators=evaluators)
                     # ensure train outputs are iterable more than once
                     train_outputs = {k: list(v) for k, v
                                      in train_outputs.items()}
                     train_evaluation = evaluation(
                         evaluators, batch_dataset, runners,
-                        train_results, train_outputs)
+                        train_results, train_outputs, train_stats)
 
                     _log_continuous_evaluation(
                         tb_writer, tf_manager, main_metric, train_evaluation,
@@ -187,73 +306,45 @@ def training_loop(tf_manager: TensorFlowManager,
                     tf_manager.execute(batch_dataset, [trainer],
                                        train=True, summaries=False)
 
+                if (pending_validation is not None
+                        and pending_validation[0].done()):
+                    finish_validation()
+
                 if _is_logging_time(step, val_period_batch,
                                     last_val_time, val_period_time):
                     log_print("")
-                    val_duration_start = time.process_time()
-                    val_examples = 0
-                    for val_id, valset in enumerate(val_datasets):
-                        val_examples += len(valset)
 
-                        val_results, val_outputs = run_on_dataset(
-                            tf_manager, runners, valset,
-                            postprocess, write_out=False,
-                            batch_size=runners_batch_size)
-                        # ensure val outputs are iterable more than once
-                        val_outputs = {k: list(v)
-                                       for k, v in val_outputs.items()}
-                        val_evaluation = evaluation(
-                            evaluators, valset, runners, val_results,
-                            val_outputs)
-
-                        valheader = ("Validation (epoch {}, batch number {}):"
-                                     .format(epoch_n, batch_n))
-                        log(valheader, color='blue')
-                        _print_examples(
-                            valset, val_outputs, val_preview_input_series,
-                            val_preview_output_series,
-                            val_preview_num_examples)
-                        log_print("")
-                        log(valheader, color='blue')
-
-                        # The last validation set is selected to be the main
-                        if val_id == len(val_datasets) - 1:
-                            this_score = val_evaluation[main_metric]
-                            tf_manager.validation_hook(this_score, epoch_n,
-                                                       batch_n)
-
-                            if this_score == tf_manager.best_score:
-                                best_score_str = colored(
-                                    "{:.4g}".format(tf_manager.best_score),
-                                    attrs=['bold'])
-
-                                # store also graph parts
-                                all_coders = set.union(
-                                    *[rnr.all_coders
-                                      for rnr in runners +
-                                      [trainer]])  # type: ignore
-                                for coder in all_coders:
-                                    for session in tf_manager.sessions:
-                                        coder.save(session)
-                            else:
-                                best_score_str = "{:.4g}".format(
-                                    tf_manager.best_score)
-
-                            log("best {} on validation: {} (in epoch {}, "
-                                "after batch number {})"
-                                .format(main_metric, best_score_str,
-                                        tf_manager.best_score_epoch,
-                                        tf_manager.best_score_batch),
-                                color='blue')
-
-                        if len(val_datasets) > 1:
-                            valset_name = valset.name
-                        else:
-                            valset_name = None
-                        _log_continuous_evaluation(
-                            tb_writer, tf_manager, main_metric, val_evaluation,
-                            seen_instances, epoch_n, epochs, val_results,
-                            train=False, dataset_name=valset_name)
+                    if async_validation:
+                        if pending_validation is not None:
+                            # the previous validation has not finished yet
+                            finish_validation()
+                        tf_manager.copy_variables(val_manager)
+                        pending_validation = (
+                            validation_pool.submit(
+                                _run_validation, val_manager, val_datasets,
+                                runners, postprocess, runners_batch_size,
+                                val_evaluators, evaluation_workers),
+                            epoch_n, batch_n, seen_instances,
+                            time.perf_counter())
+                        log("Validation started in the background.",
+                            color='blue')
+                        last_val_time = time.process_time()
+                        continue
+
+                    val_duration_start = time.process_time()
+                    validation = _run_validation(
+                        tf_manager, val_datasets, runners, postprocess,
+                        runners_batch_size, evaluators, evaluation_workers)
+                    report_validation(validation, tf_manager.sessions,
+                                      epoch_n, batch_n, seen_instances)
+
+                    val_examples = sum(len(valset) for valset, *_
+                                       in validation)
+                    eval_durations = {}  # type: Dict[str, float]
+                    for *_, val_durations in validation:
+                        for eval_name, duration in val_durations.items():
+                            eval_durations[eval_name] = (
+                                eval_durations.get(eval_name, 0.) + duration)
 
                     # how long was the training between validations
                     training_duration = val_duration_start - last_val_time
@@ -270,6 +361,11 @@ def training_loop(tf_manager: TensorFlowManager,
                                          steptime, valtime), color="blue")
                     if training_duration < 2 * val_duration:
                         notice("Validation period setting is inefficient.")
+                        if eval_durations:
+                            slowest = max(eval_durations,
+                                          key=eval_durations.get)
+                            notice("The slowest evaluator is {} ({:.2f}s)."
+                                   .format(slowest, eval_durations[slowest]))
 
                     log_print("")
                     last_val_time = time.process_time()
@@ -277,6 +373,13 @@ def training_loop(tf_manager: TensorFlowManager,
     except KeyboardInterrupt:
         log("Training interrupted by user.")
 
+    if pending_validation is not None:
+        log("Waiting for the last validation.")
+        finish_validation()
+    if validation_pool is not None:
+        validation_pool.shutdown()
+    tf_manager.wait_for_saving()
+
     log("Training finished. Maximum {} on validation data: {:.4g}, epoch {}"
         .format(main_metric, tf_manager.best_score,
                 tf_manager.best_score_epoch))
@@ -285,18 +388,50 @@ def training_loop(tf_manager: TensorFlowManager,
         tf_manager.restore_best_vars()
 
     for dataset in test_datasets:
-        test_results, test_outputs = run_on_dataset(
+        test_results, test_outputs, test_stats = run_on_dataset(
             tf_manager, runners, dataset, postprocess,
-            write_out=True, batch_size=runners_batch_size)
+            write_out=True, batch_size=runners_batch_size,
+            evaluators=evaluators, evaluation_workers=evaluation_workers)
         # ensure test outputs are iterable more than once
         test_outputs = {k: list(v) for k, v in test_outputs.items()}
         eval_result = evaluation(evaluators, dataset, runners,
-                                 test_results, test_outputs)
+                                 test_results, test_outputs, test_stats,
+                                 evaluation_workers)
         print_final_evaluation(dataset.name, eval_result)
 
     log("Finished.")
 
 
+def _run_validation(tf_manager: TensorFlowManager,
+                    val_datasets: List[Dataset],
+                    runners: List[BaseRunner],
+                    postprocess: Postprocess,
+                    runners_batch_size: Optional[int],
+                    evaluators: EvalConfiguration,
+                    evaluation_workers: int) -> List[ValidationResult]:
+    """Run the model and the evaluators on the validation datasets.
+
+    This does not change the state of the training, so it can run in
+    a background thread with a fork of the TensorFlow manager.
+    """
+    validation = []  # type: List[ValidationResult]
+    for valset in val_datasets:
+        update_durations = {}  # type: Dict[str, float]
+        val_results, val_outputs, val_stats = run_on_dataset(
+            tf_manager, runners, valset, postprocess, write_out=False,
+            batch_size=runners_batch_size, evaluators=evaluators,
+            evaluation_workers=evaluation_workers,
+            evaluator_durations=update_durations)
+        # ensure val outputs are iterable more than once
+        val_outputs = {k: list(v) for k, v in val_outputs.items()}
+        val_evaluation, val_durations = timed_evaluation(
+            evaluators, valset, runners, val_results, val_outputs, val_stats,
+            evaluation_workers, update_durations)
+        validation.append((valset, val_results, val_outputs, val_evaluation,
+                           val_durations))
+    return validation
+
+
 def _is_logging_time(step: int, logging_period_batch: int,
                      last_log_time: float, logging_period_time: int):
     if logging_period_batch is not None:
@@ -357,40 +492,167 @@ def run_on_dataset(tf_manager: TensorFlowManager,
                    postprocess: Postprocess,
                    write_out: bool = False,
                    batch_size: Optional[int] = None,
-                   log_progress: int = 0) -> Tuple[
-                       List[ExecutionResult], Dict[str, List[Any]]]:
+                   log_progress: int = 0,
+                   evaluators: Optional[EvalConfiguration] = None,
+                   evaluation_workers: int = 1,
+                   evaluator_durations: Optional[Dict[str, float]] = None
+                  ) -> Tuple[List[ExecutionResult], Dict[str, List[Any]],
+                             Dict[str, np.ndarray]]:
     """Apply the model on a dataset and optionally write outputs to files.
 
+    The outputs of the runners are written batch by batch as soon as they
+    are computed. The written series are kept in memory only if they are
+    needed after the execution, i.e. by the postprocessing or by the
+    evaluators which do not accumulate their statistics batch by batch.
+    Otherwise, they are left out from the returned series. The series
+    created by the postprocessing are written at the end.
+
     Args:
         tf_manager: TensorFlow manager with initialized sessions.
         runners: A function that runs the code
         dataset: The dataset on which the model will be executed.
-        evaluators: List of evaluators that are used for the model
-            evaluation if the target data are provided.
         postprocess: an object to use as postprocessing of the
         write_out: Flag whether the outputs should be printed to a file defined
             in the dataset object.
         batch_size: size of the minibatch
         log_progress: log progress every X seconds
-
-        extra_fetches: Extra tensors to evaluate for each batch.
+        evaluators: List of evaluators that are used for the model
+            evaluation if the target data are provided. The streaming
+            evaluators of the runner outputs accumulate their statistics
+            batch by batch. The statistics of the references of an in-memory
+            dataset are computed for the whole series and the evaluators
+            get their slices for each batch.
+        evaluation_workers: Number of processes updating the streaming
+            evaluators. If there are more of them, the batches are evaluated
+            in the worker processes while the model runs on the next ones.
+        evaluator_durations: Dictionary to which the time spent in updating
+            the streaming evaluators is added.
 
     Returns:
-        Tuple of resulting sentences/numpy arrays, and evaluation results if
-        they are available which are dictionary function -> value.
+        Tuple of execution results, resulting sentences/numpy arrays (except
+        the written series which are not needed any more), and the
+        accumulated statistics of the streaming evaluators, which is a
+        dictionary from the evaluation names to the statistics.
 
     """
     contains_targets = all(dataset.has_series(runner.decoder_data_id)
                            for runner in runners
                            if runner.decoder_data_id is not None)
 
-    all_results = tf_manager.execute(dataset, runners,
-                                     compute_losses=contains_targets,
-                                     batch_size=batch_size,
-                                     log_progress=log_progress)
+    streamed = _streamed_evaluators(evaluators, dataset, runners)
+    evaluator_stats = {
+        "{}/{}".format(generated_id, function.name): function.init_stats()
+        for generated_id, _, function in streamed}
+
+    # the evaluators cache them for the series of the in-memory datasets
+    reference_stats = {}  # type: Dict[str, List[Any]]
+    for generated_id, dataset_id, function in streamed:
+        references = dataset.get_series(dataset_id)
+        if hasattr(references, "__len__"):
+            stats = function.reference_stats(references)
+            if stats is not None:
+                reference_stats["{}/{}".format(
+                    generated_id, function.name)] = stats
+    batch_start = 0
+
+    pool = _evaluation_pool(evaluation_workers) if streamed else None
+    # the batches of the series are sent to the workers once for all the
+    # evaluators comparing them
+    streamed_groups = _group_by_series(streamed)
+    # statistics of the batches with their update time, or their futures
+    pending_stats = []  # type: List[Tuple[List[str], Any]]
+
+    nbest_series = set(
+        runner.output_series for runner in runners
+        if isinstance(runner, (BeamSearchNBestRunner, ScoringRunner)))
+    written_series = [runner.output_series for runner in runners
+                      if write_out
+                      and runner.output_series in dataset.series_outputs]
+    writers = {}  # type: Dict[str, OutputWriter]
+    num_items = len(dataset) if written_series else 0
+
+    # the postprocessors may read any of the series
+    if postprocess is not None:
+        needed_series = set(written_series)
+    else:
+        streamed_names = {"{}/{}".format(generated_id, function.name)
+                          for generated_id, _, function in streamed}
+        needed_series = {
+            generated_id for generated_id, _, function in evaluators or []
+            if ("{}/{}".format(generated_id, function.name)
+                not in streamed_names)}
+    kept_series = [runner.output_series for runner in runners
+                   if (runner.output_series not in written_series
+                       or runner.output_series in needed_series)]
+
+    def process_batch(batch: Dataset,
+                      batch_results: List[ExecutionResult]) -> None:
+        nonlocal batch_start
+        batch_end = batch_start + len(batch)
+        outputs = {runner.output_series: result.outputs
+                   for runner, result in zip(runners, batch_results)}
+        for generated_id, dataset_id, functions in streamed_groups:
+            decoded = outputs[generated_id]
+            references = list(batch.get_series(dataset_id))
+            remote_keys = []  # type: List[str]
+            remote_updates = []  # type: List[Any]
+            for function in functions:
+                key = "{}/{}".format(generated_id, function.name)
+                batch_reference_stats = None
+                if key in reference_stats:
+                    batch_reference_stats = reference_stats[key][
+                        batch_start:batch_end]
+                update = (function, batch_reference_stats)
+                if pool is not None and _is_picklable(function):
+                    remote_keys.append(key)
+                    remote_updates.append(update)
+                else:
+                    pending_stats.append(([key], _timed_updates(
+                        [update], decoded, references)))
+
+            if remote_updates:
+                pending_stats.append((remote_keys, pool.apply_async(
+                    _timed_updates, (remote_updates, decoded, references))))
+        batch_start = batch_end
+
+        for series_id in written_series:
+            if series_id not in writers:
+                writers[series_id] = _output_writer(
+                    dataset.series_outputs[series_id], outputs[series_id],
+                    series_id in nbest_series, num_items)
+            writers[series_id].write(outputs[series_id])
+
+    try:
+        all_results = tf_manager.execute(
+            dataset, runners, compute_losses=contains_targets,
+            batch_size=batch_size, log_progress=log_progress,
+            batch_callback=(process_batch if streamed or written_series
+                            else None),
+            keep_outputs=[runner.output_series in kept_series
+                          for runner in runners])
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    functions = {"{}/{}".format(generated_id, function.name): function
+                 for generated_id, _, function in streamed}
+    for keys, batch_results in pending_stats:
+        if not isinstance(batch_results, list):
+            batch_results = batch_results.get()
+        for key, (batch_stats, duration) in zip(keys, batch_results):
+            start = time.time()
+            evaluator_stats[key] = functions[key].merge(evaluator_stats[key],
+                                                        batch_stats)
+            if evaluator_durations is not None:
+                evaluator_durations[key] = (evaluator_durations.get(key, 0.)
+                                            + duration + time.time() - start)
 
     result_data = {runner.output_series: result.outputs
-                   for runner, result in zip(runners, all_results)}
+                   for runner, result in zip(runners, all_results)
+                   if runner.output_series in kept_series}
+
+    for series_id, writer in writers.items():
+        log("Output '{}' saved to \"{}\"".format(series_id, writer.path))
 
     if postprocess is not None:
         for series_name, postprocessor in postprocess:
@@ -409,24 +671,70 @@ def run_on_dataset(tf_manager: TensorFlowManager,
 
     if write_out:
         for series_id, data in result_data.items():
+            if series_id in writers:
+                continue
             if series_id in dataset.series_outputs:
-                path = dataset.series_outputs[series_id]
-                if isinstance(data, np.ndarray):
-                    np.save(path, data)
-                    log('Result saved as numpy array to "{}"'.format(path))
-                else:
-                    with open(path, 'w', encoding='utf-8') as f_out:
-                        f_out.writelines(
-                            [" ".join(sent) + "\n" for sent in data])
-                    log("Result saved as plain text \"{}\"".format(path))
+                writer = _output_writer(dataset.series_outputs[series_id],
+                                        data, series_id in nbest_series,
+                                        len(data))
+                writer.write(data)
+                writer.close()
+                log("Output '{}' saved to \"{}\"".format(
+                    series_id, writer.path))
             else:
                 log("There is no output file for dataset: {}"
                     .format(dataset.name), color='red')
 
-    return all_results, result_data
+    return all_results, result_data, evaluator_stats
 
 
-def evaluation(evaluators, dataset, runners, execution_results, result_data):
+def _output_writer(output: OutputDef, data: Any, nbest: bool,
+                   num_items: int) -> OutputWriter:
+    """Create a writer of an output series.
+
+    Unless the writer is given in the dataset, the n-best lists are written
+    in the Moses format, numpy arrays to a ``.npy`` file (or to a file per
+    batch if the shapes of the items differ) and other series as plain text.
+
+    Args:
+        output: Output path, optionally with the writer, from the dataset.
+        data: The (first batch of the) series, which determines the format.
+        nbest: Flag whether the series contains n-best lists.
+        num_items: The length of the whole series.
+    """
+    if isinstance(output, tuple):
+        path, writer = output
+        return writer(path, num_items)
+    if nbest:
+        return NBestWriter(output, num_items)
+    if isinstance(data, np.ndarray) or (
+            len(data) > 0 and isinstance(data[0], np.ndarray)):
+        return AdaptiveNumpyWriter(output, num_items)
+    return PlainTextWriter(output, num_items)
+
+
+def _streamed_evaluators(evaluators: Optional[EvalConfiguration],
+                         dataset: Dataset,
+                         runners: List[BaseRunner]) -> EvalConfiguration:
+    """Select evaluators which can be updated during the model execution.
+
+    These are the streaming evaluators of series produced directly by the
+    runners. Series created by the postprocessing are known only after the
+    whole dataset is processed, so they are evaluated at once.
+    """
+    if not evaluators:
+        return []
+
+    output_series = {runner.output_series for runner in runners}
+    return [(generated_id, dataset_id, function)
+            for generated_id, dataset_id, function in evaluators
+            if (isinstance(function, StreamingEvaluator)
+                and generated_id in output_series
+                and dataset.has_series(dataset_id))]
+
+
+def evaluation(evaluators, dataset, runners, execution_results, result_data,
+               evaluator_stats=None, num_workers=1, evaluator_durations=None):
     """Evaluate the model outputs.
 
     Args:
@@ -435,12 +743,43 @@ def evaluation(evaluators, dataset, runners, execution_results, result_data):
         runners: List of runners (contains series ids and loss names).
         execution_results: Execution results that include the loss values.
         result_data: Dictionary from series names to list of outputs.
+        evaluator_stats: Statistics of the streaming evaluators accumulated
+            during the model execution. The evaluators which have no
+            statistics are called on the whole series.
+        num_workers: Number of processes running the evaluators.
+        evaluator_durations: Time which the streaming evaluators spent
+            during the model execution, as collected by `run_on_dataset`.
 
     Returns:
         Dictionary of evaluation names and their values which includes the
         metrics applied on respective series loss and loss values from the run.
     """
+    eval_result, _ = timed_evaluation(
+        evaluators, dataset, runners, execution_results, result_data,
+        evaluator_stats, num_workers, evaluator_durations)
+    return eval_result
+
+
+def timed_evaluation(evaluators, dataset, runners, execution_results,
+                     result_data, evaluator_stats=None, num_workers=1,
+                     evaluator_durations=None):
+    """Evaluate the model outputs and measure the time of the evaluators.
+
+    The evaluators without the accumulated statistics are run in a pool of
+    `num_workers` processes if there are more of them. The pool is started
+    once by a fork server, not forked from this process which runs the
+    TensorFlow sessions. Evaluators which cannot be sent to the workers
+    run in this process.
+
+    Arguments are the same as in the `evaluation` function.
+
+    Returns:
+        Tuple of the evaluation results and a dictionary of wall times (in
+        seconds) which the evaluators took, including the time the streaming
+        evaluators spent during the model execution.
+    """
     eval_result = {}
+    durations = {}  # type: Dict[str, float]
 
     # losses
     for runner, result in zip(runners, execution_results):
@@ -448,17 +787,161 @@ def evaluation(evaluators, dataset, runners, execution_results, result_data):
             eval_result["{}/{}".format(runner.output_series, name)] = value
 
     # evaluation metrics
+    jobs = []  # type: EvalConfiguration
     for generated_id, dataset_id, function in evaluators:
-        if (not dataset.has_series(dataset_id) or
-                generated_id not in result_data):
+        if not dataset.has_series(dataset_id):
             continue
 
-        desired_output = dataset.get_series(dataset_id)
-        model_output = result_data[generated_id]
-        eval_result["{}/{}".format(generated_id, function.name)] = function(
-            model_output, desired_output)
+        # the series evaluated during the execution may not be returned
+        eval_name = "{}/{}".format(generated_id, function.name)
+        if evaluator_stats is not None and eval_name in evaluator_stats:
+            start = time.time()
+            eval_result[eval_name] = function.finalize(
+                evaluator_stats[eval_name])
+            durations[eval_name] = time.time() - start
+            if evaluator_durations is not None:
+                durations[eval_name] += evaluator_durations.get(eval_name, 0.)
+            continue
 
-    return eval_result
+        if generated_id not in result_data:
+            continue
+
+        jobs.append((generated_id, dataset_id, function))
+
+    pool = _evaluation_pool(num_workers) if len(jobs) > 1 else None
+    scores = _run_evaluation_jobs(_group_by_series(jobs), dataset,
+                                  result_data, pool)
+    for generated_id, _, function in jobs:
+        eval_name = "{}/{}".format(generated_id, function.name)
+        eval_result[eval_name], durations[eval_name] = scores[eval_name]
+
+    return eval_result, durations
+
+
+def _materialize(series: Any) -> Any:
+    if hasattr(series, "__len__"):
+        return series
+    return list(series)
+
+
+def _group_by_series(evaluators: EvalConfiguration
+                    ) -> List[Tuple[str, str, List[Any]]]:
+    """Group the evaluators by the pairs of series they compare."""
+    groups = OrderedDict()  # type: Dict[Tuple[str, str], List[Any]]
+    for generated_id, dataset_id, function in evaluators:
+        groups.setdefault((generated_id, dataset_id), []).append(function)
+    return [(generated_id, dataset_id, functions)
+            for (generated_id, dataset_id), functions in groups.items()]
+
+
+def _timed_updates(updates: List[Tuple[StreamingEvaluator,
+                                       Optional[List[Any]]]],
+                   decoded: Any,
+                   references: Any) -> List[Tuple[Any, float]]:
+    return [_timed_update(function, decoded, references, reference_stats)
+            for function, reference_stats in updates]
+
+
+def _timed_update(function: StreamingEvaluator, decoded: Any,
+                  references: Any,
+                  reference_stats: Optional[List[Any]]) -> Tuple[Any, float]:
+    start = time.time()
+    if reference_stats is None:
+        stats = function.update(decoded, references)
+    else:
+        stats = function.update(decoded, references,
+                                reference_stats=reference_stats)
+    return stats, time.time() - start
+
+
+def _run_evaluators(functions: List[Any], model_output: Any,
+                    desired_output: Any) -> List[Tuple[Any, float]]:
+    scores = []
+    for function in functions:
+        start = time.time()
+        score = function(model_output, desired_output)
+        scores.append((score, time.time() - start))
+    return scores
+
+
+# pools of the evaluation workers by their number, reused by all evaluations
+_EVALUATION_POOLS = {}  # type: Dict[int, WorkerPool]
+
+
+def _evaluation_pool(num_workers: int) -> Optional[WorkerPool]:
+    if num_workers <= 1:
+        return None
+    if num_workers not in _EVALUATION_POOLS:
+        _EVALUATION_POOLS[num_workers] = WorkerPool(num_workers)
+    return _EVALUATION_POOLS[num_workers]
+
+
+# whether the evaluators of a class can be sent to the workers
+_PICKLABLE_CLASSES = {}  # type: Dict[type, bool]
+
+
+def _is_picklable(function: Any) -> bool:
+    """Check whether the evaluators of the function's class are picklable.
+
+    Only the first evaluator of each class is tried.
+    """
+    cls = type(function)
+    if cls not in _PICKLABLE_CLASSES:
+        try:
+            pickle.dumps(function)
+            _PICKLABLE_CLASSES[cls] = True
+        except Exception:  # pylint: disable=broad-except
+            _PICKLABLE_CLASSES[cls] = False
+    return _PICKLABLE_CLASSES[cls]
+
+
+def _run_evaluation_jobs(jobs: List[Tuple[str, str, List[Any]]],
+                         dataset: Dataset, result_data: Dict[str, Any],
+                         pool: Optional[WorkerPool]
+                        ) -> Dict[str, Tuple[Any, float]]:
+    """Run the evaluators, in the workers if there is a pool.
+
+    Each pair of the series is sent to the workers once, together with all
+    the picklable evaluators comparing them. The other evaluators (e.g. the
+    ones running external scorers) run in this process, while the workers
+    compute the other scores.
+
+    Returns:
+        Dictionary from the evaluation names to the scores and the times the
+        evaluators took.
+    """
+    remote = []  # type: List[Tuple[List[str], Any]]
+    local = []  # type: List[Tuple[str, Any, Any, Any]]
+    for generated_id, dataset_id, functions in jobs:
+        model_output = result_data[generated_id]
+        desired_output = dataset.get_series(dataset_id)
+        if pool is not None or len(functions) > 1:
+            # lazy series are sent to the workers and reused as lists
+            model_output = _materialize(model_output)
+            desired_output = _materialize(desired_output)
+
+        remote_names = []  # type: List[str]
+        remote_functions = []  # type: List[Any]
+        for function in functions:
+            name = "{}/{}".format(generated_id, function.name)
+            if pool is not None and _is_picklable(function):
+                remote_names.append(name)
+                remote_functions.append(function)
+            else:
+                local.append((name, function, model_output, desired_output))
+
+        if remote_functions:
+            remote.append((remote_names, pool.apply_async(
+                _run_evaluators,
+                (remote_functions, model_output, desired_output))))
+
+    scores = {}  # type: Dict[str, Tuple[Any, float]]
+    for name, function, model_output, desired_output in local:
+        scores[name] = _run_evaluators([function], model_output,
+                                       desired_output)[0]
+    for names, result in remote:
+        scores.update(zip(names, result.get()))
+    return scores
 
 
 def _log_continuous_evaluation(tb_writer: tf.summary.FileWriter,
@@ -0,0 +1,253 @@
+"""Edit distance computations shared by the evaluators and processors.
+
+The distances of two sequences are computed with the bit-parallel algorithm
+of Myers (1999) in the formulation of Hyyro (2001): the columns of the
+dynamic programming matrix are encoded as bit vectors in Python integers, so
+the whole first sequence is processed in a constant number of integer
+operations per token of the second one. The backpointers needed for
+recovering the edit operations are computed with numpy on sequences interned
+to integers.
+
+Functions applied to many pairs of sequences can be distributed to a pool of
+worker processes by `map_pairs`.
+"""
+from functools import partial
+# pylint: disable=unused-import
+from typing import (Any, Callable, Dict, Hashable, List, Sequence, Tuple,
+                    TypeVar)
+# pylint: enable=unused-import
+
+import numpy as np
+
+from neuralmonkey.worker_pool import WorkerPool
+
+# pylint: disable=invalid-name
+T = TypeVar("T")
+# pylint: enable=invalid-name
+
+# worker pools by their number of processes, closed at exit
+_POOLS = {}  # type: Dict[int, WorkerPool]
+
+# backpointers returned by edit_backpointers
+DIAGONAL = 0
+UP = 1
+LEFT = 2
+
+
+def _match_masks(pattern: Sequence[Hashable]) -> Dict[Hashable, int]:
+    """Map tokens to bit masks of their positions in the pattern."""
+    masks = {}  # type: Dict[Hashable, int]
+    for i, token in enumerate(pattern):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    return masks
+
+
+def _masked_levenshtein(masks: Dict[Hashable, int], length: int,
+                        text: Sequence[Hashable]) -> int:
+    if length == 0:
+        return len(text)
+
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive = full
+    negative = 0
+    score = length
+
+    for token in text:
+        match = masks.get(token, 0)
+        vertical = match | negative
+        horizontal = (((match & positive) + positive) ^ positive) | match
+        h_positive = (negative | ~(horizontal | positive)) & full
+        h_negative = positive & horizontal
+
+        if h_positive & last:
+            score += 1
+        elif h_negative & last:
+            score -= 1
+
+        h_positive = (h_positive << 1) | 1
+        h_negative = h_negative << 1
+        positive = (h_negative | ~(vertical | h_positive)) & full
+        negative = h_positive & vertical
+
+    return score
+
+
+def levenshtein(source: Sequence[Hashable],
+                target: Sequence[Hashable]) -> int:
+    """Compute the Levenshtein distance of two sequences of tokens.
+
+    Args:
+        source: The first sequence.
+        target: The second sequence.
+
+    Returns:
+        The minimum number of insertions, deletions and substitutions
+        transforming one sequence to the other.
+    """
+    return _masked_levenshtein(_match_masks(source), len(source), target)
+
+
+def lcs_length(source: Sequence[Hashable],
+               target: Sequence[Hashable]) -> int:
+    """Compute the length of the longest common subsequence.
+
+    Uses the bit-parallel algorithm of Allison and Dix (1986).
+    """
+    masks = _match_masks(source)
+    full = (1 << len(source)) - 1
+    remaining = full
+
+    for token in target:
+        matched = remaining & masks.get(token, 0)
+        remaining = ((remaining + matched) | (remaining - matched)) & full
+
+    return len(source) - bin(remaining).count("1")
+
+
+def intern_tokens(*sequences: Sequence[Hashable]) -> List[np.ndarray]:
+    """Replace tokens by integers shared across the given sequences."""
+    vocabulary = {}  # type: Dict[Hashable, int]
+    return [np.array([vocabulary.setdefault(token, len(vocabulary))
+                      for token in sequence], dtype=np.int64)
+            for sequence in sequences]
+
+
+def edit_backpointers(source: Sequence[Hashable],
+                      target: Sequence[Hashable],
+                      substitutions: bool = True) -> np.ndarray:
+    """Compute the backpointers of an optimal alignment of two sequences.
+
+    The matrix is filled row by row. The insertions within a row are
+    resolved by a cumulative minimum, since the cost of a cell is the
+    minimum over the cells on its left of their cost without insertions
+    plus their distance. Only the last row of the costs is kept in memory,
+    the result holds a single byte per cell.
+
+    When there are more optimal operations, the diagonal step is preferred
+    over the step up (deletion) and the step up over the step left
+    (insertion).
+
+    Args:
+        source: The first sequence (rows of the matrix).
+        target: The second sequence (columns of the matrix).
+        substitutions: Flag whether a token can be replaced by a different
+            one. Otherwise, the diagonal step is allowed only on matching
+            tokens.
+
+    Returns:
+        Matrix of shape `(len(source) + 1, len(target) + 1)` of `DIAGONAL`,
+        `UP` and `LEFT` values pointing to the preceding cell of the optimal
+        path.
+    """
+    source_ids, target_ids = intern_tokens(source, target)
+    rows, cols = len(source_ids), len(target_ids)
+    mismatch_cost = 1 if substitutions else rows + cols + 1
+    offsets = np.arange(cols + 1)
+
+    pointers = np.empty((rows + 1, cols + 1), dtype=np.uint8)
+    pointers[0] = LEFT
+    pointers[0, 0] = DIAGONAL
+    previous = offsets
+
+    for i in range(1, rows + 1):
+        diagonal_cost = np.empty(cols + 1, dtype=np.int64)
+        diagonal_cost[0] = rows + cols + 1
+        diagonal_cost[1:] = previous[:-1] + np.where(
+            target_ids == source_ids[i - 1], 0, mismatch_cost)
+        up_cost = previous + 1
+
+        without_insertions = np.minimum(diagonal_cost, up_cost)
+        current = np.minimum.accumulate(without_insertions - offsets) \
+            + offsets
+
+        pointers[i] = np.where(diagonal_cost == current, DIAGONAL,
+                               np.where(up_cost == current, UP, LEFT))
+        previous = current
+
+    return pointers
+
+
+def translation_edit_rate(hypothesis: Sequence[Hashable],
+                          reference: Sequence[Hashable]) -> float:
+    """Compute TER of a hypothesis with respect to a non-empty reference.
+
+    This is the greedy shift search of the `pyter` library: the phrase shift
+    decreasing the edit distance the most is applied while there is any,
+    ties are resolved in favor of the lexicographically largest result. The
+    edit distances to the reference are computed with a bit-parallel
+    algorithm using precomputed masks of the reference.
+    """
+    masks = _match_masks(reference)
+
+    def distance(words: List[Hashable]) -> int:
+        return _masked_levenshtein(masks, len(reference), words)
+
+    words = list(hypothesis)
+    shifts = 0
+    while True:
+        current = distance(words)
+        candidates = []
+        for start, position, length in _matching_phrases(words, reference):
+            shifted = words[:start] + words[start + length:]
+            shifted[position:position] = words[start:start + length]
+            candidates.append((current - distance(shifted), shifted))
+
+        if not candidates:
+            break
+
+        gain, shifted = max(candidates)
+        if gain <= 0:
+            break
+
+        shifts += 1
+        words = shifted
+
+    return (shifts + distance(words)) / len(reference)
+
+
+def _matching_phrases(
+        words: Sequence[Hashable],
+        reference: Sequence[Hashable]) -> List[Tuple[int, int, int]]:
+    """Find phrases of the hypothesis that can be shifted to the reference.
+
+    Returns:
+        List of tuples `(start in hypothesis, start in reference, length)` of
+        the maximal matching phrases starting at different positions.
+    """
+    phrases = []
+    for i, word in enumerate(words):
+        for j, ref_word in enumerate(reference):
+            if i == j or word != ref_word:
+                continue
+            length = 1
+            while (i + length < len(words) and j + length < len(reference)
+                   and words[i + length] == reference[j + length]):
+                length += 1
+            phrases.append((i, j, length))
+    return phrases
+
+
+def map_pairs(function: Callable[[Any, Any], T],
+              first: Sequence[Any],
+              second: Sequence[Any],
+              num_workers: int = 1) -> List[T]:
+    """Apply a function on pairs of items of two sequences.
+
+    Large batches are split among `num_workers` processes. The function
+    must be picklable, i.e. defined on a module level.
+    """
+    pairs = list(zip(first, second))
+
+    if num_workers <= 1:
+        return _apply_on_pairs(function, pairs)
+
+    if num_workers not in _POOLS:
+        _POOLS[num_workers] = WorkerPool(num_workers)
+    return _POOLS[num_workers].map_chunks(
+        partial(_apply_on_pairs, function), pairs)
+
+
+def _apply_on_pairs(function: Callable[[Any, Any], T],
+                    pairs: List[Tuple[Any, Any]]) -> List[T]:
+    return [function(item1, item2) for item1, item2 in pairs]
@@ -1,7 +1,10 @@
 import re
-from typing import List
+# pylint: disable=unused-import
+from typing import Any, Callable, Dict, List, Tuple
+# pylint: enable=unused-import
 
 from neuralmonkey.logging import log
+from neuralmonkey.worker_pool import WorkerPool
 from lib.subword_nmt.apply_bpe import BPE, encode
 
 # pylint: disable=too-few-public-methods
@@ -17,15 +20,59 @@ class BPEPreprocessor(object):
     def __init__(self,
                  merge_file: str,
                  separator: str = "@@",
-                 encoding: str = "utf-8") -> None:
+                 encoding: str = "utf-8",
+                 num_workers: int = 1) -> None:
+        """Initialize the BPE preprocessor.
+
+        Args:
+            merge_file: File with the BPE merges.
+            separator: String appended to non-final subword units.
+            encoding: Encoding of the merge file.
+            num_workers: Number of processes used by ``segment_batch`` for
+                large batches.
+
+        When used as a series preprocessor, the datasets segment the series
+        in batches by ``segment_batch``.
+        """
         log("Initializing BPE preprocessor")
 
         with open(merge_file, "r", encoding=encoding) as f_data:
             self.bpe = BPE(f_data, separator)
 
+        self.num_workers = num_workers
+        self._pool = WorkerPool(num_workers, _init_worker,
+                                (self.bpe.bpe_codes,))
+
     def __call__(self, sentence: List[str]) -> List[str]:
         """Adapted code from BPE.segment """
-
+        return self._join_subwords(
+            sentence, lambda word: encode(word, self.bpe.bpe_codes))
+
+    def segment_batch(self, sentences: List[List[str]]) -> List[List[str]]:
+        """Apply BPE on a list of sentences.
+
+        Every distinct word in the batch is encoded only once. For large
+        batches, the words are encoded in a process pool if the preprocessor
+        has more than one worker.
+        """
+        words = list({word for sentence in sentences for word in sentence
+                      if word})
+
+        if self._pool.is_parallel(len(words)):
+            encoded = self._pool.map_chunks(_encode_words, words)
+        else:
+            encoded = [encode(word, self.bpe.bpe_codes) for word in words]
+
+        segmentations = dict(zip(words, encoded))
+        return [self._join_subwords(sentence, segmentations.__getitem__)
+                for sentence in sentences]
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._pool.close()
+
+    def _join_subwords(self, sentence: List[str],
+                       segment: Callable[[str], Tuple[str, ...]]) -> List[str]:
         output = []
         for word in sentence:
 
@@ -34,7 +81,7 @@ class BPEPreprocessor(object):
                 output.append(word)
                 continue
 
-            new_word = encode(word, self.bpe.bpe_codes)
+            new_word = segment(word)
 
             for item in new_word[:-1]:
                 output.append(item + self.bpe.separator)
@@ -45,12 +92,21 @@ class BPEPreprocessor(object):
 
 class BPEPostprocessor(object):
 
-    def __init__(self, separator: str = "@@") -> None:
+    def __init__(self, separator: str = "@@", num_workers: int = 1) -> None:
         esc = re.escape(separator)
         self.pattern = re.compile(esc + r" ")
+        self.num_workers = num_workers
+        self._pool = WorkerPool(num_workers, _init_worker, (self.pattern,))
 
     def __call__(self, decoded_sentences: List[List[str]]) -> List[List[str]]:
-        return [self.decode(s) for s in decoded_sentences]
+        if self._pool.is_parallel(len(decoded_sentences)):
+            return self._pool.map_chunks(_decode_sentences, decoded_sentences)
+
+        return self.decode_batch(decoded_sentences)
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._pool.close()
 
     def decode(self, sentence: List[str]) -> List[str]:
         joined = " ".join(sentence)
@@ -58,3 +114,40 @@ class BPEPostprocessor(object):
         splitted = decoded.split(" ")
 
         return splitted
+
+    def decode_batch(self, sentences: List[List[str]]) -> List[List[str]]:
+        """Decode a list of sentences with a single regex pass.
+
+        The sentences are joined into one newline-separated buffer. If some
+        token contains a newline, the sentences are decoded one by one.
+        """
+        return _decode_batch(self.pattern, sentences)
+
+
+def _decode_batch(pattern: Any,
+                  sentences: List[List[str]]) -> List[List[str]]:
+    joined = "\n".join(" ".join(sentence) for sentence in sentences)
+    lines = pattern.sub("", joined).split("\n")
+
+    if len(lines) != len(sentences):
+        return [pattern.sub("", " ".join(sentence)).split(" ")
+                for sentence in sentences]
+
+    return [line.split(" ") for line in lines]
+
+
+# state of a worker process, set by the pool initializer
+_WORKER_STATE = None  # type: Any
+
+
+def _init_worker(state: Any) -> None:
+    global _WORKER_STATE  # pylint: disable=global-statement
+    _WORKER_STATE = state
+
+
+def _encode_words(words: List[str]) -> List[Tuple[str, ...]]:
+    return [encode(word, _WORKER_STATE) for word in words]
+
+
+def _decode_sentences(sentences: List[List[str]]) -> List[List[str]]:
+    return _decode_batch(_WORKER_STATE, sentences)
@@ -1,8 +1,7 @@
 from typing import Any, Callable, Dict, Iterable, List
 
-import numpy as np
-
 from neuralmonkey.dataset import Dataset
+from neuralmonkey.levenshtein import DIAGONAL, UP, edit_backpointers
 
 
 # pylint: disable=too-few-public-methods
@@ -64,42 +63,31 @@ DELETE = '<delete>'
 
 
 def convert_to_edits(source: List[str], target: List[str]) -> List[str]:
-    lev = np.zeros([len(source) + 1, len(target) + 1])
-    edits = [[[] for _ in range(len(target) + 1)]
-             for _ in range(len(source) + 1)]
-    # type: List[List[List[str]]]
-
-    for i in range(len(source) + 1):
-        lev[i, 0] = i
-        edits[i][0] = [DELETE for _ in range(i)]
-
-    for j in range(len(target) + 1):
-        lev[0, j] = j
-        edits[0][j] = target[:j]
-
-    for j in range(1, len(target) + 1):
-        for i in range(1, len(source) + 1):
-
-            if source[i - 1] == target[j - 1]:
-                keep_cost = lev[i - 1, j - 1]
-            else:
-                keep_cost = np.inf
-
-            delete_cost = lev[i - 1, j] + 1
-            insert_cost = lev[i, j - 1] + 1
-
-            lev[i, j] = min(keep_cost, delete_cost, insert_cost)
-
-            if lev[i, j] == keep_cost:
-                edits[i][j] = edits[i - 1][j - 1] + [KEEP]
-
-            elif lev[i, j] == delete_cost:
-                edits[i][j] = edits[i - 1][j] + [DELETE]
-
-            else:
-                edits[i][j] = edits[i][j - 1] + [target[j - 1]]
+    """Convert a pair of sequences into a sequence of edit operations.
+
+    The operations are keeping a source token, deleting a source token and
+    inserting a target token, which is represented by the token itself.
+    Keeping is preferred over deletion and deletion over insertion.
+    """
+    pointers = edit_backpointers(source, target, substitutions=False)
+
+    edits = []  # type: List[str]
+    i, j = len(source), len(target)
+    while i > 0 or j > 0:
+        pointer = pointers[i, j]
+        if pointer == DIAGONAL:
+            edits.append(KEEP)
+            i -= 1
+            j -= 1
+        elif pointer == UP:
+            edits.append(DELETE)
+            i -= 1
+        else:
+            edits.append(target[j - 1])
+            j -= 1
 
-    return edits[-1][-1]
+    edits.reverse()
+    return edits
 
 
 def reconstruct(source: List[str], edits: List[str]) -> List[str]:
@@ -1,4 +1,4 @@
-from typing import List, Iterable, Callable
+from typing import List, Iterable, Callable, Tuple
 import gzip
 import csv
 import io
@@ -86,6 +86,39 @@ def tsv_reader(column: int):
                                    quotechar=None)
 
 
+def nbest_reader(encoding: str = "utf-8") -> Callable[
+        [List[str]], Iterable[List[Tuple[List[str], float]]]]:
+    """Get reader for n-best lists in the Moses format.
+
+    Each line has the form ``id ||| hypothesis ||| ... ||| score``. The
+    reader yields a list of the hypotheses with their scores for each
+    sentence; sentences without any hypothesis get an empty list.
+    """
+    def reader(files: List[str]) -> Iterable[List[Tuple[List[str], float]]]:
+        text_reader = string_reader(encoding)
+        current_id = 0
+        nbest_list = []  # type: List[Tuple[List[str], float]]
+
+        for line in text_reader(files):
+            fields = [field.strip() for field in line.split("|||")]
+            if len(fields) < 3:
+                raise ValueError("Invalid n-best list line: '{}'"
+                                 .format(line.rstrip("\r\n")))
+
+            sent_id = int(fields[0])
+            while current_id < sent_id:
+                yield nbest_list
+                nbest_list = []
+                current_id += 1
+
+            nbest_list.append((fields[1].split(), float(fields[-1])))
+
+        if nbest_list:
+            yield nbest_list
+
+    return reader
+
+
 # pylint: disable=invalid-name
 UtfPlainTextReader = tokenized_text_reader()
 # pylint: enable=invalid-name
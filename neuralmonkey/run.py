@@ -1,10 +1,17 @@
+from typing import List
 import os
 import argparse
 
+import numpy as np
+
 from neuralmonkey.logging import log, log_print
 from neuralmonkey.config.configuration import Configuration
+from neuralmonkey.dataset import Dataset
 from neuralmonkey.learning_utils import (evaluation, run_on_dataset,
                                          print_final_evaluation)
+from neuralmonkey.evaluators.significance import (paired_bootstrap,
+                                                  sentence_stats)
+from neuralmonkey.evaluators.streaming import StreamingEvaluator
 
 CONFIG = Configuration()
 CONFIG.add_argument('tf_manager')
@@ -15,6 +22,7 @@ CONFIG.add_argument('runners')
 CONFIG.add_argument('batch_size')
 CONFIG.add_argument('threads', required=False, default=4)
 CONFIG.add_argument('runners_batch_size', required=False, default=None)
+CONFIG.add_argument('evaluation_workers', required=False, default=1)
 # ignore arguments which are just for training
 CONFIG.ignore_argument('val_dataset')
 CONFIG.ignore_argument('trainer')
@@ -49,18 +57,33 @@ def default_variable_file(output_dir):
     return variables_file
 
 
-def initialize_for_running(output_dir, tf_manager, variable_files) -> None:
+def initialize_for_running(output_dir, tf_manager, variable_files,
+                           runners=None) -> None:
     """Restore either default variables of from configuration.
 
     Arguments:
        output_dir: Training output directory.
        tf_manager: TensorFlow manager.
        variable_files: Files with variables to be restored or None if the
-           default variables should be used.
+           default variables should be used. If it is an empty list, only
+           the model parts of the runners which have their own checkpoints
+           (e.g. in-graph ensembles) are loaded.
+       runners: Runners whose model parts are loaded when no variable files
+           are given.
     """
     # pylint: disable=no-member
     log_print("")
 
+    if variable_files == []:
+        if runners is None:
+            raise ValueError("Runners must be provided for initializing the "
+                             "model parts from their checkpoints.")
+        log("No variable files given, loading the model parts from their "
+            "checkpoints.")
+        tf_manager.initialize_model_parts(runners)
+        log_print("")
+        return
+
     if variable_files is None:
         default_varfile = default_variable_file(output_dir)
 
@@ -80,6 +103,66 @@ def initialize_for_running(output_dir, tf_manager, variable_files) -> None:
     log_print("")
 
 
+def compare_models(variable_files: List[str], datasets: List[Dataset],
+                   num_samples: int) -> None:
+    """Compare models by the paired bootstrap test on the test datasets.
+
+    Arguments:
+        variable_files: Variable files of the models, variable files of an
+            ensemble are separated by commas.
+        datasets: Datasets on which the models are compared.
+        num_samples: Number of bootstrap samples.
+    """
+    # pylint: disable=no-member
+    tf_manager = CONFIG.model.tf_manager
+    runners = CONFIG.model.runners
+    evaluators = [(e[0], e[0], e[1]) if len(e) == 2 else e
+                  for e in CONFIG.model.evaluation]
+
+    if CONFIG.model.runners_batch_size is None:
+        runners_batch_size = CONFIG.model.batch_size
+    else:
+        runners_batch_size = CONFIG.model.runners_batch_size
+
+    for dataset in datasets:
+        system_outputs = []
+        for model_files in variable_files:
+            initialize_for_running(CONFIG.model.output, tf_manager,
+                                   model_files.split(","))
+            _, output_data, _ = run_on_dataset(
+                tf_manager, runners, dataset, CONFIG.model.postprocess,
+                write_out=False, batch_size=runners_batch_size)
+            system_outputs.append(output_data)
+
+        log_print("")
+        log("Paired bootstrap test on dataset '{}' ({} samples)"
+            .format(dataset.name, num_samples), color="green")
+
+        for generated_id, dataset_id, function in evaluators:
+            if (not dataset.has_series(dataset_id)
+                    or not isinstance(function, StreamingEvaluator)):
+                continue
+
+            references = list(dataset.get_series(dataset_id))
+            result = paired_bootstrap(
+                function,
+                [sentence_stats(function, list(outputs[generated_id]),
+                                references)
+                 for outputs in system_outputs],
+                num_samples)
+
+            log_print("{}/{}".format(generated_id, function.name))
+            for i, model_files in enumerate(variable_files):
+                low, high = np.percentile(result.sample_scores[i], [2.5, 97.5])
+                log_print("  [{}] {}: {:.4g} (95% CI {:.4g} - {:.4g})".format(
+                    i, model_files, result.scores[i], low, high))
+            for i in range(len(variable_files)):
+                for j in range(len(variable_files)):
+                    if i != j:
+                        log_print("  [{}] better than [{}] in {:.1%} of "
+                                  "samples".format(i, j, result.wins[i, j]))
+
+
 def main() -> None:
     # pylint: disable=no-member,broad-except
     parser = argparse.ArgumentParser(description=__doc__)
@@ -89,6 +172,12 @@ def main() -> None:
                         help="the configuration of the test datasets")
     parser.add_argument("-g", "--grid", dest="grid", action="store_true",
                         help="look at the SGE variables for slicing the data")
+    parser.add_argument("-c", "--compare", metavar="VARIABLES", nargs="+",
+                        help="compare models with the given variable files "
+                        "by paired bootstrap resampling; variable files of "
+                        "an ensemble are separated by commas")
+    parser.add_argument("--bootstrap-samples", type=int, default=1000,
+                        help="number of bootstrap samples for --compare")
     args = parser.parse_args()
 
     test_datasets = Configuration()
@@ -100,8 +189,14 @@ def main() -> None:
     test_datasets.load_file(args.datasets)
     test_datasets.build_model()
     datasets_model = test_datasets.model
+
+    if args.compare:
+        compare_models(args.compare, datasets_model.test_datasets,
+                       args.bootstrap_samples)
+        return
+
     initialize_for_running(CONFIG.model.output, CONFIG.model.tf_manager,
-                           datasets_model.variables)
+                           datasets_model.variables, CONFIG.model.runners)
 
     print("")
 
@@ -137,13 +232,17 @@ def main() -> None:
         else:
             runners_batch_size = CONFIG.model.runners_batch_size
 
-        execution_results, output_data = run_on_dataset(
+        execution_results, output_data, evaluator_stats = run_on_dataset(
             CONFIG.model.tf_manager, CONFIG.model.runners,
             dataset, CONFIG.model.postprocess, write_out=True,
-            batch_size=runners_batch_size, log_progress=60)
+            batch_size=runners_batch_size, log_progress=60,
+            evaluators=evaluators,
+            evaluation_workers=CONFIG.model.evaluation_workers)
         # TODO what if there is no ground truth
         eval_result = evaluation(evaluators, dataset, CONFIG.model.runners,
-                                 execution_results, output_data)
+                                 execution_results, output_data,
+                                 evaluator_stats,
+                                 CONFIG.model.evaluation_workers)
         if eval_result:
             print_final_evaluation(dataset.name, eval_result)
 
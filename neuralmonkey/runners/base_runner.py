@@ -1,4 +1,5 @@
-from typing import Any, Dict, Tuple, List, NamedTuple, Union
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, List, NamedTuple, Optional, Union
 import numpy as np
 import tensorflow as tf
 
@@ -13,6 +14,10 @@ ExecutionResult = NamedTuple('ExecutionResult',
                               ('histogram_summaries', tf.Summary),
                               ('image_summaries', tf.Summary)])
 
+# data types of the runner outputs written as binary numpy arrays, None stands
+# for outputs converted to Python lists or strings
+OUTPUT_DTYPES = [None, "float16", "float32"]
+
 
 class Executable(object):
 
@@ -30,6 +35,12 @@ def collect_encoders(coder):
                                     for enc in coder.encoders))
     if hasattr(coder, "encoder"):
         return set([coder]).union(collect_encoders(coder.encoder))
+    if hasattr(coder, "decoders"):
+        members = set().union(*(collect_encoders(dec)
+                                for dec in coder.decoders))
+        # the parts fed by the ensemble itself are left out
+        return set([coder]).union(
+            members.difference(getattr(coder, "fed_parts", set())))
     if hasattr(coder, "parent_decoder"):
         return set([coder]).union(collect_encoders(coder.parent_decoder))
     # TODO replace by .get_predecesor method of ModelPart
@@ -56,20 +67,193 @@ class BaseRunner(object):
         raise NotImplementedError()
 
 
+def _merge_histograms(histogram: tf.HistogramProto,
+                      other: tf.HistogramProto) -> None:
+    """Add the counts of the other histogram into the histogram.
+
+    The buckets are matched by their upper limits.
+    """
+    counts = dict(zip(histogram.bucket_limit, histogram.bucket))
+    for limit, count in zip(other.bucket_limit, other.bucket):
+        counts[limit] = counts.get(limit, 0.) + count
+    limits = sorted(counts)
+
+    histogram.min = min(histogram.min, other.min)
+    histogram.max = max(histogram.max, other.max)
+    histogram.num += other.num
+    histogram.sum += other.sum
+    histogram.sum_squares += other.sum_squares
+    del histogram.bucket_limit[:]
+    histogram.bucket_limit.extend(limits)
+    del histogram.bucket[:]
+    histogram.bucket.extend(counts[limit] for limit in limits)
+
+
+class SummaryAggregator(object):
+    """Merges TensorBoard summaries of more batches into one.
+
+    Scalars with the same tag are averaged, weighted by the sizes of the
+    batches, histograms with the same tag are merged and other values (e.g.
+    images) are taken from the first batch that has them.
+    """
+
+    def __init__(self) -> None:
+        self._values = OrderedDict()  # type: Dict[str, tf.Summary.Value]
+        self._weights = {}  # type: Dict[str, float]
+        self._first_summary = None  # type: Any
+        self._num_summaries = 0
+
+    def add(self, summary: Any, weight: float = 1.) -> None:
+        """Add a summary protobuf or a serialized one of a batch."""
+        if summary is None:
+            return
+        if self._first_summary is None:
+            self._first_summary = summary
+        self._num_summaries += 1
+
+        if isinstance(summary, bytes):
+            summary = tf.Summary.FromString(summary)
+
+        for value in summary.value:
+            kind = value.WhichOneof("value")
+            merged = self._values.get(value.tag)
+
+            if merged is None:
+                merged = tf.Summary.Value()
+                merged.CopyFrom(value)
+                self._values[value.tag] = merged
+                if kind == "simple_value":
+                    merged.simple_value *= weight
+                    self._weights[value.tag] = weight
+            elif kind == "simple_value":
+                merged.simple_value += weight * value.simple_value
+                self._weights[value.tag] += weight
+            elif kind == "histo":
+                _merge_histograms(merged.histo, value.histo)
+
+    def summary(self) -> Any:
+        """Get the merged summary, None if no summary was added."""
+        if self._num_summaries <= 1:
+            return self._first_summary
+
+        values = []
+        for tag, value in self._values.items():
+            if tag in self._weights:
+                averaged = tf.Summary.Value()
+                averaged.CopyFrom(value)
+                averaged.simple_value /= max(self._weights[tag], 1e-12)
+                value = averaged
+            values.append(value)
+
+        return tf.Summary(value=values)
+
+
+class ResultAggregator(object):
+    """Aggregates the execution results of the batches of a dataset.
+
+    Outputs which are numpy arrays of the same shape and type are written
+    into a buffer allocated for the whole dataset when the first batch
+    arrives, so they are not copied again at the end. The buffer grows if
+    there are more outputs than expected. Other outputs are collected in a
+    list. The losses are averaged over all the output items
+    and the summaries are merged by the `SummaryAggregator`.
+    """
+
+    def __init__(self, num_items: int, keep_outputs: bool = True) -> None:
+        """Create the aggregator.
+
+        Arguments:
+            num_items: The expected number of the output items.
+            keep_outputs: Flag whether the outputs are kept, otherwise only
+                counted (e.g. because they are written to a file).
+        """
+        self.num_items = num_items
+        self.keep_outputs = keep_outputs
+
+        self._buffer = None  # type: Optional[np.ndarray]
+        self._outputs = []  # type: List[Any]
+        self._count = 0
+        self._losses_sum = None  # type: Optional[np.ndarray]
+        self._summaries = [SummaryAggregator() for _ in range(3)]
+
+    def add(self, result: ExecutionResult) -> None:
+        """Add the result of a batch."""
+        num_outputs = len(result.outputs)
+        if self.keep_outputs:
+            self._add_outputs(result.outputs)
+        self._count += num_outputs
+
+        losses = np.asarray(result.losses, dtype=np.float64)
+        if self._losses_sum is None:
+            self._losses_sum = losses
+        else:
+            self._losses_sum += losses
+
+        for aggregator, summary in zip(self._summaries, [
+                result.scalar_summaries, result.histogram_summaries,
+                result.image_summaries]):
+            aggregator.add(summary, max(num_outputs, 1))
+
+    def _add_outputs(self, outputs: Any) -> None:
+        if not self._outputs and self._buffer is None and len(outputs) > 0:
+            first = outputs[0]
+            if isinstance(first, np.ndarray):
+                self._buffer = np.empty(
+                    (max(self.num_items, len(outputs)),) + first.shape,
+                    dtype=first.dtype)
+
+        if self._buffer is not None:
+            item_shape = self._buffer.shape[1:]
+            if isinstance(outputs, np.ndarray):
+                fits = (outputs.shape[1:] == item_shape
+                        and outputs.dtype == self._buffer.dtype)
+            else:
+                fits = all(isinstance(item, np.ndarray)
+                           and item.shape == item_shape
+                           and item.dtype == self._buffer.dtype
+                           for item in outputs)
+
+            if fits:
+                end = self._count + len(outputs)
+                if end > len(self._buffer):
+                    # more outputs than expected, grow the buffer
+                    grown = np.empty(
+                        (max(end, 2 * len(self._buffer)),) + item_shape,
+                        dtype=self._buffer.dtype)
+                    grown[:self._count] = self._buffer[:self._count]
+                    self._buffer = grown
+
+                self._buffer[self._count:end] = outputs
+                return
+
+            # the outputs do not fit to the buffer, e.g. their shapes differ
+            self._outputs = list(self._buffer[:self._count])
+            self._buffer = None
+
+        self._outputs.extend(outputs)
+
+    def result(self) -> ExecutionResult:
+        """Get the aggregated result of all the added batches."""
+        if self._buffer is not None:
+            outputs = self._buffer[:self._count]  # type: Any
+        else:
+            outputs = self._outputs
+
+        if self._losses_sum is None:
+            losses = []  # type: List[float]
+        else:
+            losses = (self._losses_sum / max(self._count, 1)).tolist()
+
+        scalar, histogram, image = [aggregator.summary()
+                                    for aggregator in self._summaries]
+        return ExecutionResult(outputs, losses, scalar, histogram, image)
+
+
 def reduce_execution_results(
         execution_results: List[ExecutionResult]) -> ExecutionResult:
     """Aggregate execution results into one."""
-    outputs = []  # type: List[Any]
-    losses_sum = [0. for _ in execution_results[0].losses]
+    aggregator = ResultAggregator(
+        sum(len(result.outputs) for result in execution_results))
     for result in execution_results:
-        outputs.extend(result.outputs)
-        for i, loss in enumerate(result.losses):
-            losses_sum[i] += loss
-        # TODO aggregate TensorBoard summaries
-    if outputs and isinstance(outputs[0], np.ndarray):
-        outputs = np.array(outputs)
-    losses = [l / max(len(outputs), 1) for l in losses_sum]
-    return ExecutionResult(outputs, losses,
-                           execution_results[0].scalar_summaries,
-                           execution_results[0].histogram_summaries,
-                           execution_results[0].image_summaries)
+        aggregator.add(result)
+    return aggregator.result()
@@ -1,4 +1,4 @@
-from typing import Callable, List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 
 import numpy as np
 from typeguard import check_argument_types
@@ -11,6 +11,39 @@ from neuralmonkey.runners.base_runner import (BaseRunner, Executable,
 from neuralmonkey.vocabulary import Vocabulary, END_TOKEN
 
 
+# pylint: disable=invalid-name
+# list of hypotheses with their scores sorted from the best one
+NBestList = List[Tuple[List[str], float]]
+# pylint: enable=invalid-name
+
+
+def backtrack_beam(parent_ids: np.ndarray,
+                   token_ids: np.ndarray,
+                   hyp_indices: np.ndarray) -> np.ndarray:
+    """Recover the token sequences of hypotheses in the final beam.
+
+    All the hypotheses are followed back in time at once, each time step is
+    a single gather from the beam.
+
+    Arguments:
+        parent_ids: Beam indices of the parent hypotheses, shape (time, beam).
+        token_ids: Tokens of the hypotheses, shape (time, beam).
+        hyp_indices: Indices of the hypotheses in the final beam.
+
+    Returns:
+        Token indices of the hypotheses, shape (time, hypotheses).
+    """
+    max_time = token_ids.shape[0]
+    tokens = np.empty((max_time, len(hyp_indices)), dtype=token_ids.dtype)
+
+    hyps = np.asarray(hyp_indices)
+    for time in reversed(range(max_time)):
+        tokens[time] = token_ids[time, hyps]
+        hyps = parent_ids[time, hyps]
+
+    return tokens
+
+
 class BeamSearchExecutable(Executable):
     def __init__(self,
                  rank: int,
@@ -35,7 +68,6 @@ class BeamSearchExecutable(Executable):
             raise ValueError("Beam search runner does not support ensembling.")
 
         evaluated_bs = results[0]['bs_outputs']
-        max_time = evaluated_bs.scores.shape[0]
 
         # pick the end of the hypothesis based on its rank
         hyp_index = np.argpartition(
@@ -43,14 +75,10 @@ class BeamSearchExecutable(Executable):
         bs_score = evaluated_bs.scores[-1][hyp_index]
 
         # now backtrack
-        output_tokens = []  # type: List[str]
-        for time in reversed(range(max_time)):
-            token_id = evaluated_bs.token_ids[time][hyp_index]
-            token = self._vocabulary.index_to_word[token_id]
-            output_tokens.append(token)
-            hyp_index = evaluated_bs.parent_ids[time][hyp_index]
-
-        output_tokens.reverse()
+        token_ids = backtrack_beam(evaluated_bs.parent_ids,
+                                   evaluated_bs.token_ids, [hyp_index])
+        output_tokens = [self._vocabulary.index_to_word[token_id]
+                         for token_id in token_ids[:, 0]]
 
         before_eos_tokens = []  # type: List[str]
         for tok in output_tokens:
@@ -71,6 +99,54 @@ class BeamSearchExecutable(Executable):
             image_summaries=None)
 
 
+class BeamSearchNBestExecutable(Executable):
+    def __init__(self,
+                 max_rank: int,
+                 all_encoders: List[ModelPart],
+                 bs_outputs: SearchStepOutput,
+                 vocabulary: Vocabulary,
+                 postprocess: Optional[Callable]) -> None:
+
+        self._max_rank = max_rank
+        self._all_encoders = all_encoders
+        self._bs_outputs = bs_outputs
+        self._vocabulary = vocabulary
+        self._postprocess = postprocess
+
+        self.result = None  # type: Optional[ExecutionResult]
+
+    def next_to_execute(self) -> NextExecute:
+        return self._all_encoders, {'bs_outputs': self._bs_outputs}, {}
+
+    def collect_results(self, results: List[Dict]) -> None:
+        if len(results) > 1:
+            raise ValueError("Beam search runner does not support ensembling.")
+
+        evaluated_bs = results[0]['bs_outputs']
+        final_scores = evaluated_bs.scores[-1]
+
+        # the final beam sorted by score
+        hyp_indices = np.argsort(-final_scores,
+                                 kind="mergesort")[:self._max_rank]
+
+        token_ids = backtrack_beam(evaluated_bs.parent_ids,
+                                   evaluated_bs.token_ids, hyp_indices)
+        hypotheses = self._vocabulary.vectors_to_sentences(list(token_ids))
+
+        if self._postprocess is not None:
+            hypotheses = self._postprocess(hypotheses)
+
+        nbest_list = list(zip(hypotheses,
+                              final_scores[hyp_indices].tolist()))
+
+        self.result = ExecutionResult(
+            outputs=[nbest_list],
+            losses=[nbest_list[0][1]],
+            scalar_summaries=None,
+            histogram_summaries=None,
+            image_summaries=None)
+
+
 class BeamSearchRunner(BaseRunner):
     def __init__(self,
                  output_series: str,
@@ -104,6 +180,59 @@ class BeamSearchRunner(BaseRunner):
         return None
 
 
+class BeamSearchNBestRunner(BaseRunner):
+    """Runner producing the n-best lists of the beam search.
+
+    The output series contains for each sentence the list of the best
+    hypotheses with their scores. When written to a file, the lists are
+    formatted as the Moses n-best lists (see `NBestWriter`).
+    """
+
+    def __init__(self,
+                 output_series: str,
+                 decoder: BeamSearchDecoder,
+                 max_rank: int = None,
+                 postprocess: Callable[[List[str]], List[str]] = None) -> None:
+        """Create the n-best runner.
+
+        Args:
+            output_series: Name of the n-best series.
+            decoder: The beam search decoder.
+            max_rank: Maximum rank of the hypotheses, the whole beam by
+                default.
+            postprocess: Series-level postprocess applied on the hypotheses
+                of each sentence.
+        """
+        super(BeamSearchNBestRunner, self).__init__(output_series, decoder)
+        check_argument_types()
+
+        if max_rank is None:
+            max_rank = decoder.beam_size
+
+        if max_rank < 1 or max_rank > decoder.beam_size:
+            raise ValueError(
+                ("The maximum rank must be between 1 and the beam "
+                 "size ({}), was {}.").format(decoder.beam_size, max_rank))
+
+        self._max_rank = max_rank
+        self._postprocess = postprocess
+
+    def get_executable(self,
+                       compute_losses: bool = False,
+                       summaries: bool = True) -> BeamSearchNBestExecutable:
+        return BeamSearchNBestExecutable(
+            self._max_rank, self.all_coders, self._decoder.outputs,
+            self._decoder.vocabulary, self._postprocess)
+
+    @property
+    def loss_names(self) -> List[str]:
+        return ["beam_search_score"]
+
+    @property
+    def decoder_data_id(self) -> Optional[str]:
+        return None
+
+
 def beam_search_runner_range(output_series: str,
                              decoder: BeamSearchDecoder,
                              max_rank: int = None,
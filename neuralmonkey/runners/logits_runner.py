@@ -11,11 +11,40 @@ import tensorflow as tf
 
 from neuralmonkey.runners.base_runner import (BaseRunner, Executable,
                                               FeedDict, ExecutionResult,
-                                              NextExecute)
+                                              NextExecute, OUTPUT_DTYPES)
 from neuralmonkey.model.model_part import ModelPart
 from neuralmonkey.vocabulary import Vocabulary
 
 
+def sparse_top_k(values: np.ndarray, k: int,
+                 dtype: str = "float32") -> np.ndarray:
+    """Keep the k largest values along the last axis with their indices.
+
+    Arguments:
+        values: The array of the values.
+        k: Number of the values to keep.
+        dtype: Data type of the kept values.
+
+    Returns:
+        Structured array with the fields ``index`` and ``value`` of the shape
+        of the values with the last dimension replaced by k. The items are
+        sorted from the largest value.
+    """
+    k = min(k, values.shape[-1])
+    flat_values = values.reshape(-1, values.shape[-1])
+    rows = np.arange(flat_values.shape[0])[:, np.newaxis]
+
+    indices = np.argpartition(-flat_values, k - 1, axis=1)[:, :k]
+    order = np.argsort(-flat_values[rows, indices], axis=1, kind="mergesort")
+    indices = indices[rows, order]
+
+    sparse = np.empty(flat_values.shape[:1] + (k,),
+                      dtype=[("index", np.int32), ("value", dtype)])
+    sparse["index"] = indices
+    sparse["value"] = flat_values[rows, indices]
+    return sparse.reshape(values.shape[:-1] + (k,))
+
+
 class LogitsExecutable(Executable):
 
     def __init__(self,
@@ -23,12 +52,16 @@ class LogitsExecutable(Executable):
                  fetches: FeedDict,
                  vocabulary: Vocabulary,
                  normalize: bool = True,
-                 pick_index: int = None) -> None:
+                 pick_index: int = None,
+                 output_dtype: str = None,
+                 top_k: int = None) -> None:
         self.all_coders = all_coders
         self._fetches = fetches
         self._vocabulary = vocabulary
         self._normalize = normalize
         self._pick_index = pick_index
+        self._output_dtype = output_dtype
+        self._top_k = top_k
 
         self.decoded_sentences = []  # type: List[List[str]]
         self.result = None  # type: Optional[ExecutionResult]
@@ -48,6 +81,15 @@ class LogitsExecutable(Executable):
         # logits_list in shape (time, batch, vocab)
         logits_list = results[0]["logits"]
 
+        if self._output_dtype is not None:
+            self.result = ExecutionResult(
+                outputs=self._array_outputs(logits_list),
+                losses=[train_loss, runtime_loss],
+                scalar_summaries=None,
+                histogram_summaries=None,
+                image_summaries=None)
+            return
+
         # outputs are lists of strings (batch, time)
         outputs = [[] for _ in logits_list[0]]  # type: List[List[str]]
 
@@ -72,6 +114,21 @@ class LogitsExecutable(Executable):
             histogram_summaries=None,
             image_summaries=None)
 
+    def _array_outputs(self, logits_list: np.ndarray) -> np.ndarray:
+        """Get the outputs as a numpy array of shape (batch, time, ...)."""
+        logits = np.transpose(np.asarray(logits_list, dtype=np.float32),
+                              (1, 0, 2))
+
+        if self._normalize:
+            logits = np.exp(logits - logits.max(axis=2, keepdims=True))
+            logits /= logits.sum(axis=2, keepdims=True)
+
+        if self._pick_index is not None:
+            return logits[:, :, self._pick_index].astype(self._output_dtype)
+        if self._top_k is not None:
+            return sparse_top_k(logits, self._top_k, self._output_dtype)
+        return logits.astype(self._output_dtype)
+
 
 # pylint: disable=too-few-public-methods
 class LogitsRunner(BaseRunner):
@@ -81,6 +138,11 @@ class LogitsRunner(BaseRunner):
     values. If the decoder produces a list of logits (as the recurrent
     decoder), the tab separated arrays are separated with commas.
     Alternatively, we may be interested in a single distribution dimension.
+
+    With an output data type, the outputs are numpy arrays of shape
+    (time, vocabulary) for each sentence instead, which are written to
+    ``.npy`` files. They can be reduced to the k most probable words stored
+    as a structured array of indices and values (see `sparse_top_k`).
     """
 
     def __init__(self,
@@ -88,7 +150,9 @@ class LogitsRunner(BaseRunner):
                  decoder: Any,
                  normalize: bool = True,
                  pick_index: int = None,
-                 pick_value: str = None) -> None:
+                 pick_value: str = None,
+                 output_dtype: str = None,
+                 top_k: int = None) -> None:
         """Initializes the logits runner.
 
         Args:
@@ -100,6 +164,11 @@ class LogitsRunner(BaseRunner):
                 probability that should be on output.
             pick_value: If not None, it specifies a value from the decoder's
                 vocabulary whose logit or probability should be on output.
+            output_dtype: Numpy data type of the outputs, ``float16`` or
+                ``float32``. If not given, the outputs are strings.
+            top_k: If not None, only the k largest values of each
+                distribution are on output with their indices. Requires
+                the output data type.
         """
         super(LogitsRunner, self).__init__(output_series, decoder)
         check_argument_types()
@@ -108,7 +177,19 @@ class LogitsRunner(BaseRunner):
             raise ValueError("Either a pick index or a vocabulary value can "
                              "be specified, not both at the same time.")
 
+        if output_dtype not in OUTPUT_DTYPES:
+            raise ValueError("Unsupported output data type '{}'."
+                             .format(output_dtype))
+
+        if top_k is not None and (output_dtype is None or top_k < 1
+                                  or pick_index is not None
+                                  or pick_value is not None):
+            raise ValueError("The top k values can be picked only from whole "
+                             "distributions with an output data type.")
+
         self._normalize = normalize
+        self._output_dtype = output_dtype
+        self._top_k = top_k
         if pick_value is not None:
             if pick_value in decoder.vocabulary:
                 self._pick_index = decoder.vocabulary.word_to_index[pick_value]
@@ -134,7 +215,9 @@ class LogitsRunner(BaseRunner):
         return LogitsExecutable(self.all_coders, fetches,
                                 self._decoder.vocabulary,
                                 self._normalize,
-                                self._pick_index)
+                                self._pick_index,
+                                self._output_dtype,
+                                self._top_k)
 
     @property
     def loss_names(self) -> List[str]:
@@ -8,17 +8,20 @@ import tensorflow as tf
 
 from neuralmonkey.model.model_part import ModelPart
 from neuralmonkey.runners.base_runner import (BaseRunner, Executable,
-                                              ExecutionResult, NextExecute)
+                                              ExecutionResult, NextExecute,
+                                              OUTPUT_DTYPES)
 
 
 class RepresentationExecutable(Executable):
 
     def __init__(self, prev_coders: List[ModelPart],
                  encoded: tf.Tensor,
-                 used_session: int) -> None:
+                 used_session: int,
+                 output_dtype: Optional[str] = None) -> None:
         self._prev_coders = prev_coders
         self._encoded = encoded
         self._used_session = used_session
+        self._output_dtype = output_dtype
 
         self.result = None  # type: Optional[ExecutionResult]
 
@@ -32,9 +35,13 @@ class RepresentationExecutable(Executable):
                                   self._used_session, len(results)))
 
         vectors = results[self._used_session]['encoded']
+        if self._output_dtype is None:
+            outputs = vectors.tolist()
+        else:
+            outputs = vectors.astype(self._output_dtype, copy=False)
 
         self.result = ExecutionResult(
-            outputs=vectors.tolist(),
+            outputs=outputs,
             losses=[],
             scalar_summaries=None,
             histogram_summaries=None,
@@ -45,13 +52,15 @@ class RepresentationRunner(BaseRunner):
     """Runner printing out representation from a encoder.
 
     Using this runner is the way how to get input / other data representation
-    out from Neural Monkey.
+    out from Neural Monkey. With an output data type, the batches of the
+    vectors are kept as numpy arrays, which are written to ``.npy`` files.
     """
 
     def __init__(self,
                  output_series: str,
                  encoder: ModelPart,
-                 used_session: int = 0) -> None:
+                 used_session: int = 0,
+                 output_dtype: str = None) -> None:
         """Initialize the representation runner.
 
         Args:
@@ -59,17 +68,26 @@ class RepresentationRunner(BaseRunner):
             encoder: Used encoder.
             used_session: Id of the TensorFlow session used in case of model
                 ensembles.
+            output_dtype: Numpy data type of the vectors, ``float16`` or
+                ``float32``. If not given, the vectors are converted to lists
+                of floats.
         """
         super(RepresentationRunner, self).__init__(output_series, encoder)
 
+        if output_dtype not in OUTPUT_DTYPES:
+            raise ValueError("Unsupported output data type '{}'."
+                             .format(output_dtype))
+
         self._used_session = used_session
+        self._output_dtype = output_dtype
         self._encoded = encoder.encoded  # type: ignore
 
     def get_executable(self, compute_losses=False,
                        summaries=True) -> RepresentationExecutable:
         return RepresentationExecutable(self.all_coders,
                                         self._encoded,
-                                        self._used_session)
+                                        self._used_session,
+                                        self._output_dtype)
 
     @property
     def loss_names(self) -> List[str]:
@@ -1,13 +1,87 @@
-from typing import Callable, Dict, List, Any
-# pylint: disable=unused-import
-from typing import Optional
-# pylint: enable=unused-import
+from typing import Any, Callable, Dict, List, Optional
 
 import numpy as np
 import tensorflow as tf
 
 from neuralmonkey.runners.base_runner import (BaseRunner, Executable,
                                               ExecutionResult, NextExecute)
+from neuralmonkey.vocabulary import END_TOKEN_INDEX
+
+# ways of combining the distributions of the models in an ensemble
+PROBABILITY_AVERAGE = "probability_average"
+LOGLINEAR_AVERAGE = "loglinear_average"
+ENSEMBLE_MODES = [PROBABILITY_AVERAGE, LOGLINEAR_AVERAGE]
+
+
+def combine_logprobs(logprobs: np.ndarray,
+                     mode: str = PROBABILITY_AVERAGE,
+                     weights: Optional[List[float]] = None) -> np.ndarray:
+    """Combine log-probabilities of an ensemble of models.
+
+    Arguments:
+        logprobs: Log-probabilities of the models stacked along the first
+            axis.
+        mode: Either `probability_average` for the (weighted) arithmetic mean
+            of the probabilities, or `loglinear_average` for the (weighted)
+            mean of the log-probabilities.
+        weights: Weights of the models, the models are weighted uniformly by
+            default.
+
+    Returns:
+        The combined log-probabilities (not normalized in the log-linear
+        mode) with the first axis removed.
+    """
+    num_models = logprobs.shape[0]
+    if weights is None:
+        weights = [1. / num_models] * num_models
+    if len(weights) != num_models:
+        raise ValueError("Got {} ensemble weights for {} models.".format(
+            len(weights), num_models))
+
+    weights_array = np.array(weights, dtype=logprobs.dtype).reshape(
+        (num_models,) + (1,) * (logprobs.ndim - 1))
+
+    if mode == PROBABILITY_AVERAGE:
+        # logsumexp shifted by the maximum for numerical stability
+        with np.errstate(divide="ignore"):
+            weighted = logprobs + np.log(weights_array)
+            maximum = weighted.max(axis=0)
+            maximum[~np.isfinite(maximum)] = 0.
+            return maximum + np.log(np.exp(weighted - maximum).sum(axis=0))
+    if mode == LOGLINEAR_AVERAGE:
+        return (logprobs * weights_array).sum(axis=0)
+
+    raise ValueError("Unknown ensemble mode '{}', use one of {}.".format(
+        mode, ENSEMBLE_MODES))
+
+
+def stack_session_logprobs(logprobs: List[np.ndarray]) -> np.ndarray:
+    """Stack the log-probabilities decoded by the sessions of an ensemble.
+
+    Each session stops decoding when all its sentences end, so the sessions
+    may decode different numbers of steps. The shorter outputs are padded
+    along the time (first) axis with steps where the end token has
+    probability one, i.e. the finished model keeps voting for ending.
+
+    Arguments:
+        logprobs: Arrays of shape `(time, batch, vocabulary)` of the
+            sessions.
+
+    Returns:
+        Array of shape `(sessions, max_time, batch, vocabulary)`.
+    """
+    max_time = max(session_logprobs.shape[0] for session_logprobs in logprobs)
+    padded = []
+    for session_logprobs in logprobs:
+        missing = max_time - session_logprobs.shape[0]
+        if missing > 0:
+            padding = np.full((missing,) + session_logprobs.shape[1:],
+                              -np.inf, dtype=session_logprobs.dtype)
+            padding[..., END_TOKEN_INDEX] = 0.
+            session_logprobs = np.concatenate([session_logprobs, padding])
+        padded.append(session_logprobs)
+    return np.stack(padded)
+
 
 # pylint: disable=too-few-public-methods
 
@@ -17,9 +91,27 @@ class GreedyRunner(BaseRunner):
     def __init__(self,
                  output_series: str,
                  decoder: Any,
-                 postprocess: Callable[[List[str]], List[str]] = None) -> None:
+                 postprocess: Callable[[List[str]], List[str]] = None,
+                 ensemble_mode: str = PROBABILITY_AVERAGE,
+                 ensemble_weights: Optional[List[float]] = None) -> None:
+        """Create a runner for greedy decoding.
+
+        Arguments:
+            output_series: Name of the output series.
+            decoder: The decoder.
+            postprocess: Series-level postprocess applied on the output.
+            ensemble_mode: How the outputs of the sessions of an ensemble are
+                combined, see `combine_logprobs`.
+            ensemble_weights: Weights of the sessions of an ensemble.
+        """
         super(GreedyRunner, self).__init__(output_series, decoder)
+        if ensemble_mode not in ENSEMBLE_MODES:
+            raise ValueError("Unknown ensemble mode '{}', use one of {}."
+                             .format(ensemble_mode, ENSEMBLE_MODES))
+
         self._postprocess = postprocess
+        self._ensemble_mode = ensemble_mode
+        self._ensemble_weights = ensemble_weights
 
         val_plot_summaries = tf.get_collection("summary_val_plots")
         if val_plot_summaries:
@@ -42,7 +134,9 @@ class GreedyRunner(BaseRunner):
 
         return GreedyRunExecutable(self.all_coders, fetches,
                                    self._decoder.vocabulary,
-                                   self._postprocess)
+                                   self._postprocess,
+                                   self._ensemble_mode,
+                                   self._ensemble_weights)
 
     @property
     def loss_names(self) -> List[str]:
@@ -51,11 +145,16 @@ class GreedyRunner(BaseRunner):
 
 class GreedyRunExecutable(Executable):
 
-    def __init__(self, all_coders, fetches, vocabulary, postprocess) -> None:
+    # pylint: disable=too-many-arguments
+    def __init__(self, all_coders, fetches, vocabulary, postprocess,
+                 ensemble_mode: str = PROBABILITY_AVERAGE,
+                 ensemble_weights: Optional[List[float]] = None) -> None:
         self.all_coders = all_coders
         self._fetches = fetches
         self._vocabulary = vocabulary
         self._postprocess = postprocess
+        self._ensemble_mode = ensemble_mode
+        self._ensemble_weights = ensemble_weights
 
         self.decoded_sentences = []  # type: List[List[str]]
         self.result = None  # type: Optional[ExecutionResult]
@@ -65,19 +164,19 @@ class GreedyRunExecutable(Executable):
         return self.all_coders, self._fetches, {}
 
     def collect_results(self, results: List[Dict]) -> None:
-        train_loss = 0.
-        runtime_loss = 0.
-        summed_logprobs = [-np.inf for _ in range(
-            results[0]["decoded_logprobs"].shape[0])]
+        train_loss = sum(res["train_xent"] for res in results)
+        runtime_loss = sum(res["runtime_xent"] for res in results)
 
-        for sess_result in results:
-            train_loss += sess_result["train_xent"]
-            runtime_loss += sess_result["runtime_xent"]
-
-            for i, logprob in enumerate(sess_result["decoded_logprobs"]):
-                summed_logprobs[i] = np.logaddexp(summed_logprobs[i], logprob)
+        # shape(logprobs) = time x batch x vocabulary
+        if len(results) == 1 and self._ensemble_weights is None:
+            logprobs = results[0]["decoded_logprobs"]
+        else:
+            logprobs = combine_logprobs(
+                stack_session_logprobs(
+                    [res["decoded_logprobs"] for res in results]),
+                self._ensemble_mode, self._ensemble_weights)
 
-        argmaxes = [np.argmax(l, axis=1) for l in summed_logprobs]
+        argmaxes = np.argmax(logprobs, axis=2)
 
         decoded_tokens = self._vocabulary.vectors_to_sentences(argmaxes)
 
@@ -0,0 +1,218 @@
+"""Forced decoding of given hypotheses, e.g. for n-best list rescoring.
+
+The scored dataset contains a list of hypotheses for each source sentence.
+The hypotheses are scored by the decoder in the teacher-forced (training)
+mode in two session runs. The first one runs the encoders once for each
+source sentence and fetches the encoder states the decoder depends on. The
+second one feeds the states repeated for every hypothesis of the source
+instead of running the encoders again, and computes the log-probabilities
+of the hypothesis tokens.
+"""
+# pylint: disable=unused-import
+from typing import Any, Dict, List, Optional, Set, Tuple
+# pylint: enable=unused-import
+
+import numpy as np
+import tensorflow as tf
+from typeguard import check_argument_types
+
+from neuralmonkey.dataset import Dataset
+from neuralmonkey.decoders.decoder import Decoder
+from neuralmonkey.decorators import tensor
+from neuralmonkey.model.model_part import ModelPart, FeedDict
+from neuralmonkey.runners.base_runner import (BaseRunner, Executable,
+                                              ExecutionResult, NextExecute)
+from neuralmonkey.vocabulary import START_TOKEN
+
+# pylint: disable=invalid-name
+# hypothesis tokens, total log-probability, log-probabilities of the tokens
+# (including the end of the sentence)
+ScoredHypothesis = Tuple[List[str], float, List[float]]
+# pylint: enable=invalid-name
+
+
+class HypothesesFeeder(ModelPart):
+    """Feeds the hypotheses of each source sentence in a flat batch."""
+
+    def __init__(self, name: str, decoder: Decoder, data_id: str) -> None:
+        ModelPart.__init__(self, name, None, None)
+        check_argument_types()
+
+        self.decoder = decoder
+        self.data_id = data_id
+
+    # pylint: disable=no-self-use
+    @tensor
+    def hypotheses(self) -> tf.Tensor:
+        # NOTE transposed shape (time, hypotheses) as the decoder inputs
+        return tf.placeholder(tf.int32, [None, None], name="hypotheses")
+
+    @tensor
+    def hypothesis_mask(self) -> tf.Tensor:
+        return tf.placeholder(tf.float32, [None, None],
+                              name="hypothesis_mask")
+
+    @tensor
+    def source_ids(self) -> tf.Tensor:
+        """Index of the source sentence of each hypothesis in the batch."""
+        return tf.placeholder(tf.int32, [None], name="source_ids")
+    # pylint: enable=no-self-use
+
+    def feed_dict(self, dataset: Dataset, train: bool = False) -> FeedDict:
+        hypotheses = []  # type: List[List[str]]
+        source_ids = []  # type: List[int]
+
+        for source_id, hypothesis_list in enumerate(
+                dataset.get_series(self.data_id)):
+            for hypothesis in hypothesis_list:
+                # n-best lists contain tuples of hypotheses and scores
+                if isinstance(hypothesis, tuple):
+                    hypothesis = hypothesis[0]
+                hypotheses.append(hypothesis)
+                source_ids.append(source_id)
+
+        inputs, weights = self.decoder.vocabulary.sentences_to_tensor(
+            hypotheses, self.decoder.max_output_len, train_mode=False,
+            add_start_symbol=False, add_end_symbol=True,
+            pad_to_max_len=False)
+
+        return {self.hypotheses: inputs,
+                self.hypothesis_mask: weights,
+                self.source_ids: np.array(source_ids, dtype=np.int32)}
+
+
+class ScoringExecutable(Executable):
+
+    def __init__(self,
+                 all_coders: Set[ModelPart],
+                 decoder: Decoder,
+                 feeder: HypothesesFeeder,
+                 encoder_states: List[tf.Tensor],
+                 token_logprobs: tf.Tensor) -> None:
+        self._all_coders = all_coders
+        self._decoder = decoder
+        self._feeder = feeder
+        self._encoder_states = encoder_states
+        self._token_logprobs = token_logprobs
+
+        self._inputs = None  # type: Optional[Dict[str, Any]]
+        self.result = None  # type: Optional[ExecutionResult]
+
+    def next_to_execute(self) -> NextExecute:
+        if self._inputs is None:
+            return self._all_coders, {
+                "encoder_states": self._encoder_states,
+                "hypotheses": self._feeder.hypotheses,
+                "hypothesis_mask": self._feeder.hypothesis_mask,
+                "source_ids": self._feeder.source_ids,
+                "num_sources": self._decoder.batch_size}, {}
+
+        source_ids = self._inputs["source_ids"]
+        feed_dict = {
+            state: value[source_ids] for state, value in zip(
+                self._encoder_states, self._inputs["encoder_states"])}
+        feed_dict.update({
+            self._decoder.train_inputs: self._inputs["hypotheses"],
+            self._decoder.train_padding: self._inputs["hypothesis_mask"],
+            self._decoder.go_symbols: np.full(
+                [len(source_ids)],
+                self._decoder.vocabulary.get_word_index(START_TOKEN),
+                dtype=np.int32),
+            self._decoder.train_mode: False})
+
+        return self._all_coders, {"token_logprobs": self._token_logprobs}, \
+            feed_dict
+
+    def collect_results(self, results: List[Dict]) -> None:
+        if self._inputs is None:
+            # the inputs are the same in all sessions, but the encoder
+            # states differ, which would not work with more sessions
+            if len(results) > 1:
+                raise ValueError(
+                    "Scoring runner does not support ensembling.")
+            self._inputs = results[0]
+            return
+
+        # shape(token_logprobs) = time x hypotheses
+        token_logprobs = results[0]["token_logprobs"]
+        mask = self._inputs["hypothesis_mask"]
+        lengths = mask.sum(axis=0).astype(int)
+        totals = (token_logprobs * mask).sum(axis=0)
+        hypotheses = self._decoder.vocabulary.vectors_to_sentences(
+            list(self._inputs["hypotheses"]))
+
+        outputs = [[] for _ in range(self._inputs["num_sources"])]
+        # type: List[List[ScoredHypothesis]]
+
+        for i, source_id in enumerate(self._inputs["source_ids"]):
+            outputs[source_id].append(
+                (hypotheses[i], float(totals[i]),
+                 token_logprobs[:lengths[i], i].tolist()))
+
+        self.result = ExecutionResult(
+            outputs=outputs,
+            losses=[-float(totals.sum())],
+            scalar_summaries=None,
+            histogram_summaries=None,
+            image_summaries=None)
+
+
+class ScoringRunner(BaseRunner):
+    """Runner computing log-probabilities of given hypotheses.
+
+    For each source sentence, the output series contains the list of
+    tuples of the hypothesis (as seen by the decoder, i.e. with unknown
+    words replaced), its total log-probability and the log-probabilities of
+    its tokens including the end of the sentence.
+    When written to a file, the lists are formatted as the Moses n-best
+    lists with the total log-probability as the score.
+    """
+
+    def __init__(self,
+                 output_series: str,
+                 decoder: Decoder,
+                 data_id: str) -> None:
+        """Create the scoring runner.
+
+        Args:
+            output_series: Name of the output series.
+            decoder: The decoder scoring the hypotheses.
+            data_id: Series with a list of hypotheses for each sentence,
+                e.g. read by `nbest_reader` or produced by the
+                `BeamSearchNBestRunner`.
+        """
+        super(ScoringRunner, self).__init__(output_series, decoder)
+        check_argument_types()
+
+        self._feeder = HypothesesFeeder(
+            "{}_hypotheses".format(output_series), decoder, data_id)
+        self.all_coders = self.all_coders.union([self._feeder])
+
+        # the tensors the teacher-forced decoding depends on
+        self._encoder_states = [decoder.initial_state]
+        for encoder in decoder.encoders:
+            attention = decoder.get_attention_object(encoder, True)
+            if attention is not None:
+                self._encoder_states.append(attention.attention_states)
+                if attention.input_weights is not None:
+                    self._encoder_states.append(attention.input_weights)
+
+        vocabulary_size = len(decoder.vocabulary)
+        self._token_logprobs = tf.reduce_sum(
+            decoder.train_logprobs * tf.one_hot(decoder.train_inputs,
+                                                vocabulary_size),
+            axis=2)
+
+    def get_executable(self, compute_losses=False,
+                       summaries=True) -> ScoringExecutable:
+        return ScoringExecutable(self.all_coders, self._decoder,
+                                 self._feeder, self._encoder_states,
+                                 self._token_logprobs)
+
+    @property
+    def loss_names(self) -> List[str]:
+        return ["negative_logprob"]
+
+    @property
+    def decoder_data_id(self) -> Optional[str]:
+        return None
@@ -31,7 +31,7 @@ def post_request():
             # TODO check the dataset
             # check_dataset_and_coders(dataset, args.encoders)
 
-            _, response_data = run_on_dataset(
+            _, response_data, _ = run_on_dataset(
                 args.tf_manager, args.runners,
                 dataset, args.postprocess, write_out=False)
             code = 200
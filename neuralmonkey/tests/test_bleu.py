@@ -51,6 +51,37 @@ class TestBLEU(unittest.TestCase):
         score = FUNC(DECODED, REFERENCE)
         self.assertAlmostEqual(score, 15, delta=10)
 
+    def test_reference_cache(self):
+        evaluator = BLEUEvaluator()
+        score = evaluator(DECODED, REFERENCE)
+
+        # the second call promotes the references, the third reads them
+        self.assertEqual(evaluator(DECODED, REFERENCE), score)
+        self.assertEqual(evaluator(DECODED, REFERENCE), score)
+
+        # equal references in a different object are not mixed up
+        other_reference = [list(r) for r in DECODED]
+        self.assertEqual(evaluator(DECODED, other_reference), 100)
+        self.assertEqual(evaluator(DECODED, REFERENCE), score)
+
+    def test_all_ngram_counts(self):
+        counts = BLEUEvaluator.all_ngram_counts(["A", "b", "a"], 2, True)
+        self.assertEqual(counts, {("a",): 2, ("b",): 1,
+                                  ("a", "b"): 1, ("b", "a"): 1})
+
+    def test_clipped_matches(self):
+        # the reference count of an n-gram is not counted more times than
+        # the n-gram occurs in the hypothesis
+        precision, generated = BLEUEvaluator.modified_ngram_precision(
+            [["the", "cat"]], [[["the", "cat", "the", "the"]]], 1, True)
+        self.assertEqual(precision, 1.0)
+        self.assertEqual(generated, 2)
+
+        precision, _ = BLEUEvaluator.modified_ngram_precision(
+            [["the", "the", "the"]], [[["the", "cat"], ["the", "the"]]],
+            1, True)
+        self.assertAlmostEqual(precision, 2 / 3)
+
 
 if __name__ == "__main__":
     unittest.main()
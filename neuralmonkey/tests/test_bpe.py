@@ -0,0 +1,54 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the BPE pre- and postprocessors"""
+
+import unittest
+
+from neuralmonkey import worker_pool
+from neuralmonkey.processors.bpe import BPEPreprocessor, BPEPostprocessor
+
+MERGES = "tests/data/merges_100.bpe"
+
+with open("tests/data/val.tc.en", encoding="utf-8") as f_val:
+    SENTENCES = [line.split() for line in f_val]
+
+
+class TestBPE(unittest.TestCase):
+
+    def test_segment_batch(self):
+        preprocessor = BPEPreprocessor(MERGES)
+        self.assertEqual(preprocessor.segment_batch(SENTENCES),
+                         [preprocessor(s) for s in SENTENCES])
+
+    def test_decode_batch(self):
+        preprocessor = BPEPreprocessor(MERGES)
+        postprocessor = BPEPostprocessor()
+        segmented = [preprocessor(s) for s in SENTENCES] + [[]]
+
+        decoded = postprocessor(segmented)
+        self.assertEqual(decoded, [postprocessor.decode(s) for s in segmented])
+        self.assertEqual(decoded[:-1], SENTENCES)
+
+    def test_decode_batch_newline_token(self):
+        postprocessor = BPEPostprocessor()
+        sentences = [["a@@", "b\nc"], ["d@@", "e"]]
+        self.assertEqual(postprocessor.decode_batch(sentences),
+                         [["ab\nc"], ["de"]])
+
+    def test_worker_pool(self):
+        original_min_batch = worker_pool.MIN_PARALLEL_BATCH
+        worker_pool.MIN_PARALLEL_BATCH = 1
+        preprocessor = BPEPreprocessor(MERGES, num_workers=2)
+        postprocessor = BPEPostprocessor(num_workers=2)
+        try:
+            segmented = preprocessor.segment_batch(SENTENCES)
+
+            self.assertEqual(segmented, [preprocessor(s) for s in SENTENCES])
+            self.assertEqual(postprocessor(segmented), SENTENCES)
+        finally:
+            worker_pool.MIN_PARALLEL_BATCH = original_min_batch
+            preprocessor.close()
+            postprocessor.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
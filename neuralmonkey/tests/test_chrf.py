@@ -0,0 +1,48 @@
+#!/usr/bin/env python3.5
+
+import unittest
+
+from lib.subword_nmt import chrF
+from neuralmonkey.evaluators.chrf import ChrFEvaluator, ChrF3
+from neuralmonkey.tests.test_bleu import DECODED, REFERENCE
+
+
+def reference_chrf(decoded, reference, n, beta, spaces):
+    correct = [0] * n
+    total = [0] * n
+    total_ref = [0] * n
+    for hyp, ref in zip(decoded, reference):
+        ngrams_ref = chrF.extract_ngrams(" ".join(ref), n, spaces)
+        ngrams_hyp = chrF.extract_ngrams(" ".join(hyp), n, spaces)
+        chrF.get_correct(ngrams_ref, ngrams_hyp, correct, total)
+        for rank in ngrams_ref:
+            total_ref[rank] += sum(ngrams_ref[rank].values())
+
+    return chrF.f1(correct, total, total_ref, n, beta)[0]
+
+
+class TestChrF(unittest.TestCase):
+
+    def test_empty_decoded(self):
+        self.assertEqual(ChrF3([[] for _ in DECODED], REFERENCE), 0)
+
+    def test_identical(self):
+        self.assertAlmostEqual(ChrF3(REFERENCE, REFERENCE), 1.0)
+
+    def test_empty_sentences(self):
+        self.assertEqual(ChrF3([[]], [[]]), 1)
+
+    def test_multiplicities(self):
+        evaluator = ChrFEvaluator(n=1)
+        self.assertAlmostEqual(evaluator([["aaaa"]], [["a"]]), 0.4)
+
+    def test_subword_nmt_chrf(self):
+        for n, beta, spaces in [(6, 3, False), (3, 1, True)]:
+            evaluator = ChrFEvaluator(n=n, beta=beta, spaces=spaces)
+            self.assertAlmostEqual(
+                evaluator(DECODED, REFERENCE),
+                reference_chrf(DECODED, REFERENCE, n, beta, spaces))
+
+
+if __name__ == "__main__":
+    unittest.main()
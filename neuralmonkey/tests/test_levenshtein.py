@@ -0,0 +1,58 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the edit distance engine"""
+
+import unittest
+
+from neuralmonkey import levenshtein, worker_pool
+from neuralmonkey.levenshtein import (
+    DIAGONAL, UP, LEFT, edit_backpointers, lcs_length, map_pairs,
+    translation_edit_rate)
+
+REF = ("SAUDI ARABIA denied THIS WEEK information published in the "
+       "AMERICAN new york times").split()
+HYP = ("THIS WEEK THE SAUDIS denied information published in the new york "
+       "times").split()
+
+
+class TestLevenshtein(unittest.TestCase):
+
+    def test_distance(self):
+        self.assertEqual(levenshtein.levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein.levenshtein([], ["a", "b"]), 2)
+        self.assertEqual(levenshtein.levenshtein(["a", "b"], []), 2)
+        self.assertEqual(levenshtein.levenshtein(HYP, REF), 6)
+        self.assertEqual(levenshtein.levenshtein("a" * 200, "b" * 150), 200)
+
+    def test_lcs_length(self):
+        self.assertEqual(lcs_length("ABCBDAB", "BDCABA"), 4)
+        self.assertEqual(lcs_length("", "abc"), 0)
+
+    def test_edit_backpointers(self):
+        pointers = edit_backpointers("ab", "b", substitutions=False)
+        self.assertEqual(pointers.tolist(), [[DIAGONAL, LEFT],
+                                             [UP, UP],
+                                             [UP, DIAGONAL]])
+        pointers = edit_backpointers("a", "b")
+        self.assertEqual(pointers[1, 1], DIAGONAL)
+        pointers = edit_backpointers("a", "b", substitutions=False)
+        self.assertEqual(pointers[1, 1], UP)
+
+    def test_ter(self):
+        self.assertAlmostEqual(translation_edit_rate(HYP, REF), 4 / 13)
+        self.assertEqual(translation_edit_rate(REF, REF), 0.0)
+
+    def test_map_pairs(self):
+        original_min_batch = worker_pool.MIN_PARALLEL_BATCH
+        worker_pool.MIN_PARALLEL_BATCH = 1
+        try:
+            pairs = [(HYP[:i], REF[i:]) for i in range(len(HYP))]
+            self.assertEqual(
+                map_pairs(levenshtein.levenshtein, *zip(*pairs),
+                          num_workers=2),
+                [levenshtein.levenshtein(hyp, ref) for hyp, ref in pairs])
+        finally:
+            worker_pool.MIN_PARALLEL_BATCH = original_min_batch
+
+
+if __name__ == "__main__":
+    unittest.main()
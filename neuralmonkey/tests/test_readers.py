@@ -6,6 +6,7 @@ import tempfile
 import numpy as np
 
 from neuralmonkey.readers.string_vector_reader import get_string_vector_reader
+from neuralmonkey.readers.plain_text_reader import nbest_reader
 
 STRING_INTS = """
 1   2 3
@@ -35,6 +36,11 @@ STRING_INTS_FINE = """
 LIST_INTS_FINE = [np.array(row.strip().split(), dtype=np.int32)
                   for row in STRING_INTS_FINE.strip().split("\n")]
 
+STRING_NBEST = """0 ||| a b ||| -0.5
+0 ||| a c ||| lm: -3 tm: -1 ||| -1.25
+2 ||| d ||| -2
+"""
+
 
 def _make_file(from_var):
     tmpfile = tempfile.NamedTemporaryFile(mode="w+")
@@ -96,5 +102,22 @@ class TestStringVectorReader(unittest.TestCase):
         self.tmpfile_ints_fine.close()
 
 
+class TestNBestReader(unittest.TestCase):
+
+    def test_reader(self):
+        with _make_file(STRING_NBEST) as tmpfile:
+            nbest_lists = list(nbest_reader()([tmpfile.name]))
+
+        self.assertEqual(nbest_lists, [
+            [(["a", "b"], -0.5), (["a", "c"], -1.25)],
+            [],
+            [(["d"], -2.0)]])
+
+    def test_invalid_line(self):
+        with _make_file("0 ||| a b\n") as tmpfile:
+            with self.assertRaises(ValueError):
+                list(nbest_reader()([tmpfile.name]))
+
+
 if __name__ == "__main__":
     unittest.main()
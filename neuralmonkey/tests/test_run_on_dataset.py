@@ -0,0 +1,131 @@
+#!/usr/bin/env python3.5
+"""Unit tests for running the model on datasets"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from neuralmonkey.dataset import Dataset
+from neuralmonkey.evaluators.bleu import BLEUEvaluator
+from neuralmonkey.evaluators.edit_distance import EditDistanceEvaluator
+from neuralmonkey.evaluators.gleu import GLEUEvaluator
+from neuralmonkey.learning_utils import (evaluation, run_on_dataset,
+                                         timed_evaluation)
+from neuralmonkey.runners.base_runner import ExecutionResult
+
+REFERENCES = [["I", "like", "tulips", "."],
+              ["the", "cat", "sat", "on", "the", "mat"],
+              ["a", "b"],
+              ["a", "dog", "barked"],
+              ["x"]]
+HYPOTHESES = [["I", "hate", "flowers", "and", "stones", "."],
+              ["the", "cat", "sat", "on", "a", "mat"],
+              ["a", "b"],
+              ["the", "dog", "barked"],
+              ["y"]]
+
+
+class CopyRunner(object):
+    """Runner whose outputs are the 'hyp' series of the dataset."""
+
+    output_series = "out"
+    decoder_data_id = "ref"
+    loss_names = []  # type: list
+
+
+class FakeManager(object):
+    """TensorFlow manager executing the runners on the batches."""
+
+    # pylint: disable=unused-argument,no-self-use
+    def execute(self, dataset, runners, compute_losses=True, batch_size=None,
+                log_progress=0, batch_callback=None, keep_outputs=None):
+        outputs = []
+        for batch in dataset.batch_dataset(batch_size):
+            result = ExecutionResult(list(batch.get_series("hyp")), [],
+                                     None, None, None)
+            if batch_callback is not None:
+                batch_callback(batch, [result])
+            outputs.extend(result.outputs)
+        if keep_outputs is not None and not keep_outputs[0]:
+            outputs = []
+        return [ExecutionResult(outputs, [], None, None, None)]
+    # pylint: enable=unused-argument,no-self-use
+
+
+class TestRunOnDataset(unittest.TestCase):
+
+    def test_reference_stats_cached(self):
+        dataset = Dataset("val", {"hyp": HYPOTHESES, "ref": REFERENCES}, {})
+        bleu = BLEUEvaluator()
+        gleu = GLEUEvaluator()
+        evaluators = [("out", "ref", bleu), ("out", "ref", gleu)]
+        expected = {"out/BLEU-4": BLEUEvaluator()(HYPOTHESES, REFERENCES),
+                    "out/GLEU-4": GLEUEvaluator()(HYPOTHESES, REFERENCES)}
+
+        with mock.patch.object(
+                BLEUEvaluator, "reference_ngram_counts",
+                wraps=BLEUEvaluator.reference_ngram_counts) as counts:
+            for _ in range(2):
+                results, outputs, stats = run_on_dataset(
+                    FakeManager(), [CopyRunner()], dataset, None,
+                    batch_size=2, evaluators=evaluators)
+                scores = evaluation(evaluators, dataset, [CopyRunner()],
+                                    results, outputs, stats)
+                for name, score in expected.items():
+                    self.assertAlmostEqual(scores[name], score)
+
+                # the references are counted only in the first validation,
+                # once by each of the evaluators
+                self.assertEqual(counts.call_count, 2)
+
+    def test_update_durations(self):
+        dataset = Dataset("val", {"hyp": HYPOTHESES, "ref": REFERENCES}, {})
+        evaluators = [("out", "ref", BLEUEvaluator())]
+
+        update_durations = {}
+        results, outputs, stats = run_on_dataset(
+            FakeManager(), [CopyRunner()], dataset, None, batch_size=2,
+            evaluators=evaluators, evaluator_durations=update_durations)
+        _, durations = timed_evaluation(
+            evaluators, dataset, [CopyRunner()], results, outputs, stats,
+            evaluator_durations=update_durations)
+
+        self.assertGreater(update_durations["out/BLEU-4"], 0)
+        self.assertGreaterEqual(durations["out/BLEU-4"],
+                                update_durations["out/BLEU-4"])
+
+    def test_written_series(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "out.txt")
+            # a token with a space is not split when the series is kept
+            hypotheses = HYPOTHESES + [["a b"]]
+            dataset = Dataset("test", {"hyp": hypotheses,
+                                       "ref": REFERENCES + [["a b"]]},
+                              {"out": path})
+
+            # the streamed evaluators do not need the series in memory
+            evaluators = [("out", "ref", BLEUEvaluator())]
+            results, outputs, stats = run_on_dataset(
+                FakeManager(), [CopyRunner()], dataset, None,
+                write_out=True, batch_size=2, evaluators=evaluators)
+            self.assertNotIn("out", outputs)
+            scores = evaluation(evaluators, dataset, [CopyRunner()],
+                                results, outputs, stats)
+            self.assertIn("out/BLEU-4", scores)
+            with open(path, encoding="utf-8") as f_in:
+                self.assertEqual(len(f_in.readlines()), len(hypotheses))
+
+            evaluators.append(("out", "ref", EditDistanceEvaluator()))
+            _, outputs, _ = run_on_dataset(
+                FakeManager(), [CopyRunner()], dataset, None,
+                write_out=True, batch_size=2, evaluators=evaluators)
+            self.assertEqual(outputs["out"], hypotheses)
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
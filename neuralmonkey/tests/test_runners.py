@@ -0,0 +1,177 @@
+#!/usr/bin/env python3.5
+
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from neuralmonkey.runners.base_runner import (ExecutionResult,
+                                              ResultAggregator,
+                                              SummaryAggregator)
+from neuralmonkey.runners.beamsearch_runner import backtrack_beam
+from neuralmonkey.runners.logits_runner import sparse_top_k
+from neuralmonkey.runners.runner import (GreedyRunExecutable,
+                                         combine_logprobs,
+                                         stack_session_logprobs)
+from neuralmonkey.vocabulary import END_TOKEN_INDEX, Vocabulary
+
+
+def log_softmax(logits):
+    return logits - np.log(np.exp(logits).sum(axis=-1, keepdims=True))
+
+
+LOGPROBS = log_softmax(np.random.RandomState(0).randn(3, 4, 2, 5))
+
+
+class TestCombineLogprobs(unittest.TestCase):
+
+    def test_probability_average(self):
+        combined = combine_logprobs(LOGPROBS, "probability_average")
+        np.testing.assert_allclose(
+            combined, np.log(np.exp(LOGPROBS).mean(axis=0)))
+
+    def test_loglinear_average(self):
+        combined = combine_logprobs(LOGPROBS, "loglinear_average")
+        np.testing.assert_allclose(combined, LOGPROBS.mean(axis=0))
+
+    def test_weights(self):
+        for mode in ["probability_average", "loglinear_average"]:
+            combined = combine_logprobs(LOGPROBS, mode, [0., 1., 0.])
+            np.testing.assert_allclose(combined, LOGPROBS[1])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            combine_logprobs(LOGPROBS, "majority_vote")
+        with self.assertRaises(ValueError):
+            combine_logprobs(LOGPROBS, weights=[0.5, 0.5])
+
+    def test_unequal_lengths(self):
+        stacked = stack_session_logprobs([LOGPROBS[0], LOGPROBS[1, :2]])
+        self.assertEqual(stacked.shape, (2,) + LOGPROBS.shape[1:])
+        np.testing.assert_array_equal(stacked[1, :2], LOGPROBS[1, :2])
+        self.assertTrue(np.all(stacked[1, 2:, :, END_TOKEN_INDEX] == 0.))
+        self.assertEqual(np.exp(stacked[1, 2:]).sum(), 2 * 2)
+
+    def test_collect_unequal_lengths(self):
+        vocabulary = Vocabulary()
+        for word in ["a", "b"]:
+            vocabulary.add_word(word)
+        size = len(vocabulary)
+
+        # the first session decodes two steps, the second one three
+        first = np.full((2, 1, size), 0.1 / (size - 1))
+        first[0, 0, vocabulary.get_word_index("a")] = 0.9
+        first[1, 0, END_TOKEN_INDEX] = 0.9
+        second = np.full((3, 1, size), 0.4 / (size - 1))
+        second[0, 0, vocabulary.get_word_index("a")] = 0.6
+        second[1, 0, vocabulary.get_word_index("b")] = 0.6
+        second[2, 0] = 1. / size
+        first, second = np.log(first), np.log(second)
+
+        for mode in ["probability_average", "loglinear_average"]:
+            executable = GreedyRunExecutable(set(), {}, vocabulary, None,
+                                             mode)
+            executable.collect_results([
+                {"train_xent": 0., "runtime_xent": 0.,
+                 "decoded_logprobs": logprobs}
+                for logprobs in [first, second]])
+            self.assertEqual(executable.result.outputs, [["a"]])
+
+
+class TestNBest(unittest.TestCase):
+
+    def test_backtrack_beam(self):
+        # beam of two hypotheses over three steps
+        parent_ids = np.array([[0, 0], [0, 1], [1, 0]])
+        token_ids = np.array([[5, 6], [7, 8], [9, 3]])
+
+        tokens = backtrack_beam(parent_ids, token_ids, np.array([1, 0]))
+        self.assertEqual(tokens[:, 0].tolist(), [5, 7, 3])
+        self.assertEqual(tokens[:, 1].tolist(), [6, 8, 9])
+
+
+class TestSparseTopK(unittest.TestCase):
+
+    def test_sparse_top_k(self):
+        values = np.array([[[0.1, 0.5, 0.2, 0.7]], [[0.3, 0.0, 0.9, 0.6]]])
+        sparse = sparse_top_k(values, 2, "float16")
+
+        self.assertEqual(sparse.shape, (2, 1, 2))
+        self.assertEqual(sparse["value"].dtype, np.float16)
+        self.assertEqual(sparse["index"].tolist(), [[[3, 1]], [[2, 3]]])
+        self.assertTrue(np.allclose(sparse["value"],
+                                    [[[0.7, 0.5]], [[0.9, 0.6]]], atol=1e-3))
+
+    def test_k_larger_than_vocabulary(self):
+        sparse = sparse_top_k(np.array([[0.2, 0.8]]), 5)
+        self.assertEqual(sparse["index"].tolist(), [[1, 0]])
+
+
+def _result(outputs, losses, scalar_summaries=None):
+    return ExecutionResult(outputs, losses, scalar_summaries, None, None)
+
+
+class TestAggregation(unittest.TestCase):
+
+    def test_array_outputs(self):
+        aggregator = ResultAggregator(3)
+        aggregator.add(_result(np.ones((2, 4)), [4.]))
+        aggregator.add(_result([np.zeros(4)], [2.]))
+        result = aggregator.result()
+
+        self.assertEqual(result.outputs.shape, (3, 4))
+        self.assertEqual(result.outputs.sum(), 8)
+        self.assertEqual(result.losses, [2.])
+
+    def test_more_outputs_than_expected(self):
+        aggregator = ResultAggregator(1)
+        for _ in range(3):
+            aggregator.add(_result(np.ones((2, 4)), []))
+        self.assertEqual(aggregator.result().outputs.shape, (6, 4))
+
+    def test_different_shapes(self):
+        aggregator = ResultAggregator(3)
+        aggregator.add(_result(np.ones((2, 4)), []))
+        aggregator.add(_result(np.ones((1, 5)), []))
+        outputs = aggregator.result().outputs
+
+        self.assertIsInstance(outputs, list)
+        self.assertEqual([out.shape for out in outputs], [(4,), (4,), (5,)])
+
+    def test_dropped_outputs(self):
+        aggregator = ResultAggregator(3, keep_outputs=False)
+        aggregator.add(_result([["a"], ["b"]], [3.]))
+        aggregator.add(_result([["c"]], [3.]))
+        result = aggregator.result()
+
+        self.assertEqual(result.outputs, [])
+        self.assertEqual(result.losses, [2.])
+
+    def test_scalar_summaries(self):
+        aggregator = SummaryAggregator()
+        for value, weight in [(1., 1), (4., 2)]:
+            summary = tf.Summary(value=[
+                tf.Summary.Value(tag="loss", simple_value=value)])
+            aggregator.add(summary.SerializeToString(), weight)
+
+        merged = aggregator.summary()
+        self.assertAlmostEqual(merged.value[0].simple_value, 3.)
+
+    def test_histogram_summaries(self):
+        aggregator = SummaryAggregator()
+        for limits, counts in [([1., 2.], [3., 1.]), ([2., 5.], [2., 2.])]:
+            histogram = tf.HistogramProto(
+                min=0., max=limits[-1], num=sum(counts), sum=1.,
+                sum_squares=1., bucket_limit=limits, bucket=counts)
+            aggregator.add(tf.Summary(value=[
+                tf.Summary.Value(tag="weights", histo=histogram)]))
+
+        merged = aggregator.summary().value[0].histo
+        self.assertEqual(list(merged.bucket_limit), [1., 2., 5.])
+        self.assertEqual(list(merged.bucket), [3., 3., 2.])
+        self.assertEqual(merged.num, 8.)
+        self.assertEqual(merged.max, 5.)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the persistent scorer processes"""
+
+import sys
+import unittest
+
+from neuralmonkey.evaluators.scorer_process import ScoreCache, ScorerProcess
+
+# answers the number of tokens, exits after the second request
+SCORER = """
+import sys
+for i, line in enumerate(sys.stdin):
+    print(len(line.split()), flush=True)
+    if i == 1:
+        break
+"""
+
+SILENT = "import sys; sys.stdin.readline(); input()"
+
+
+class TestScorerProcess(unittest.TestCase):
+
+    def test_query_and_restart(self):
+        scorer = ScorerProcess([sys.executable, "-c", SCORER])
+        try:
+            answers = [scorer.query(" ".join("x" * i)) for i in range(5)]
+            self.assertEqual(answers, ["0", "1", "2", "3", "4"])
+        finally:
+            scorer.close()
+
+    def test_timeout(self):
+        scorer = ScorerProcess([sys.executable, "-c", SILENT], timeout=0.5,
+                               max_restarts=1)
+        with self.assertRaises(RuntimeError):
+            scorer.query("hello")
+        self.assertIsNone(scorer._process)  # pylint: disable=protected-access
+
+    def test_score_cache(self):
+        cache = ScoreCache(size=2)
+        cache.put(ScoreCache.key(b"a", b"bc"), 1.0)
+        cache.put(ScoreCache.key(b"b", b"c"), 2.0)
+        self.assertEqual(cache.get(ScoreCache.key(b"a", b"bc")), 1.0)
+        self.assertIsNone(cache.get(ScoreCache.key(b"ab", b"c")))
+        cache.put(ScoreCache.key(b"c", b""), 3.0)
+        self.assertIsNone(cache.get(ScoreCache.key(b"b", b"c")))
+
+
+if __name__ == "__main__":
+    unittest.main()
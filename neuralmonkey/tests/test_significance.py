@@ -0,0 +1,71 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the paired bootstrap test"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from neuralmonkey.evaluators.bleu import BLEUEvaluator
+from neuralmonkey.evaluators.significance import (bootstrap_scores,
+                                                  paired_bootstrap,
+                                                  sentence_stats)
+from neuralmonkey.evaluators.wer import WER
+from neuralmonkey.tests.test_bleu import DECODED, REFERENCE
+
+
+class TestSignificance(unittest.TestCase):
+
+    def test_sentence_stats(self):
+        bleu = BLEUEvaluator()
+        stats = sentence_stats(bleu, DECODED, REFERENCE)
+        self.assertEqual(stats.shape[0], len(DECODED))
+        self.assertAlmostEqual(bleu.finalize(stats.sum(axis=0)),
+                               bleu(DECODED, REFERENCE))
+
+    def test_sentence_stats_reference_counts(self):
+        # the references are counted once for all the sentences and systems
+        bleu = BLEUEvaluator()
+        with mock.patch.object(
+                BLEUEvaluator, "reference_ngram_counts",
+                wraps=BLEUEvaluator.reference_ngram_counts) as counts:
+            stats = [sentence_stats(bleu, system, REFERENCE)
+                     for system in [DECODED, REFERENCE]]
+        self.assertEqual(counts.call_count, 1)
+        self.assertTrue(np.array_equal(
+            stats[0], np.stack([BLEUEvaluator().update([hyp], [ref])
+                                for hyp, ref in zip(DECODED, REFERENCE)])))
+
+    def test_bootstrap_scores(self):
+        stats = sentence_stats(WER, DECODED, REFERENCE)
+        scores = bootstrap_scores(WER, [stats], num_samples=250, seed=1,
+                                  chunk_size=100)
+        self.assertEqual(scores.shape, (1, 250))
+
+        # resample by explicit indices with the same random numbers
+        random = np.random.RandomState(1)
+        for start in range(0, 250, 100):
+            size = min(100, 250 - start)
+            indices = random.randint(len(DECODED), size=(size, len(DECODED)))
+            for k, sample in enumerate(indices):
+                self.assertAlmostEqual(
+                    scores[0, start + k],
+                    WER([DECODED[i] for i in sample],
+                        [REFERENCE[i] for i in sample]))
+
+    def test_paired_bootstrap(self):
+        systems = [REFERENCE, DECODED, [[] for _ in DECODED]]
+        result = paired_bootstrap(
+            WER, [sentence_stats(WER, system, REFERENCE)
+                  for system in systems], num_samples=100, seed=0)
+
+        self.assertEqual(result.wins[0, 1], 1.0)
+        self.assertEqual(result.wins[0, 2], 1.0)
+        self.assertEqual(result.wins[2, 0], 0.0)
+        self.assertLessEqual(result.wins[1, 2] + result.wins[2, 1], 1.0)
+        self.assertEqual(result.wins[0, 0], 0.0)
+        self.assertAlmostEqual(result.scores[1], WER(DECODED, REFERENCE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the streaming evaluators"""
+
+import unittest
+
+from neuralmonkey.evaluators.accuracy import Accuracy, AccuracySeqLevel
+from neuralmonkey.evaluators.bleu import BLEUEvaluator
+from neuralmonkey.evaluators.chrf import ChrF3
+from neuralmonkey.evaluators.f1_bio import BIOF1Score
+from neuralmonkey.evaluators.gleu import GLEUEvaluator
+from neuralmonkey.evaluators.ter import TER
+from neuralmonkey.evaluators.wer import WER
+
+REFERENCES = [["I", "like", "tulips", "."],
+              ["the", "cat", "sat", "on", "the", "mat"],
+              ["a", "b"],
+              ["B", "I", "O", "B"]]
+HYPOTHESES = [["I", "hate", "flowers", "and", "stones", "."],
+              ["the", "cat", "sat", "on", "a", "mat"],
+              ["a", "b"],
+              ["B", "O", "O", "B"]]
+
+EVALUATORS = [Accuracy, AccuracySeqLevel, BLEUEvaluator(), ChrF3,
+              BIOF1Score, GLEUEvaluator(), TER, WER]
+
+
+class TestStreamingEvaluators(unittest.TestCase):
+
+    def test_batched_update(self):
+        for evaluator in EVALUATORS:
+            stats = evaluator.init_stats()
+            for i in range(0, len(REFERENCES), 2):
+                stats = evaluator.merge(
+                    stats, evaluator.update(HYPOTHESES[i:i + 2],
+                                            REFERENCES[i:i + 2]))
+
+            self.assertAlmostEqual(
+                evaluator.finalize(stats),
+                evaluator(HYPOTHESES, REFERENCES),
+                msg="Evaluator {}".format(evaluator.name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3.5
+"""Unit tests for the output writers"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from neuralmonkey.writers.jsonl_writer import JsonLinesWriter
+from neuralmonkey.writers.numpy_writer import (AdaptiveNumpyWriter,
+                                               NumpyShardWriter, NumpyWriter)
+from neuralmonkey.writers.plain_text_writer import (NBestWriter,
+                                                    PlainTextWriter,
+                                                    nbest_lines)
+
+
+class TestWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_plain_text(self):
+        writer = PlainTextWriter(self._path("out.txt"), 3)
+        writer.write([["a", "b"], []])
+        writer.write([["c"]])
+        writer.close()
+
+        with open(writer.path, encoding="utf-8") as f_in:
+            self.assertEqual(f_in.read(), "a b\n\nc\n")
+
+    def test_nbest_lines(self):
+        lines = list(nbest_lines([[(["a", "b"], -0.5), (["c"], -1.25)],
+                                  [(["d"], -2.0)]]))
+        self.assertEqual(lines, ["0 ||| a b ||| -0.5\n",
+                                 "0 ||| c ||| -1.25\n",
+                                 "1 ||| d ||| -2.0\n"])
+
+    def test_nbest(self):
+        writer = NBestWriter(self._path("out.nbest"), 4)
+        writer.write([[(["a"], -0.5)], [(["b", "c"], -1.0, [-0.5, -0.5])]])
+        writer.write([[(["d"], -2.0)], []])
+        writer.close()
+
+        with open(writer.path, encoding="utf-8") as f_in:
+            self.assertEqual(f_in.read(), "0 ||| a ||| -0.5\n"
+                                          "1 ||| b c ||| -1.0\n"
+                                          "2 ||| d ||| -2.0\n")
+
+    def test_numpy(self):
+        writer = NumpyWriter(self._path("out"), 5)
+        self.assertTrue(writer.path.endswith(".npy"))
+
+        batches = [np.random.rand(2, 3).astype(np.float32),
+                   list(np.random.rand(3, 3).astype(np.float32))]
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+
+        array = np.load(writer.path)
+        self.assertEqual(array.dtype, np.float32)
+        self.assertTrue(np.array_equal(
+            array, np.concatenate([batches[0], np.stack(batches[1])])))
+
+    def test_numpy_shape_mismatch(self):
+        writer = NumpyWriter(self._path("out.npy"), 4)
+        writer.write(np.zeros((2, 3)))
+        with self.assertRaises(ValueError):
+            writer.write(np.zeros((2, 4)))
+        with self.assertRaises(ValueError):
+            writer.write(np.zeros((3, 3)))
+        writer.close()
+
+    def test_numpy_shards(self):
+        writer = NumpyShardWriter(self._path("out.npy"), 3)
+        writer.write(np.ones((2, 4), dtype=np.float16))
+        writer.write(np.zeros((1, 2), dtype=np.float16))
+        writer.close()
+
+        self.assertEqual(
+            [os.path.basename(path) for path in writer.shard_paths],
+            ["out.0000000000.npy", "out.0000000002.npy"])
+        items = [item for path in writer.shard_paths
+                 for item in np.load(path)]
+        self.assertEqual([item.shape for item in items], [(4,), (4,), (2,)])
+        self.assertEqual(items[2].dtype, np.float16)
+
+    def test_adaptive_numpy(self):
+        writer = AdaptiveNumpyWriter(self._path("out"), 3)
+        batches = [np.random.rand(2, 3), np.random.rand(1, 3)]
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+
+        self.assertEqual(writer.shard_paths, [])
+        self.assertTrue(np.array_equal(np.load(writer.path),
+                                       np.concatenate(batches)))
+
+    def test_adaptive_numpy_shape_mismatch(self):
+        # e.g. logits of a decoder, whose length differs between batches
+        writer = AdaptiveNumpyWriter(self._path("out.npy"), 5)
+        batches = [np.random.rand(2, 3, 4), np.random.rand(1, 3, 4),
+                   np.random.rand(2, 5, 4)]
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+
+        self.assertFalse(os.path.exists(writer.path))
+        self.assertEqual(
+            [os.path.basename(path) for path in writer.shard_paths],
+            ["out.0000000000.npy", "out.0000000003.npy"])
+        self.assertTrue(np.array_equal(np.load(writer.shard_paths[0]),
+                                       np.concatenate(batches[:2])))
+        self.assertTrue(np.array_equal(np.load(writer.shard_paths[1]),
+                                       batches[2]))
+
+    def test_jsonl(self):
+        writer = JsonLinesWriter(self._path("out.jsonl"), 3)
+        writer.write([{"a": 1}, np.arange(3)])
+        writer.write([(["x"], np.float32(0.5))])
+        writer.close()
+
+        with open(writer.path, encoding="utf-8") as f_in:
+            self.assertEqual([json.loads(line) for line in f_in],
+                             [{"a": 1}, [0, 1, 2], [["x"], 0.5]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,9 +8,11 @@ variables.
 
 """
 # pylint: disable=unused-import
-from typing import Any, List, Union, Optional
+from typing import Any, Callable, Dict, Iterable, List, Union, Optional
 # pylint: enable=unused-import
 
+from concurrent.futures import Future, ThreadPoolExecutor
+import copy
 import os
 import time
 
@@ -21,10 +23,9 @@ from tensorflow.python import debug as tf_debug
 # pylint: enable=no-name-in-module
 from typeguard import check_argument_types
 
-from neuralmonkey.logging import log
+from neuralmonkey.logging import log, debug
 from neuralmonkey.dataset import Dataset
-from neuralmonkey.runners.base_runner import (ExecutionResult,
-                                              reduce_execution_results)
+from neuralmonkey.runners.base_runner import ExecutionResult, ResultAggregator
 
 
 class TensorFlowManager(object):
@@ -44,16 +45,21 @@ class TensorFlowManager(object):
                  gpu_allow_growth: bool = True,
                  per_process_gpu_memory_fraction: float = 1.0,
                  report_gpu_memory_consumption: bool = False,
-                 enable_tf_debug: bool = False) -> None:
+                 enable_tf_debug: bool = False,
+                 async_saving: bool = False) -> None:
         """Initialize a TensorflowManager.
 
         At this moment the graph must already exist. This method initializes
         required number of TensorFlow sessions and initializes them with
         provided variable files if they are provided.
 
+        Multiple sessions (i.e. ensembles) are run in parallel on a thread
+        pool and the threads are divided among them.
+
         Args:
             num_sessions: Number of sessions to be initialized.
-            num_threads: Number of threads sessions will run in.
+            num_threads: Number of threads sessions will run in. Each of the
+                sessions gets an equal share of the threads.
             save_n_best: How many best models to keep
             minimize_metric: Whether the best model is the one with the lowest
                 or the highest score
@@ -62,12 +68,18 @@ class TensorFlowManager(object):
             per_process_gpu_memory_fraction: Limit TF memory use.
             report_gpu_memory_consumption: Report overall GPU memory at every
                 logging
+            enable_tf_debug: Run the sessions in the TensorFlow debugger.
+            async_saving: Write the variables after validation in the
+                background. The variables are copied to the host memory and
+                the training continues while they are written.
         """
         check_argument_types()
 
+        session_threads = max(1, num_threads // max(1, num_sessions))
+
         session_cfg = tf.ConfigProto()
-        session_cfg.inter_op_parallelism_threads = num_threads
-        session_cfg.intra_op_parallelism_threads = num_threads
+        session_cfg.inter_op_parallelism_threads = session_threads
+        session_cfg.intra_op_parallelism_threads = session_threads
         session_cfg.allow_soft_placement = True  # needed for multiple GPUs
         # pylint: disable=no-member
         session_cfg.gpu_options.allow_growth = gpu_allow_growth
@@ -80,6 +92,7 @@ class TensorFlowManager(object):
         self.saver_max_to_keep = save_n_best
         self.minimize_metric = minimize_metric
 
+        self._session_cfg = session_cfg
         self.sessions = [tf.Session(config=session_cfg)
                          for _ in range(num_sessions)]
 
@@ -87,7 +100,15 @@ class TensorFlowManager(object):
             self.sessions = [tf_debug.LocalCLIDebugWrapperSession(sess)
                              for sess in self.sessions]
 
-        init_op = tf.global_variables_initializer()
+        # TF releases the GIL while running the graph, so the sessions can
+        # run in threads; the interactive debugger needs to run sequentially
+        self._session_pool = None  # type: Optional[ThreadPoolExecutor]
+        if num_sessions > 1 and not enable_tf_debug:
+            self._session_pool = ThreadPoolExecutor(num_sessions)
+
+        # the local variables (e.g. gradient accumulators) are not saved
+        init_op = tf.group(tf.global_variables_initializer(),
+                           tf.local_variables_initializer())
         for sess in self.sessions:
             sess.run(init_op)
         self.saver = tf.train.Saver(max_to_keep=self.saver_max_to_keep)
@@ -110,6 +131,14 @@ class TensorFlowManager(object):
         self.variables_files = []  # type: List[str]
         self.best_vars_file = None  # type: str
 
+        # at most one checkpoint is written at a time in the background,
+        # from the sessions in the host memory
+        self._save_pool = None  # type: Optional[ThreadPoolExecutor]
+        self._pending_save = None  # type: Optional[Future]
+        self._save_sessions = []  # type: List[tf.Session]
+        if async_saving:
+            self._save_pool = ThreadPoolExecutor(1)
+
     # pylint: enable=too-many-arguments
 
     def _is_better(self, score1: float, score2: float) -> bool:
@@ -127,8 +156,11 @@ class TensorFlowManager(object):
     def _update_best_vars(self, var_index: int) -> None:
         best_vars_prefix = os.path.basename(self.variables_files[var_index])
 
-        with open(self.best_vars_file, "w") as var_file:
+        # the file is replaced at once, so it never points to nothing
+        tmp_file = "{}.tmp".format(self.best_vars_file)
+        with open(tmp_file, "w") as var_file:
             var_file.write(best_vars_prefix)
+        os.replace(tmp_file, self.best_vars_file)
 
     def init_saving(self, vars_prefix: str) -> None:
         if self.saver_max_to_keep == 1:
@@ -140,8 +172,22 @@ class TensorFlowManager(object):
         self.best_vars_file = "{}.best".format(vars_prefix)
         self._update_best_vars(var_index=0)
 
-    def validation_hook(self, score: float, epoch: int, batch: int) -> None:
-        if self._is_better(score, self.best_score):
+    def validation_hook(self, score: float, epoch: int, batch: int,
+                        sessions: Optional[List[tf.Session]] = None,
+                        model_parts: Optional[Iterable[Any]] = None) -> None:
+        """Update the best scores and save the variables if they are good.
+
+        Args:
+            score: The validation score.
+            epoch: The epoch of the validation.
+            batch: The batch number of the validation.
+            sessions: Sessions holding the validated variables, the sessions
+                of this manager by default.
+            model_parts: Model parts whose checkpoints are saved when the
+                score is the best one.
+        """
+        is_best = self._is_better(score, self.best_score)
+        if is_best:
             self.best_score = score
             self.best_score_epoch = epoch
             self.best_score_batch = batch
@@ -149,20 +195,69 @@ class TensorFlowManager(object):
         worst_index = self._argworst(self.saved_scores)
         worst_score = self.saved_scores[worst_index]
 
-        if self._is_better(score, worst_score):
-            # we need to save this score instead the worst score
-            worst_var_file = self.variables_files[worst_index]
-            self.save(worst_var_file)
-            self.saved_scores[worst_index] = score
+        if not self._is_better(score, worst_score):
+            return
+
+        # we need to save this score instead the worst score
+        worst_var_file = self.variables_files[worst_index]
+        self.saved_scores[worst_index] = score
+        if is_best:
+            self.best_score_index = worst_index
+        log("Best scores saved so far: {}".format(self.saved_scores))
+
+        def save(save_sessions: List[tf.Session]) -> None:
+            self.save(worst_var_file, save_sessions)
             log("Variable file saved in {}".format(worst_var_file))
 
-            # update symlink and best score index
-            if self.best_score == score:
+            if is_best:
+                # update symlink and the model parts
                 self._update_best_vars(worst_index)
-                self.best_score_index = worst_index
+                for part in model_parts or []:
+                    for session in save_sessions:
+                        part.save(session)
+
+        if sessions is None:
+            sessions = self.sessions
 
-            log("Best scores saved so far: {}".format(
-                self.saved_scores))
+        if self._save_pool is None:
+            save(sessions)
+        else:
+            self._save_in_background(sessions, save)
+
+    def _save_in_background(self, sessions: List[tf.Session],
+                            save: Callable[[List[tf.Session]], None]) -> None:
+        """Snapshot the variables and run the saving in a thread.
+
+        The values of the variables are fetched to the host memory and
+        assigned in separate sessions which run on the CPU. Before that, the
+        previous saving is finished, so the snapshot is not overwritten while
+        it is being written.
+        """
+        self.wait_for_saving()
+
+        if not self._save_sessions:
+            save_cfg = tf.ConfigProto(device_count={"GPU": 0},
+                                      allow_soft_placement=True)
+            self._save_sessions = [tf.Session(config=save_cfg)
+                                   for _ in self.sessions]
+
+        variables = tf.global_variables()
+        snapshot = [sess.run(variables) for sess in sessions]
+
+        def assign_and_save() -> None:
+            for save_session, values in zip(self._save_sessions, snapshot):
+                _assign_variables(save_session, variables, values)
+            save(self._save_sessions)
+
+        self._pending_save = self._save_pool.submit(assign_and_save)
+
+    def wait_for_saving(self) -> None:
+        """Wait until the variables saved in the background are written."""
+        if self._pending_save is not None:
+            pending_save = self._pending_save
+            self._pending_save = None
+            # re-raises the errors of the saving
+            pending_save.result()
 
     # pylint: disable=too-many-locals
     def execute(self,
@@ -172,14 +267,43 @@ class TensorFlowManager(object):
                 compute_losses=True,
                 summaries=True,
                 batch_size=None,
-                log_progress: int = 0) -> List[ExecutionResult]:
+                log_progress: int = 0,
+                batch_callback: Optional[Callable[
+                    [Dataset, List[ExecutionResult]], None]] = None,
+                keep_outputs: Optional[List[bool]] = None
+               ) -> List[ExecutionResult]:
+        """Run the execution scripts on a dataset batch by batch.
+
+        Args:
+            dataset: The dataset to execute the scripts on.
+            execution_scripts: Runners or trainers providing the executables.
+            train: Flag whether the dataset is fed in the training mode.
+            compute_losses: Flag whether the executables compute losses.
+            summaries: Flag whether the executables compute summaries.
+            batch_size: Size of the batches, the whole dataset by default.
+            log_progress: Log progress every X seconds.
+            batch_callback: Function called after each batch with the batch
+                dataset and the results of the scripts on the batch.
+            keep_outputs: Flags whether the outputs of each script are kept
+                in the returned results, all of them by default. Outputs
+                which are not kept (e.g. because the batch callback writes
+                them to a file) are available only to the batch callback.
+
+        Returns:
+            The results of the scripts reduced over all batches.
+        """
+        num_items = len(dataset)
         if batch_size is None:
-            batch_size = len(dataset)
+            batch_size = num_items
         batched_dataset = dataset.batch_dataset(batch_size)
         last_log_time = time.process_time()
 
-        batch_results = [
-            [] for _ in execution_scripts]  # type: List[List[ExecutionResult]]
+        if keep_outputs is None:
+            keep_outputs = [True for _ in execution_scripts]
+
+        aggregators = [ResultAggregator(num_items, keep)
+                       for keep in keep_outputs]
+        session_times = [0.] * len(self.sessions)
         for batch_id, batch in enumerate(batched_dataset):
             if (time.process_time() - last_log_time > log_progress
                     and log_progress > 0):
@@ -211,42 +335,104 @@ class TensorFlowManager(object):
                 for fdict in additional_feed_dicts:
                     feed_dict.update(fdict)
 
-                session_results = [sess.run(all_tensors_to_execute,
-                                            feed_dict=feed_dict)
-                                   for sess in self.sessions]
+                session_results = self._run_sessions(
+                    all_tensors_to_execute, feed_dict, session_times)
 
                 for executable in executables:
                     if executable.result is None:
                         executable.collect_results(
                             [res[executable] for res in session_results])
 
-            for script_list, executable in zip(batch_results, executables):
-                script_list.append(executable.result)
+            for aggregator, executable in zip(aggregators, executables):
+                aggregator.add(executable.result)
+
+            if batch_callback is not None:
+                batch_callback(batch, [ex.result for ex in executables])
+
+        debug("Session run times: {}".format(
+            ", ".join("{:.2f}s".format(t) for t in session_times)),
+              "sessionTiming")
 
-        collected_results = []  # type: List[ExecutionResult]
-        for result_list in batch_results:
-            collected_results.append(reduce_execution_results(result_list))
+        return [aggregator.result() for aggregator in aggregators]
 
-        return collected_results
+    def _run_sessions(self, fetches: Any, feed_dict: Dict[Any, Any],
+                      session_times: List[float]) -> List[Any]:
+        """Run the fetches in all sessions, in parallel if possible.
 
-    def save(self, variable_files: Union[str, List[str]]) -> None:
-        if isinstance(variable_files, str) and len(self.sessions) == 1:
-            self.saver.save(self.sessions[0], variable_files)
+        Args:
+            fetches: The fetches passed to `tf.Session.run`.
+            feed_dict: The feed dictionary shared by all sessions.
+            session_times: Accumulated run times of the sessions, updated in
+                place.
+
+        Returns:
+            List of the results of the sessions.
+        """
+        def run_session(index: int) -> Any:
+            start = time.perf_counter()
+            result = self.sessions[index].run(fetches, feed_dict=feed_dict)
+            session_times[index] += time.perf_counter() - start
+            return result
+
+        if self._session_pool is None:
+            return [run_session(i) for i in range(len(self.sessions))]
+
+        return list(self._session_pool.map(run_session,
+                                           range(len(self.sessions))))
+
+    def save(self, variable_files: Union[str, List[str]],
+             sessions: Optional[List[tf.Session]] = None) -> None:
+        if sessions is None:
+            sessions = self.sessions
+
+        if isinstance(variable_files, str) and len(sessions) == 1:
+            self.saver.save(sessions[0], variable_files)
             return
 
         if isinstance(variable_files, str):
             variable_files = ["{}.{}".format(
-                variable_files, i) for i in range(len(self.sessions))]
+                variable_files, i) for i in range(len(sessions))]
 
-        if len(variable_files) != len(self.sessions):
+        if len(variable_files) != len(sessions):
             raise Exception(
                 "Provided {} files for restoring {} sessions.".format(
-                    len(variable_files), len(self.sessions)))
+                    len(variable_files), len(sessions)))
 
-        for sess, file_name in zip(self.sessions, variable_files):
+        for sess, file_name in zip(sessions, variable_files):
             self.saver.save(sess, file_name)
 
+    def fork(self) -> "TensorFlowManager":
+        """Create a manager running the same graph in new sessions.
+
+        The forked manager can execute the model concurrently with this one,
+        e.g. validate a snapshot of the variables while the training
+        continues. Its variables are filled by `copy_variables`. It shares
+        the saver with this manager, but the best scores are tracked only
+        by this one.
+        """
+        forked = copy.copy(self)
+        forked.sessions = [tf.Session(config=self._session_cfg)
+                           for _ in self.sessions]
+        # pylint: disable=protected-access
+        if self._session_pool is not None:
+            forked._session_pool = ThreadPoolExecutor(len(self.sessions))
+        # pylint: enable=protected-access
+        return forked
+
+    def copy_variables(self, target: "TensorFlowManager") -> None:
+        """Copy the values of all variables to the sessions of a fork.
+
+        The values are assigned by `_assign_variables`, so no operations are
+        added to the graph.
+        """
+        variables = tf.global_variables()
+
+        for source, target_session in zip(self.sessions, target.sessions):
+            _assign_variables(target_session, variables,
+                              source.run(variables))
+
     def restore(self, variable_files: Union[str, List[str]]) -> None:
+        self.wait_for_saving()
         if isinstance(variable_files, str):
             variable_files = [variable_files]
         if len(variable_files) != len(self.sessions):
@@ -274,6 +460,18 @@ class TensorFlowManager(object):
             self.save(self.variables_files[0])
 
 
+def _assign_variables(session: tf.Session, variables: List[tf.Variable],
+                      values: List[np.ndarray]) -> None:
+    """Assign values to variables in a session.
+
+    The initializers of the variables are run with the values fed instead of
+    the initial ones, so no operations are added to the graph.
+    """
+    session.run([var.initializer for var in variables],
+                feed_dict={var.initial_value: value
+                           for var, value in zip(variables, values)})
+
+
 def _feed_dicts(dataset, coders, train=False):
     """
     This function ensures all encoder and decoder objects feed their the data
@@ -46,6 +46,8 @@ def create_config() -> Configuration:
     config.add_argument('train_start_offset', required=False, default=0)
     config.add_argument('runners_batch_size', required=False, default=None)
     config.add_argument('postprocess')
+    config.add_argument('evaluation_workers', required=False, default=1)
+    config.add_argument('async_validation', required=False, default=False)
     config.add_argument('name')
     config.add_argument('random_seed', required=False)
     config.add_argument('initial_variables', required=False, default=None)
@@ -225,4 +227,6 @@ def main() -> None:
         postprocess=cfg.model.postprocess,
         train_start_offset=cfg.model.train_start_offset,
         runners_batch_size=cfg.model.runners_batch_size,
-        initial_variables=cfg.model.initial_variables)
+        initial_variables=cfg.model.initial_variables,
+        evaluation_workers=cfg.model.evaluation_workers,
+        async_validation=cfg.model.async_validation)
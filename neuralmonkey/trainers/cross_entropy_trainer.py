@@ -24,7 +24,8 @@ class CrossEntropyTrainer(GenericTrainer):
     def __init__(self, decoders: List[Any],
                  decoder_weights: Optional[List[ObjectiveWeight]] = None,
                  l1_weight=0., l2_weight=0.,
-                 clip_norm=False, optimizer=None, global_step=None) -> None:
+                 clip_norm=False, optimizer=None, global_step=None,
+                 accumulation_steps: int = 1) -> None:
         check_argument_types()
 
         if decoder_weights is None:
@@ -39,4 +40,5 @@ class CrossEntropyTrainer(GenericTrainer):
                       for dec, w in zip(decoders, decoder_weights)]
         super(CrossEntropyTrainer, self).__init__(
             objectives, l1_weight, l2_weight, clip_norm=clip_norm,
-            optimizer=optimizer, global_step=global_step)
+            optimizer=optimizer, global_step=global_step,
+            accumulation_steps=accumulation_steps)
@@ -26,7 +26,27 @@ class GenericTrainer(object):
     def __init__(self, objectives: List[Objective],
                  l1_weight: float = 0.0, l2_weight: float = 0.0,
                  clip_norm: Optional[float] = None, optimizer=None,
-                 global_step=None) -> None:
+                 global_step=None, accumulation_steps: int = 1) -> None:
+        """Create the training operations.
+
+        Arguments:
+            objectives: The objectives to optimize.
+            l1_weight: Weight of the L1 regularization.
+            l2_weight: Weight of the L2 regularization.
+            clip_norm: Maximum norm of the gradient of each variable.
+            optimizer: The TensorFlow optimizer, Adam by default.
+            global_step: Variable counting the updates of the model.
+            accumulation_steps: Number of batches whose gradients are summed
+                before the model is updated with their average. The
+                accumulation is run by the `accumulation` script on all the
+                batches but the last one, which runs the `train_op`.
+        """
+        if accumulation_steps < 1:
+            raise ValueError("accumulation_steps must be a positive number")
+        self.accumulation_steps = accumulation_steps
+        self.accumulate_op = None  # type: Optional[tf.Operation]
+        self.accumulation = None  # type: Optional[GradientAccumulation]
+        self._accumulators = []  # type: List[tf.Variable]
 
         with tf.name_scope("trainer"):
             self.optimizer = optimizer or tf.train.AdamOptimizer(1e-4)
@@ -71,6 +91,10 @@ class GenericTrainer(object):
                 else:
                     gradients = implicit_gradients
 
+            if accumulation_steps > 1:
+                with tf.name_scope("gradient_accumulation"):
+                    gradients = self._accumulate_gradients(gradients)
+
             if clip_norm:
                 assert clip_norm > 0.0
                 gradients = [(tf.clip_by_norm(grad, clip_norm), var)
@@ -88,6 +112,12 @@ class GenericTrainer(object):
             self.train_op = self.optimizer.apply_gradients(
                 gradients, global_step=self.global_step)
 
+            if accumulation_steps > 1:
+                with tf.control_dependencies([self.train_op]):
+                    self.train_op = tf.group(
+                        *[acc.assign(tf.zeros_like(acc))
+                          for acc in self._accumulators])
+
             for grad, var in gradients:
                 if grad is not None:
                     tf.summary.histogram(
@@ -103,6 +133,32 @@ class GenericTrainer(object):
         gradient_list = self.optimizer.compute_gradients(tensor)
         return gradient_list
 
+    def _accumulate_gradients(self, gradients: Gradients) -> Gradients:
+        """Add the gradients to accumulator variables.
+
+        Creates the `accumulate_op`. The returned gradients are the averages
+        of the accumulated ones including the current batch, the training
+        operation then resets the accumulators. The accumulators are local
+        variables, so they are not saved in (nor restored from) the
+        checkpoints.
+        """
+        gradients = [(grad, var) for grad, var in gradients
+                     if grad is not None]
+        self._accumulators = [
+            tf.Variable(tf.zeros(var.get_shape(), dtype=var.dtype.base_dtype),
+                        trainable=False, name="accumulator",
+                        collections=[tf.GraphKeys.LOCAL_VARIABLES])
+            for _, var in gradients]
+
+        # the updated values are used, so they are read after the addition
+        accumulated = [_accumulate(acc, grad) for acc, (grad, _)
+                       in zip(self._accumulators, gradients)]
+        self.accumulate_op = tf.group(*accumulated)
+        self.accumulation = GradientAccumulation(self)
+
+        return [(total / self.accumulation_steps, var)
+                for total, (_, var) in zip(accumulated, gradients)]
+
     def get_executable(
             self, compute_losses=True, summaries=True) -> Executable:
         assert compute_losses
@@ -114,6 +170,31 @@ class GenericTrainer(object):
                                self.histogram_summaries if summaries else None)
 
 
+class GradientAccumulation(object):
+    """Execution script adding the gradients to the trainer's accumulators.
+
+    The model is not updated, the losses of the batch are computed.
+    """
+
+    def __init__(self, trainer: GenericTrainer) -> None:
+        self.trainer = trainer
+
+    def get_executable(
+            self, compute_losses=True, summaries=True) -> Executable:
+        assert compute_losses
+
+        return TrainExecutable(self.trainer.all_coders,
+                               self.trainer.accumulate_op,
+                               self.trainer.losses, None, None)
+
+
+def _accumulate(accumulator: tf.Variable, gradient: Any) -> tf.Tensor:
+    if isinstance(gradient, tf.IndexedSlices):
+        # e.g. the gradients of the embeddings
+        return tf.scatter_add(accumulator, gradient.indices, gradient.values)
+    return tf.assign_add(accumulator, gradient)
+
+
 def _sum_gradients(gradients_list: List[Gradients]) -> Gradients:
     summed_dict = {}  # type: Dict[tf.Variable, tf.Tensor]
     for gradients in gradients_list:
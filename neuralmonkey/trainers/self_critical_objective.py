@@ -6,9 +6,7 @@ reward of the train-time decoder output as a baseline in the update step.
 For more details see: https://arxiv.org/pdf/1612.00563.pdf
 """
 
-from typing import Callable, Iterable, Tuple
-from itertools import takewhile
-from collections import Counter
+from typing import Callable, Tuple
 
 import numpy as np
 import tensorflow as tf
@@ -117,37 +115,29 @@ def sentence_bleu(references: np.ndarray,
     whatever the decoder uses as a unit is used a token in the BLEU
     computation, ignoring the tokens may be sub-word units.
     """
+    matched_counts, hyp_n_grams_counts, _ = _count_matching_n_grams(
+        references, hypotheses, 4)
+    unigram_counts = hyp_n_grams_counts[0]
 
-    bleu_scores = []
-    for ref, hyp in zip(np.transpose(references),
-                        np.transpose(hypotheses)):
-        matched_counts = []
-        hyp_n_grams_counts = []
+    # add-one smoothing of higher order n-grams
+    matched_counts[1:] += 1
+    hyp_n_grams_counts[1:] += 1
 
-        for n in range(1, 5):
-            matched, total, _ = _count_matching_n_grams(ref, hyp, n)
+    ref_lens = _lengths_before_end(np.transpose(references))
 
-            if n > 1:
-                matched += 1
-                total += 1
+    # the invalid values are computed only for sentences with empty
+    # hypotheses that get zero score anyway
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = (np.prod(matched_counts, axis=0)
+                     / np.prod(hyp_n_grams_counts, axis=0)) ** .25
+        brevity_penalty = np.minimum(
+            1., np.exp(1 - ref_lens / unigram_counts))
 
-            matched_counts.append(matched)
-            hyp_n_grams_counts.append(total)
+    bleu_scores = np.where(
+        unigram_counts == 0, 0., brevity_penalty * precision)
 
-        if hyp_n_grams_counts[0] == 0:
-            bleu_scores.append(0.)
-        else:
-            precision = (
-                np.prod(matched_counts) / np.prod(hyp_n_grams_counts)) ** .25
-            ref_len = sum(1 for _ in
-                          takewhile(lambda i: i != END_TOKEN_INDEX, ref))
-            brevity_penalty = np.min([
-                1., np.exp(1 - ref_len / hyp_n_grams_counts[0])])
-
-            bleu_scores.append(brevity_penalty * precision)
-
-    assert all(0 <= s <= 1 for s in bleu_scores)
-    return np.array(bleu_scores, dtype=np.float32)
+    assert np.all((bleu_scores >= 0) & (bleu_scores <= 1))
+    return bleu_scores.astype(np.float32)
 
 
 def sentence_gleu(references: np.ndarray,
@@ -161,59 +151,126 @@ def sentence_gleu(references: np.ndarray,
     It operates over the indices emitted by the decoder which are not
     necessarily tokens (could be characters or subword units).
     """
-    gleu_scores = []
-
-    for ref, hyp in zip(np.transpose(references),
-                        np.transpose(hypotheses)):
-
-        matched_counts = []
-        hyp_n_grams_counts = []
-        ref_n_grams_counts = []
+    matched_counts, hyp_n_grams_counts, ref_n_grams_counts = \
+        _count_matching_n_grams(references, hypotheses, 4)
 
-        for n in range(1, 5):
-            matched, total_hyp, total_ref = _count_matching_n_grams(
-                ref, hyp, n)
-            matched_counts.append(matched)
-            hyp_n_grams_counts.append(total_hyp)
-            ref_n_grams_counts.append(total_ref)
+    matched_sum = np.sum(matched_counts, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = matched_sum / np.sum(hyp_n_grams_counts, axis=0)
+        recall = matched_sum / np.sum(ref_n_grams_counts, axis=0)
 
-        precision = np.sum(matched_counts) / np.sum(hyp_n_grams_counts)
-        recall = np.sum(matched_counts) / np.sum(ref_n_grams_counts)
+    assert np.all((precision >= 0.) & (precision <= 1.0))
+    assert np.all((recall >= 0.) & (recall <= 1.0))
 
-        assert 0. <= precision <= 1.0
-        assert 0. <= recall <= 1.0
+    return np.minimum(precision, recall).astype(np.float32)
 
-        gleu_scores.append(min(precision, recall))
 
-    return np.array(gleu_scores, dtype=np.float32)
+def _count_matching_n_grams(
+        references: np.ndarray,
+        hypotheses: np.ndarray,
+        max_order: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Count clipped n-gram matches for a batch of sentences.
 
+    The n-grams are interned as int64 codes: an n-gram is a pair of the code
+    of its (n-1)-gram prefix and its last token, so the codes stay small for
+    any vocabulary size. Matches are then counted for all sentences at once
+    on keys combining the n-gram code and the sentence index.
 
-def _count_matching_n_grams(ref: np.ndarray,
-                            hyp: np.ndarray,
-                            n: int) -> Tuple[int, int, int]:
-    ref_counts = Counter()  # type: Counter[str]
-    total_ref_n_grams = 0
-    for n_gram in _get_n_grams(ref, n):
-        ref_counts[str(n_gram)] += 1
-        total_ref_n_grams += 1
+    Args:
+        references: Reference indices, shape (time, batch).
+        hypotheses: Hypothesis indices, shape (time, batch).
+        max_order: Maximum n-gram order.
 
-    matched_n_grams = 0
-    total_hyp_n_grams = 0
-    hyp_n_grams = _get_n_grams(hyp, n)
-    for n_gram in hyp_n_grams:
-        n_gram_s = str(n_gram)
-        if ref_counts[n_gram_s] > 0:
-            matched_n_grams += 1
-            ref_counts[n_gram_s] -= 1
-        total_hyp_n_grams += 1
+    Returns:
+        Tuple of matched, hypothesis and reference n-gram counts, each of
+        shape (max_order, batch).
+    """
+    refs = np.transpose(references)
+    hyps = np.transpose(hypotheses)
+    batch_size = refs.shape[0]
+
+    # intern the tokens so that codes of pairs fit into int64
+    vocabulary, tokens = np.unique(
+        np.concatenate([refs.ravel(), hyps.ravel()]), return_inverse=True)
+    vocab_size = max(vocabulary.size, 1)
+    ref_tokens = tokens[:refs.size].reshape(refs.shape).astype(np.int64)
+    hyp_tokens = tokens[refs.size:].reshape(hyps.shape).astype(np.int64)
+
+    ref_codes, hyp_codes = ref_tokens, hyp_tokens
+
+    matched = np.zeros((max_order, batch_size), dtype=np.int64)
+    hyp_totals = np.zeros((max_order, batch_size), dtype=np.int64)
+    ref_totals = np.zeros((max_order, batch_size), dtype=np.int64)
+
+    for n in range(1, max_order + 1):
+        if n > 1:
+            ref_codes, hyp_codes = _intern_pairs(
+                ref_codes[:, :-1] * vocab_size + ref_tokens[:, n - 1:],
+                hyp_codes[:, :-1] * vocab_size + hyp_tokens[:, n - 1:])
+
+        ref_totals[n - 1] = _n_gram_counts(refs, n)
+        hyp_totals[n - 1] = _n_gram_counts(hyps, n)
+
+        ref_keys, ref_key_counts = np.unique(
+            _sentence_keys(ref_codes, ref_totals[n - 1], batch_size),
+            return_counts=True)
+        hyp_keys, hyp_key_counts = np.unique(
+            _sentence_keys(hyp_codes, hyp_totals[n - 1], batch_size),
+            return_counts=True)
+
+        common, ref_idx, hyp_idx = np.intersect1d(
+            ref_keys, hyp_keys, assume_unique=True, return_indices=True)
+        matched[n - 1] = np.bincount(
+            common % batch_size,
+            weights=np.minimum(ref_key_counts[ref_idx],
+                               hyp_key_counts[hyp_idx]),
+            minlength=batch_size).astype(np.int64)
+
+    assert np.all(matched <= hyp_totals)
+    assert np.all(matched <= ref_totals)
+
+    return matched, hyp_totals, ref_totals
+
+
+def _intern_pairs(ref_pairs: np.ndarray,
+                  hyp_pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Replace pair codes by consecutive codes shared by both arrays."""
+    _, codes = np.unique(
+        np.concatenate([ref_pairs.ravel(), hyp_pairs.ravel()]),
+        return_inverse=True)
+    codes = codes.astype(np.int64)
+    return (codes[:ref_pairs.size].reshape(ref_pairs.shape),
+            codes[ref_pairs.size:].reshape(hyp_pairs.shape))
+
+
+def _sentence_keys(codes: np.ndarray, counts: np.ndarray,
+                   batch_size: int) -> np.ndarray:
+    """Keys of the first `counts` n-grams of each sentence."""
+    positions = np.arange(codes.shape[1])
+    valid = positions[np.newaxis, :] < counts[:, np.newaxis]
+    sentence_ids = np.broadcast_to(
+        np.arange(batch_size)[:, np.newaxis], codes.shape)
+    return codes[valid] * batch_size + sentence_ids[valid]
+
+
+def _n_gram_counts(indices: np.ndarray, order: int) -> np.ndarray:
+    """Number of n-grams in each sentence (row) before the end token.
+
+    The n-grams are taken from the beginning of the sentence up to (and
+    excluding) the first one whose last index is the end token.
+    """
+    num_n_grams = indices.shape[1] - order + 1
+    if num_n_grams <= 0:
+        return np.zeros(indices.shape[0], dtype=np.int64)
 
-    assert matched_n_grams <= total_hyp_n_grams
-    assert matched_n_grams <= total_ref_n_grams
+    return _lengths_before_end(indices[:, order - 1:])
 
-    return matched_n_grams, total_hyp_n_grams, total_ref_n_grams
 
+def _lengths_before_end(indices: np.ndarray) -> np.ndarray:
+    """Position of the first end token in each row, or the row length."""
+    if indices.shape[1] == 0:
+        return np.zeros(indices.shape[0], dtype=np.int64)
 
-def _get_n_grams(indices: np.ndarray, order: int) -> Iterable[np.ndarray]:
-    all_n_grams = [indices[i:i + order]
-                   for i in range(len(indices) - order + 1)]
-    return takewhile(lambda g: g[-1] != END_TOKEN_INDEX, all_n_grams)
+    is_end = indices == END_TOKEN_INDEX
+    return np.where(np.any(is_end, axis=1), np.argmax(is_end, axis=1),
+                    indices.shape[1]).astype(np.int64)
@@ -0,0 +1,106 @@
+"""Pools of worker processes shared by the processors and evaluators.
+
+The worker processes are started by a fork server (or spawned where it is
+not available), never by forking the calling process, which may hold
+TensorFlow sessions and threads. A pool is started only when a large enough
+batch arrives and it is closed by `WorkerPool.close` or when the program
+exits.
+"""
+import atexit
+import multiprocessing
+# pylint: disable=unused-import
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+# pylint: enable=unused-import
+import weakref
+
+# pylint: disable=invalid-name
+T = TypeVar("T")
+# pylint: enable=invalid-name
+
+# Batches with fewer items than this are processed in the calling process
+# even when the pool has more than one worker.
+MIN_PARALLEL_BATCH = 1000
+
+_OPEN_POOLS = weakref.WeakSet()  # type: weakref.WeakSet
+
+
+def _context() -> Any:
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class WorkerPool(object):
+    """A lazily started, closeable pool of worker processes.
+
+    The functions and their arguments must be picklable, i.e. defined on
+    a module level.
+    """
+
+    def __init__(self, num_workers: int,
+                 initializer: Optional[Callable[..., None]] = None,
+                 initargs: Tuple = ()) -> None:
+        """Create the pool, the processes are started on the first use.
+
+        Arguments:
+            num_workers: Number of the worker processes.
+            initializer: Function called in each worker when it starts.
+            initargs: Arguments of the initializer.
+        """
+        self.num_workers = num_workers
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool = None  # type: Optional[Any]
+
+    def is_parallel(self, num_items: int) -> bool:
+        """Check whether a batch of the size is sent to the workers."""
+        # daemonic processes (e.g. the workers) cannot have children
+        return (self.num_workers > 1 and num_items >= MIN_PARALLEL_BATCH
+                and not multiprocessing.current_process().daemon)
+
+    def map_chunks(self, function: Callable[[List[Any]], List[T]],
+                   items: Sequence[Any]) -> List[T]:
+        """Apply a function on a list of items split among the workers.
+
+        The function gets a chunk of the items and returns a list of results
+        of the same length. Small batches are processed in this process.
+        """
+        items = list(items)
+        if not self.is_parallel(len(items)):
+            return function(items)
+
+        chunk_size = -(-len(items) // self.num_workers)
+        chunks = [items[i:i + chunk_size]
+                  for i in range(0, len(items), chunk_size)]
+        return [result for chunk in self._get_pool().map(function, chunks)
+                for result in chunk]
+
+    def apply_async(self, function: Callable[..., T],
+                    args: Tuple) -> Any:
+        """Start a function in a worker regardless of the batch size.
+
+        Returns:
+            The ``multiprocessing.pool.AsyncResult`` of the call.
+        """
+        return self._get_pool().apply_async(function, args)
+
+    def _get_pool(self) -> Any:
+        if self._pool is None:
+            self._pool = _context().Pool(
+                self.num_workers, self._initializer, self._initargs)
+            _OPEN_POOLS.add(self)
+        return self._pool
+
+    def close(self) -> None:
+        """Stop the worker processes, they are started again if needed."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            _OPEN_POOLS.discard(self)
+
+
+@atexit.register
+def _close_pools() -> None:
+    for pool in list(_OPEN_POOLS):
+        pool.close()
@@ -0,0 +1,37 @@
+import json
+from typing import Any, Sequence
+
+import numpy as np
+
+from neuralmonkey.writers.output_writer import OutputWriter
+
+
+def _to_json(item: Any) -> Any:
+    if isinstance(item, np.ndarray):
+        return item.tolist()
+    if isinstance(item, np.generic):
+        return item.item()
+    raise TypeError("Object of type {} is not JSON serializable"
+                    .format(type(item)))
+
+
+class JsonLinesWriter(OutputWriter):
+    """Writes each output item as a JSON value on a separate line.
+
+    Numpy arrays and tuples are written as lists.
+    """
+
+    def __init__(self, path: str, num_items: int,
+                 encoding: str = "utf-8") -> None:
+        super().__init__(path, num_items)
+        self.encoding = encoding
+        self._file = open(path, "w", encoding=encoding)
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        self._file.writelines(
+            json.dumps(item, ensure_ascii=False, default=_to_json) + "\n"
+            for item in outputs)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,128 @@
+import os
+# pylint: disable=unused-import
+from typing import Any, List, Optional, Sequence, Tuple
+# pylint: enable=unused-import
+
+import numpy as np
+
+from neuralmonkey.logging import warn
+from neuralmonkey.writers.output_writer import OutputWriter
+
+
+class NumpyWriter(OutputWriter):
+    """Writes numpy arrays to a ``.npy`` file mapped to memory.
+
+    The file is created for the whole series when the first batch arrives,
+    which determines the shape of the items and the data type. All the items
+    must have the same shape. Like `numpy.save`, the writer adds the ``.npy``
+    extension to the path if it is missing.
+    """
+
+    def __init__(self, path: str, num_items: int) -> None:
+        if not path.endswith(".npy"):
+            path += ".npy"
+        super().__init__(path, num_items)
+        self._array = None  # type: Optional[np.ndarray]
+
+    @property
+    def item_shape(self) -> Optional[Tuple[int, ...]]:
+        """The shape of the items, unknown before the first batch."""
+        if self._array is None:
+            return None
+        return self._array.shape[1:]
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        batch = np.asarray(outputs)
+
+        if self._array is None:
+            self._array = np.lib.format.open_memmap(
+                self.path, mode="w+", dtype=batch.dtype,
+                shape=(self.num_items,) + batch.shape[1:])
+        elif batch.shape[1:] != self._array.shape[1:]:
+            raise ValueError(
+                "Cannot write items of shape {} to '{}' with items of shape "
+                "{}.".format(batch.shape[1:], self.path,
+                             self._array.shape[1:]))
+
+        if self.written + len(batch) > self.num_items:
+            raise ValueError("More than {} items written to '{}'."
+                             .format(self.num_items, self.path))
+
+        self._array[self.written:self.written + len(batch)] = batch
+        self._array.flush()
+
+    def close(self) -> None:
+        if self._array is None:
+            np.save(self.path, np.empty((0,)))
+        else:
+            self._array.flush()
+            self._array = None
+
+
+class NumpyShardWriter(OutputWriter):
+    """Writes each batch of numpy arrays to a separate ``.npy`` file.
+
+    The shards are named by the path (without the ``.npy`` extension)
+    followed by the index of their first item, e.g. ``out.0000000000.npy``.
+    Unlike in the `NumpyWriter`, the items in different batches may have
+    different shapes, e.g. the outputs of decoders of different lengths.
+    """
+
+    def __init__(self, path: str, num_items: int) -> None:
+        super().__init__(path, num_items)
+        if path.endswith(".npy"):
+            path = path[:-len(".npy")]
+        self._prefix = path
+        self.shard_paths = []  # type: List[str]
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        shard_path = "{}.{:010}.npy".format(self._prefix, self.written)
+        np.save(shard_path, np.asarray(outputs))
+        self.shard_paths.append(shard_path)
+
+    def close(self) -> None:
+        pass
+
+
+class AdaptiveNumpyWriter(OutputWriter):
+    """Writes numpy arrays to a single ``.npy`` file or to shards.
+
+    The series is written by the `NumpyWriter` as long as all the items have
+    the same shape. When a batch of differently shaped items arrives (e.g.
+    decoder outputs of a different length), the items written so far are
+    moved to the first shard and the rest of the series is written by the
+    `NumpyShardWriter`.
+    """
+
+    def __init__(self, path: str, num_items: int) -> None:
+        self._writer = NumpyWriter(path, num_items)  # type: OutputWriter
+        super().__init__(self._writer.path, num_items)
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        batch = np.asarray(outputs)
+
+        if (isinstance(self._writer, NumpyWriter)
+                and self._writer.item_shape is not None
+                and self._writer.item_shape != batch.shape[1:]):
+            self._switch_to_shards()
+
+        self._writer.write(batch)
+
+    def _switch_to_shards(self) -> None:
+        self._writer.close()
+        written = self._writer.written
+        items = np.load(self.path)[:written]
+        os.remove(self.path)
+
+        warn("Items of different shapes in '{}', writing each batch to a "
+             "separate file instead.".format(self.path))
+        self._writer = NumpyShardWriter(self.path, self.num_items)
+        self._writer.write(items)
+
+    @property
+    def shard_paths(self) -> List[str]:
+        """Paths of the shards, empty if the series fits in a single file."""
+        return getattr(self._writer, "shard_paths", [])
+
+    def close(self) -> None:
+        self._writer.close()
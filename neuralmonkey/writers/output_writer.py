@@ -0,0 +1,42 @@
+"""Base class of writers streaming output series to files.
+
+A writer is created when the first batch of a series is available, the
+outputs of each batch are written (and flushed) as soon as they are
+computed, and the writer is closed after the last batch. The outputs do not
+need to be kept in memory during the model execution and the outputs of the
+already processed batches survive a crash.
+"""
+from typing import Any, Callable, Sequence
+
+
+class OutputWriter(object):
+    """Writer of an output series to a file, batch by batch."""
+
+    def __init__(self, path: str, num_items: int) -> None:
+        """Create the writer.
+
+        Arguments:
+            path: Path to the output file.
+            num_items: The expected length of the whole series.
+        """
+        self.path = path
+        self.num_items = num_items
+        self.written = 0
+
+    def write(self, outputs: Sequence[Any]) -> None:
+        """Write the outputs of a batch and count them."""
+        self._write(outputs)
+        self.written += len(outputs)
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Finish writing the file."""
+        raise NotImplementedError()
+
+
+# pylint: disable=invalid-name
+# creates a writer from the output path and the length of the series
+Writer = Callable[[str, int], OutputWriter]
+# pylint: enable=invalid-name
@@ -0,0 +1,47 @@
+from typing import Any, Iterable, Sequence, Tuple
+
+from neuralmonkey.writers.output_writer import OutputWriter
+
+
+def nbest_lines(nbest_lists: Iterable[Sequence[Tuple[Any, ...]]],
+                start_id: int = 0) -> Iterable[str]:
+    """Format n-best lists in the Moses format ``id ||| hyp ||| score``.
+
+    The id is the zero-based index of the sentence. The hypotheses may be
+    followed by other items than the score, which are not written.
+
+    Arguments:
+        nbest_lists: Lists of tuples of the hypotheses and their scores.
+        start_id: Index of the first sentence.
+    """
+    for sent_id, nbest_list in enumerate(nbest_lists, start_id):
+        for hypothesis, score, *_ in nbest_list:
+            yield "{} ||| {} ||| {}\n".format(
+                sent_id, " ".join(hypothesis), score)
+
+
+class PlainTextWriter(OutputWriter):
+    """Writes tokenized sentences, one per line."""
+
+    def __init__(self, path: str, num_items: int,
+                 encoding: str = "utf-8") -> None:
+        super().__init__(path, num_items)
+        self.encoding = encoding
+        self._file = open(path, "w", encoding=encoding)
+
+    def _lines(self, outputs: Sequence[Any]) -> Iterable[str]:
+        return (" ".join(sent) + "\n" for sent in outputs)
+
+    def _write(self, outputs: Sequence[Any]) -> None:
+        self._file.writelines(self._lines(outputs))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class NBestWriter(PlainTextWriter):
+    """Writes lists of hypotheses with scores in the Moses n-best format."""
+
+    def _lines(self, outputs: Sequence[Any]) -> Iterable[str]:
+        return nbest_lines(outputs, start_id=self.written)
@@ -22,6 +22,8 @@ bin/neuralmonkey-train tests/self-critical.ini
 bin/neuralmonkey-train tests/small.ini
 bin/neuralmonkey-train tests/small_sent_cnn.ini
 bin/neuralmonkey-run tests/small.ini tests/test_data.ini
+bin/neuralmonkey-run tests/ensemble.ini tests/test_ingraph_ensemble_data.ini
+bin/neuralmonkey-run tests/rescoring.ini tests/test_rescoring_data.ini
 bin/neuralmonkey-server --configuration=tests/small.ini --port=5000 &
 SERVER_PID=$!
 sleep 20